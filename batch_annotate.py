@@ -0,0 +1,148 @@
+"""
+Batch annotation of recorded videos: runs the whiteboard over every video in a process
+pool, one HandTracker/DrawingEngine per worker, and writes an annotated video plus the final
+board image for each.
+
+Usage:
+    python batch_annotate.py lecture1.mp4 lecture2.mp4 ... --out-dir annotated [--workers N]
+    python batch_annotate.py *.mp4 --out-dir annotated --landmarks-dir recordings   (MediaPipe-free)
+
+Each video is processed start to finish by one worker (frames of a video depend on each
+other through the drawing state), so throughput scales with the number of videos up to the
+number of cores. Outputs are <stem>_annotated.mp4 and <stem>_board.png in --out-dir.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+from landmark_recorder import ReplayTracker
+from replay_benchmark import run_replay
+
+PROGRESS_EVERY = 30 # Frames between progress messages from a worker
+
+_progress_queue = None # Set in each worker process by _init_worker
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # One video per process already uses every core; OpenCV's own threads would only contend
+    cv2.setNumThreads(1)
+
+def output_paths(video_path, out_dir):
+    """(annotated video, board image) paths for a video."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return (os.path.join(out_dir, f"{stem}_annotated.mp4"), os.path.join(out_dir, f"{stem}_board.png"))
+
+def annotate_video(video_path, out_dir, landmarks_path=None, max_frames=None):
+    """
+    Annotate one video in this process. Returns run_replay's stats plus the output paths
+    and the worker's pid. With landmarks_path, landmarks come from that recording instead of MediaPipe.
+    """
+    video_out, board_out = output_paths(video_path, out_dir)
+    hand_tracker = ReplayTracker(landmarks_path) if landmarks_path else None
+
+    def progress(done, total):
+        if _progress_queue is not None and (done % PROGRESS_EVERY == 0 or done == total):
+            _progress_queue.put((video_path, done, total))
+
+    stats = run_replay(video_path, hand_tracker=hand_tracker, max_frames=max_frames,
+                       canvas_out=board_out, video_out=video_out, progress=progress)
+    stats.update({"video_out": video_out, "board_out": board_out, "worker": os.getpid()})
+    return stats
+
+def annotate_videos(video_paths, out_dir, workers=None, landmarks_dir=None, max_frames=None, on_progress=None):
+    """
+    Annotate every video on a pool of `workers` processes (default: one per core, at most one
+    per video). Returns one result per video in input order: run_replay's stats with the
+    output paths, or {"video", "error"} if that video failed. on_progress(video, done, total)
+    is called in this process as workers report.
+    """
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in video_paths]
+    if len(set(stems)) != len(stems):
+        raise ValueError("Video file names must be unique: outputs are named after them")
+    os.makedirs(out_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(video_paths)))
+
+    manager = multiprocessing.Manager()
+    progress_queue = manager.Queue()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(progress_queue,)) as pool:
+            futures = []
+            for path, stem in zip(video_paths, stems):
+                landmarks = os.path.join(landmarks_dir, stem + ".wblm") if landmarks_dir else None
+                futures.append(pool.submit(annotate_video, path, out_dir, landmarks, max_frames))
+
+            # Relay progress until every video is done
+            while True:
+                finished = all(f.done() for f in futures)
+                try:
+                    while True:
+                        message = progress_queue.get(timeout=0.1 if not finished else 0)
+                        if on_progress is not None:
+                            on_progress(*message)
+                except queue.Empty:
+                    pass
+                if finished:
+                    break
+
+            results = []
+            for path, future in zip(video_paths, futures):
+                error = future.exception()
+                results.append({"video": path, "error": repr(error)} if error else future.result())
+    finally:
+        manager.shutdown()
+    return results
+
+def worker_summary(results):
+    """{pid: {"videos", "frames", "busy_s", "fps"}}: frames per second of processing time per worker."""
+    summary = {}
+    for stats in results:
+        if "error" in stats:
+            continue
+        s = summary.setdefault(stats["worker"], {"videos": 0, "frames": 0, "busy_s": 0.0})
+        s["videos"] += 1
+        s["frames"] += stats["frames"]
+        s["busy_s"] += stats["total_s"]
+    for s in summary.values():
+        s["fps"] = s["frames"] / s["busy_s"] if s["busy_s"] > 0 else 0.0
+    return summary
+
+def format_summary(results, wall_s):
+    lines = []
+    for stats in results:
+        if "error" in stats:
+            lines.append(f"{stats['video']}: FAILED {stats['error']}")
+        else:
+            lines.append(f"{stats['video']}: {stats['frames']} frames, {stats['throughput_fps']:.1f} fps -> {stats['video_out']}")
+    for i, (pid, s) in enumerate(sorted(worker_summary(results).items())):
+        lines.append(f"worker {i} (pid {pid}): {s['videos']} videos, {s['frames']} frames, {s['fps']:.1f} fps")
+    frames = sum(stats.get("frames", 0) for stats in results)
+    lines.append(f"total {frames} frames in {wall_s:.2f} s, {frames / wall_s if wall_s > 0 else 0.0:.1f} fps overall")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate recorded videos with the whiteboard, in parallel.")
+    parser.add_argument("videos", nargs="+", help="Video files to annotate")
+    parser.add_argument("--out-dir", required=True, help="Directory for annotated videos and board images")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--landmarks-dir", default=None,
+                        help="Directory of <video stem>.wblm landmark recordings to use instead of MediaPipe")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop each video after this many frames")
+    args = parser.parse_args()
+
+    def report(video, done, total):
+        print(f"{os.path.basename(video)}: {done}/{total or '?'} frames", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = annotate_videos(args.videos, args.out_dir, workers=args.workers, landmarks_dir=args.landmarks_dir,
+                              max_frames=args.max_frames, on_progress=report)
+    print(format_summary(results, time.perf_counter() - start))
+    if any("error" in stats for stats in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
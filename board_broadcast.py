@@ -0,0 +1,343 @@
+"""
+Live broadcast of the board to remote viewers over TCP.
+
+Only changed canvas tiles are sent. The render loop copies the tiles that changed since
+the last update and hands them to an encoder thread, which compresses each tile once,
+keeps the latest encoded copy of every tile (the "mirror") and fans the update out to
+every viewer. A viewer that joins, or falls more than BROADCAST_QUEUE_SIZE updates
+behind, gets a keyframe built from the mirror instead, so slow viewers never slow down
+drawing and late joiners sync in one message burst.
+
+Messages are type u8, payload length u32, payload:
+    KEYFRAME  tile size u16, width u32, height u32, infinite u8 (viewer drops its board)
+    TILE      same payload as a session file tile record (see session_store.py)
+    VIEW      x f8, y f8, zoom f8 of the presenter's viewport (infinite canvas)
+    END       (empty) the board is consistent; viewers may display it
+
+Usage (viewer):
+    python board_broadcast.py HOST PORT
+"""
+import argparse
+import queue
+import socket
+import struct
+import threading
+import time
+import cv2
+import numpy as np
+import config
+from tile_cache import TileCache
+from sparse_canvas import SparseTileStore, Viewport
+from session_store import encode_tile, decode_tile
+
+MESSAGE = struct.Struct("<BI")
+KEYFRAME_INFO = struct.Struct("<HIIB")
+VIEW_INFO = struct.Struct("<ddd")
+KEYFRAME, TILE, VIEW, END = 1, 2, 3, 4
+
+def encode_message(kind, payload=b""):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+class ViewerConnection:
+    """Server side of one viewer: a bounded queue of encoded updates drained by a sender thread."""
+    def __init__(self, sock, queue_size=config.BROADCAST_QUEUE_SIZE):
+        self.sock = sock
+        self.updates = queue.Queue(maxsize=queue_size)
+        self.resyncs = 0 # Times this viewer fell behind and was sent a keyframe
+        self.closed = False
+        self.thread = threading.Thread(target=self._send_loop, name="broadcast-viewer", daemon=True)
+
+    def offer(self, data, keyframe):
+        """
+        Queue an update without ever blocking. If the viewer is too far behind, its
+        backlog is dropped and replaced by a keyframe (keyframe() builds one on demand).
+        """
+        try:
+            self.updates.put_nowait(data)
+        except queue.Full:
+            while True:
+                try:
+                    self.updates.get_nowait()
+                except queue.Empty:
+                    break
+            self.resyncs += 1
+            self.updates.put_nowait(keyframe())
+
+    def close(self):
+        self.closed = True
+        try:
+            self.updates.put_nowait(None)
+        except queue.Full:
+            pass
+        _shutdown(self.sock)
+        self.sock.close()
+
+    def _send_loop(self):
+        while not self.closed:
+            data = self.updates.get()
+            if data is None:
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.closed = True
+                return
+
+class BroadcastServer:
+    """
+    Streams a DrawingEngine's board to connected viewers. Call start() once, poll() every
+    frame and close() on exit. port 0 picks a free port (see self.port after start()).
+    """
+    def __init__(self, drawing_engine, host=config.BROADCAST_HOST, port=config.BROADCAST_PORT,
+                 interval=config.BROADCAST_INTERVAL, queue_size=config.BROADCAST_QUEUE_SIZE, clock=time.monotonic):
+        self.engine = drawing_engine
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.queue_size = queue_size
+        self.clock = clock
+        self.last_update = clock()
+
+        self.tile_cache = None # Cache being watched; a resize replaces it
+        self.watcher = None
+        self.view = None       # Last viewport sent
+
+        # Owned by the encoder thread
+        self.header = b""
+        self.mirror = {}       # key -> encoded TILE message
+        self.view_message = b""
+        self.viewers = []
+
+        self.jobs = queue.Queue()
+        self.listener = None
+        self.threads = [
+            threading.Thread(target=self._accept_loop, name="broadcast-accept", daemon=True),
+            threading.Thread(target=self._encode_loop, name="broadcast-encode", daemon=True)
+        ]
+
+    def start(self):
+        self.listener = socket.create_server((self.host, self.port))
+        self.port = self.listener.getsockname()[1]
+        self._queue_snapshot()
+        for t in self.threads:
+            t.start()
+
+    def poll(self):
+        """Send the changes since the last update if BROADCAST_INTERVAL has passed. Cheap when idle."""
+        now = self.clock()
+        if now - self.last_update >= self.interval:
+            self.last_update = now
+            self.publish()
+
+    def publish(self):
+        """Queue the tiles (and viewport) that changed since the last update."""
+        engine = self.engine
+        if engine.tile_cache is not self.tile_cache:
+            self._queue_snapshot()
+            return
+
+        keys = engine.tile_cache.take_changed(self.watcher)
+        view = self._current_view()
+        if not keys and view == self.view:
+            return
+        self.view = view
+        self.jobs.put(("delta", [(key, self._tile_pixels(key)) for key in keys], view))
+
+    def close(self):
+        self.jobs.put(None)
+        if self.listener is not None:
+            _shutdown(self.listener) # Wakes up the blocked accept()
+            self.listener.close()
+        for t in self.threads:
+            t.join(timeout=1.0)
+        for viewer in list(self.viewers):
+            viewer.close()
+
+    def _queue_snapshot(self):
+        """Queue the whole board: viewers are resynced with a keyframe."""
+        engine = self.engine
+        cache = engine.tile_cache
+        if cache is not self.tile_cache:
+            self.tile_cache = cache
+            self.watcher = cache.watch()
+        cache.take_changed(self.watcher)
+
+        infinite = engine.viewport is not None
+        header = KEYFRAME_INFO.pack(cache.tile_size, engine.width, engine.height, int(infinite))
+        self.view = self._current_view()
+        self.jobs.put(("reset", header, [(key, self._tile_pixels(key)) for key in cache.tile_keys()], self.view))
+
+    def _current_view(self):
+        viewport = self.engine.viewport
+        if viewport is None:
+            return None
+        return (viewport.x, viewport.y, viewport.zoom)
+
+    def _tile_pixels(self, key):
+        if self.engine.viewport is not None:
+            tile = self.tile_cache.tiles.get(key)
+            return None if tile is None else tile.copy()
+        return self.tile_cache.tile_image(key)
+
+    def _keyframe(self):
+        return b"".join([encode_message(KEYFRAME, self.header), *self.mirror.values(),
+                         self.view_message, encode_message(END)])
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return # Listener closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.jobs.put(("join", ViewerConnection(sock, self.queue_size)))
+
+    def _encode_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+
+            if job[0] == "join":
+                viewer = job[1]
+                viewer.updates.put_nowait(self._keyframe())
+                viewer.thread.start()
+                self.viewers.append(viewer)
+                continue
+
+            if job[0] == "reset":
+                _, self.header, tiles, view = job
+                self.mirror = {}
+            else:
+                _, tiles, view = job
+
+            messages = []
+            for key, pixels in tiles:
+                message = encode_message(TILE, encode_tile(key, pixels))
+                messages.append(message)
+                if pixels is None:
+                    self.mirror.pop(key, None)
+                else:
+                    self.mirror[key] = message
+            if view is not None:
+                self.view_message = encode_message(VIEW, VIEW_INFO.pack(*view))
+                messages.append(self.view_message)
+            messages.append(encode_message(END))
+
+            if job[0] == "reset":
+                data = self._keyframe()
+            else:
+                data = b"".join(messages)
+            self.viewers = [v for v in self.viewers if not v.closed]
+            for viewer in self.viewers:
+                viewer.offer(data, self._keyframe)
+
+class BoardDecoder:
+    """Viewer-side board state, rebuilt from broadcast messages."""
+    def __init__(self):
+        self.store = None
+        self.viewport = None
+        self.width = 0
+        self.height = 0
+        self.updates = 0 # END messages seen (complete updates applied)
+
+    def apply(self, kind, payload):
+        if kind == KEYFRAME:
+            tile_size, self.width, self.height, infinite = KEYFRAME_INFO.unpack(payload)
+            if infinite:
+                self.store = SparseTileStore(tile_size)
+                self.viewport = Viewport(self.width, self.height)
+            else:
+                self.store = TileCache(np.zeros((self.height, self.width, 3), dtype=np.uint8), tile_size)
+                self.viewport = None
+        elif kind == TILE:
+            key, pixels = decode_tile(payload)
+            if pixels is None:
+                self.store.clear_tile(key)
+            else:
+                self.store.write_tile(key, pixels)
+        elif kind == VIEW and self.viewport is not None:
+            self.viewport.x, self.viewport.y, self.viewport.zoom = VIEW_INFO.unpack(payload)
+        elif kind == END:
+            self.updates += 1
+
+    def render(self):
+        """The board as the presenter sees it (without the camera image), or None before the first keyframe."""
+        if self.store is None:
+            return None
+        if self.viewport is None:
+            return self.store.canvas.copy()
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.store.composite(frame, self.viewport)
+        return frame
+
+class BroadcastViewer:
+    """
+    Connects to a BroadcastServer and keeps a BoardDecoder up to date on a receive thread.
+    """
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.decoder = BoardDecoder()
+        self.lock = threading.Lock()
+        self.connected = True
+        self.thread = threading.Thread(target=self._receive_loop, name="broadcast-receive", daemon=True)
+        self.thread.start()
+
+    @property
+    def updates(self):
+        return self.decoder.updates
+
+    def render(self):
+        with self.lock:
+            return self.decoder.render()
+
+    def close(self):
+        self.connected = False
+        _shutdown(self.sock)
+        self.sock.close()
+        self.thread.join(timeout=1.0)
+
+    def _receive_loop(self):
+        try:
+            while True:
+                kind, length = MESSAGE.unpack(self._read_exact(MESSAGE.size))
+                payload = self._read_exact(length)
+                with self.lock:
+                    self.decoder.apply(kind, payload)
+        except (ConnectionError, OSError):
+            self.connected = False
+
+    def _read_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Broadcast server closed the connection")
+            data += chunk
+        return bytes(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="View a whiteboard broadcast.")
+    parser.add_argument("host", help="Presenter's address")
+    parser.add_argument("port", type=int, help="Presenter's BROADCAST_PORT")
+    args = parser.parse_args()
+
+    viewer = BroadcastViewer(args.host, args.port)
+    print("Connected. Press 'q' to quit.")
+    while viewer.connected:
+        board = viewer.render()
+        if board is not None:
+            cv2.imshow("Whiteboard Viewer", board)
+        if cv2.waitKey(30) & 0xFF == ord('q'):
+            break
+    viewer.close()
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
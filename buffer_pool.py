@@ -0,0 +1,43 @@
+"""
+Reusable per-frame output buffers.
+
+Full-size arrays created every frame (capture, flip, resize, color conversion) keep the
+allocator and garbage collector busy, which shows up as frame-time jitter and a growing
+peak RSS on long sessions. Stages that are given a BufferPool write into its arrays through
+OpenCV's dst= parameters instead, so after the first frame the loop allocates no frames.
+"""
+import numpy as np
+
+class BufferPool:
+    """
+    Named arrays reused as long as the requested shape and dtype stay the same.
+    allocations counts the arrays the pool had to create. After freeze(), any new
+    allocation raises AssertionError, which checks that the loop is in a steady state.
+
+    A buffer is overwritten by the next call that asks for the same name, so it must
+    not be kept across frames or shared between threads.
+    """
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+        self.frozen = False
+
+    def __len__(self):
+        return len(self.buffers)
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self.buffers.values())
+
+    def get(self, name, shape, dtype=np.uint8):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            if self.frozen:
+                raise AssertionError(f"Buffer '{name}' {tuple(shape)} allocated in steady state")
+            buf = self.buffers[name] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buf
+
+    def freeze(self):
+        """From now on every request must be served by an existing buffer."""
+        self.frozen = True
@@ -0,0 +1,104 @@
+import collections
+import config
+
+class CanvasHistory:
+    """
+    Memory-bounded undo/redo of drawing actions using copy-on-write canvas tiles.
+
+    The first time an action is about to paint over a tile, that tile is copied ("before").
+    When the action ends, the same tiles are copied again ("after"). Undo/redo write those
+    copies back, so their cost follows the area the action touched, not the canvas size.
+    Each entry also keeps the display-list operations the action added and removed, so the
+    vector board stays in step with the pixels.
+    """
+    def __init__(self, tile_cache, max_bytes=config.UNDO_MEMORY_LIMIT_MB * 1024 * 1024):
+        self.tile_cache = tile_cache
+        self.max_bytes = max_bytes
+        self.undo_stack = collections.deque()
+        self.redo_stack = []
+        self.bytes_used = 0
+        self.pending = None # Action in progress: {"tiles": {key: before}, "added": [ops], "removed": [ops]}
+
+    def before_paint(self, rect):
+        """Snapshot the tiles in rect (canvas pixels) that the current action has not touched yet."""
+        if self.pending is None:
+            self.pending = {"tiles": {}, "added": [], "removed": []}
+        tiles = self.pending["tiles"]
+        for key in self.tile_cache.tile_keys(rect):
+            if key not in tiles:
+                tiles[key] = self.tile_cache.read_tile(key)
+
+    def record_added(self, op):
+        if self.pending is None:
+            self.pending = {"tiles": {}, "added": [], "removed": []}
+        self.pending["added"].append(op)
+
+    def record_removed(self, op):
+        if self.pending is None:
+            self.pending = {"tiles": {}, "added": [], "removed": []}
+        self.pending["removed"].append(op)
+
+    def commit(self):
+        """Close the current action and push it onto the undo stack."""
+        pending = self.pending
+        self.pending = None
+        if pending is None or not (pending["tiles"] or pending["added"] or pending["removed"]):
+            return
+
+        tiles = {key: (before, self.tile_cache.read_tile(key)) for key, before in pending["tiles"].items()}
+        entry = {"tiles": tiles, "added": pending["added"], "removed": pending["removed"],
+                 "bytes": self._entry_bytes(tiles)}
+
+        self.undo_stack.append(entry)
+        self.bytes_used += entry["bytes"]
+
+        # A new action makes the redo branch unreachable
+        for old in self.redo_stack:
+            self.bytes_used -= old["bytes"]
+        self.redo_stack.clear()
+
+        self._evict()
+
+    def pop_undo(self):
+        """Entry to undo (moved onto the redo stack), or None."""
+        self.commit()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def pop_redo(self):
+        """Entry to redo (moved back onto the undo stack), or None."""
+        self.commit()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def rebase(self, tile_cache):
+        """
+        Keep the undo/redo entries on a canvas of another resolution. Their tile copies do not
+        fit it, so they are dropped ("tiles" None): undo re-renders the entry's operations instead.
+        """
+        self.commit()
+        self.tile_cache = tile_cache
+        for entry in list(self.undo_stack) + self.redo_stack:
+            entry["tiles"] = None
+            entry["bytes"] = 0
+        self.bytes_used = 0
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.bytes_used = 0
+        self.pending = None
+
+    def _entry_bytes(self, tiles):
+        return sum(before.nbytes + after.nbytes for before, after in tiles.values())
+
+    def _evict(self):
+        """Drop the oldest undo entries until the history fits in max_bytes."""
+        while self.bytes_used > self.max_bytes and self.undo_stack:
+            self.bytes_used -= self.undo_stack.popleft()["bytes"]
@@ -4,18 +4,102 @@ import cv2
 FRAME_WIDTH_MAX = 1080
 TARGET_FPS = 60 # For internal logic if needed, OpenCV handles camera hardware FPS
 FLIP_FRAME = True
+STRICT_BUFFERS = False # Debug: raise if the frame loop allocates a new frame buffer after the first frame
+
+# Frame Source (see frame_source.py)
+FRAME_SOURCE = "camera" # "camera" / "camera:N", a video file, a directory of images, or "synthetic[:WIDTHxHEIGHT]"
+CAMERA_DEVICE = 0
+CAMERA_WIDTH = 640 # Requested capture size; frames that already have the working size skip the resize
+CAMERA_HEIGHT = 480
+CAMERA_FOURCC = None # Pixel format to request, e.g. "MJPG" (needed by many cameras for large sizes) or "YUYV"; None = driver default
+CAMERA_FPS = None # Requested frame rate, None = driver default
+CAMERA_BUFFER_SIZE = 1 # Frames the driver may queue; 1 always hands over the newest frame (lowest latency)
+
+# Frame-Budget Governor (see frame_governor.py)
+FRAME_GOVERNOR = True # Lower quality step by step while frames take longer than 1/TARGET_FPS, restore it when there is headroom
+GOVERNOR_LEVELS = ("inference_scale", "toolbar_auto_hide", "alternate_inference") # Applied in this order; "frame_width" can be added last
+GOVERNOR_WINDOW = 30 # Frames per decision (the median frame time of the window is compared to the budget)
+GOVERNOR_HEADROOM = 0.6 # Step back up once frames take less than this fraction of the budget...
+GOVERNOR_RECOVER_WINDOWS = 3 # ...for this many windows in a row
+GOVERNOR_INFERENCE_SCALE = 0.5 # Frame scale for hand inference at the "inference_scale" level
+GOVERNOR_WIDTH_SCALE = 0.75 # Working resolution scale at the "frame_width" level
+
+# Pipelined Mode (capture / inference / render on separate threads)
+PIPELINE_MODE = False
+PIPELINE_QUEUE_SIZE = 1 # Capture queue drops stale frames, so 1 keeps inference on the freshest frame
 
 # MediaPipe Hand Tracking Settings
 STATIC_IMAGE_MODE = False
-MAX_NUM_HANDS = 1
+MAX_NUM_HANDS = 1 # Above 1, every detected hand draws with its own pen/shape/eraser state
+HAND_MATCH_DISTANCE = 150 # Max palm movement (px) between frames to keep a hand's identity
+MODEL_PATH = None # hand_landmarker.task location, None = next to hand_tracker.py
+MODEL_DOWNLOAD = True # Download the model if it is missing (set False on offline machines)
+MODEL_DOWNLOAD_TIMEOUT = 20 # Seconds
 MIN_DETECTION_CONFIDENCE = 0.9
 MIN_TRACKING_CONFIDENCE = 0.65
+ROI_TRACKING = False # Run inference on a padded crop around last frame's hand instead of the whole frame.
+# Crops use a second, IMAGE-mode landmarker (no MediaPipe tracking between crops); when a crop loses the
+# hand, that landmarker also searches the same frame at full size, so VIDEO mode never sees a frame twice
+ROI_PADDING = 0.5 # Extra margin on each side of the hand's bounding box, as a fraction of its size
+ROI_MIN_SIZE = 160 # Smallest crop side in pixels
+ROI_EDGE_MARGIN = 0.08 # Landmarks this close (fraction of crop) to a crop edge trigger full-frame detection
+LANDMARK_RECORD_PATH = None # e.g. "session.wblm" to record every frame's landmarks for offline replay
+
+# Landmark Filter / Inference Frame-Skipping
+LANDMARK_FILTER = False # One-Euro filter all landmarks and predict skipped frames
+INFERENCE_INTERVAL = 1 # Run hand inference every Nth frame; frames in between are predicted
+FILTER_MIN_CUTOFF = 0.5 # Hz, lower = smoother when the hand is still
+FILTER_BETA = 0.05 # Cutoff increase per pixel/second of speed, higher = less lag when moving
+FILTER_D_CUTOFF = 0.3 # Hz, smoothing of the velocity estimate used for prediction
 
 # Gesture Thresholds
 PINCH_THRESHOLD = 23.5  # Lowered slightly so fingers must be closer together to pinch 
+# Hand-size relative thresholds (fraction of wrist -> middle finger MCP distance), used whenever
+# all 21 landmarks are known. Calibrated to match the pixel values above for a typical hand
+# (~87 px wrist to MCP) at 640x480.
+PINCH_THRESHOLD_RATIO = 0.27
+THUMB_EXTENSION_RATIO = 0.35
+GRAB_RATIO = 0.6 # Fist (grab to pan/zoom): every fingertip closer than this to the middle finger MCP
 
 # Drawing Engine Settings
 SMOOTHING_WINDOW = 2 # Increased further for smooth drawing
+TILE_SIZE = 64 # Canvas is re-rendered from the stroke display list in square tiles of this size
+UNDO_MEMORY_LIMIT_MB = 64 # Undo history is evicted oldest-first past this many MB of tile snapshots
+PALETTE_CANVAS = False # Store the canvas as one palette index per pixel: 1/3 the memory and the index is the ink mask
+STROKE_SPLINE_STEP = 4 # Pixels per straight piece when drawing the smooth curve through freehand points
+STROKE_SIMPLIFY_EPSILON = 1.0 # Finished strokes drop points closer than this (board units) to the rest; 0 keeps all
+OBJECT_ERASER_RADIUS = 12 # Screen pixels around the fingertip in which the object eraser picks up strokes and shapes
+SELECTION_COLOR = (255, 255, 0) # Box around selected strokes and shapes (cyan)
+
+# Autosave
+AUTOSAVE_PATH = None # e.g. "board.wbss" to restore the board at startup and save changes in the background
+AUTOSAVE_INTERVAL = 0.25 # Seconds between incremental saves (most ink a killed process can lose)
+AUTOSAVE_FSYNC = False # Also fsync every save (survives power loss, costs disk latency on the writer thread)
+AUTOSAVE_COMPACT_RATIO = 4 # The writer rewrites the log as a snapshot once it is this many times the size of the live board...
+AUTOSAVE_COMPACT_MIN_MB = 1 # ...and larger than this
+
+# Time-Lapse (see timelapse.py)
+TIMELAPSE_PATH = None # e.g. "session.wbtl" to record how the board evolves, for playback and export
+TIMELAPSE_INTERVAL = 0.2 # Seconds between logged batches of changes (time resolution of the playback)
+TIMELAPSE_KEYFRAME_INTERVAL = 30 # Seconds between full board snapshots; bounds the work of a seek
+
+# Live Broadcast
+BROADCAST_PORT = None # e.g. 8765 to stream the board to viewers (python board_broadcast.py HOST PORT)
+BROADCAST_HOST = "0.0.0.0"
+BROADCAST_INTERVAL = 1 / 30 # Seconds between delta updates sent to viewers
+BROADCAST_QUEUE_SIZE = 8 # Updates a slow viewer may fall behind before it is resynced with a keyframe
+
+# Performance Monitor
+PERF_MONITOR = False # Time every pipeline stage over a rolling window; 'p' toggles the on-screen HUD
+PERF_WINDOW = 240 # Samples kept per stage
+PERF_EXPORT_PATH = None # e.g. "perf.json" or "perf.csv", rewritten every PERF_EXPORT_INTERVAL seconds
+PERF_EXPORT_INTERVAL = 10
+
+# Infinite Canvas
+INFINITE_CANVAS = False # Unbounded board stored as sparse tiles, viewed through a pannable/zoomable viewport
+ZOOM_MIN = 0.25
+ZOOM_MAX = 4.0
+ZOOM_DEADBAND = 0.15 # Hand-size change (fraction) while grabbing that is ignored before zooming starts
 
 # Dashboard Settings
 DASHBOARD_HEIGHT = 75
@@ -40,6 +124,6 @@ INITIAL_STATE = {
     "pen_size": 5,
     "pen_color": COLORS["blue"],
     "eraser_size": 30,           # Active only when flat_hand is True
-    "shape_type": "freehand",    # Shapes: 'freehand', 'line', 'circle', 'rectangle'
+    "shape_type": "freehand",    # Shapes: 'freehand', 'line', 'circle', 'rectangle'; whole-object tools: 'object_erase', 'select'
     "pinch_active": False
 }
@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 import config
 
 class Dashboard:
@@ -11,18 +12,25 @@ class Dashboard:
         # colors: red, green, blue, yellow, purple
         # sizes: S, M, L
         # shapes: freehand, line, circle, rect
+        # object tools: object eraser, select
         # eraser sizes: S, M, L
         
         self.regions = {}
         self._setup_regions()
+
+        # Pre-rendered toolbar for the last state drawn: (strip image, mask of drawn pixels)
+        self.strip_key = None
+        self.strip = None
+        self._setup_column_lookup()
+
+        # Frame governor: only draw the toolbar on frames where a fingertip is near it
+        self.auto_hide = False
+        self.hand_near = False # Set by process_interaction, cleared by render
         
     def _setup_regions(self):
         """
         Divide the dashboard into rectangular clickable areas.
         """
-        # We have ~14 distinct buttons, split evenly for simplicity
-        button_width = self.width // 14
-        
         buttons = [
             ("color", config.COLORS["red"], "Red"),
             ("color", config.COLORS["green"], "Green"),
@@ -35,10 +43,15 @@ class Dashboard:
             ("shape", "line", "Line"),
             ("shape", "circle", "Circ"),
             ("shape", "rectangle", "Rect"),
+            ("shape", "object_erase", "Obj Erase"),
+            ("shape", "select", "Select"),
             ("eraser_size", 20, "Eraser S"),
             ("eraser_size", 40, "Eraser M"),
             ("eraser_size", 60, "Eraser L")
         ]
+
+        # Split evenly for simplicity
+        button_width = self.width // len(buttons)
         
         for i, (b_type, b_val, b_name) in enumerate(buttons):
             x1 = i * button_width
@@ -51,9 +64,57 @@ class Dashboard:
                 "rect": (x1, y1, x2, y2)
             }
 
+    def _setup_column_lookup(self):
+        """
+        Precompute which button covers every x column, so hit-testing is a single lookup.
+        Buttons share their border column; like the old linear scan, the earlier button wins.
+        """
+        self.buttons = list(self.regions.values())
+        self.column_lut = np.full(self.width + 1, -1, dtype=np.int32)
+        for i, data in enumerate(self.buttons):
+            x1, _, x2, _ = data["rect"]
+            cols = self.column_lut[x1:x2 + 1]
+            cols[cols == -1] = i
+
     def render(self, frame, current_state):
         """
         Draw the dashboard onto the frame.
+        The toolbar is rasterized when the state changes and blitted from the cached strip otherwise.
+        With auto_hide it is skipped unless a fingertip came near it this frame.
+        """
+        hand_near, self.hand_near = self.hand_near, False
+        if self.auto_hide and not hand_near:
+            return
+
+        key = (current_state["pen_color"], current_state["pen_size"],
+               current_state["shape_type"], current_state["eraser_size"])
+        if key != self.strip_key:
+            self.strip_key = key
+            self.strip = self._render_strip(current_state)
+
+        strip, mask = self.strip
+        rows = min(strip.shape[0], frame.shape[0])
+        cols = min(strip.shape[1], frame.shape[1])
+        cv2.copyTo(strip[:rows, :cols], mask[:rows, :cols], frame[:rows, :cols])
+
+    def _render_strip(self, current_state):
+        """
+        Rasterize the toolbar for one state into an image plus a mask of the pixels it draws.
+        Drawing onto a black and a white base and comparing them finds exactly those pixels
+        (borders reach a little below DASHBOARD_HEIGHT).
+        """
+        shape = (self.height + 4, self.width, 3)
+        on_black = np.zeros(shape, dtype=np.uint8)
+        on_white = np.full(shape, 255, dtype=np.uint8)
+        self._draw_toolbar(on_black, current_state)
+        self._draw_toolbar(on_white, current_state)
+
+        mask = np.all(on_black == on_white, axis=2).astype(np.uint8) * 255
+        return on_black, mask
+
+    def _draw_toolbar(self, frame, current_state):
+        """
+        Draw every button directly onto frame.
         """
         # Draw background
         cv2.rectangle(frame, (0, 0), (self.width, self.height), config.COLORS["dark_gray"], -1)
@@ -99,28 +160,30 @@ class Dashboard:
         Update state if true, return whether the event was handled.
         """
         x, y = index_tip
+        if y <= 2 * self.height:
+            self.hand_near = True
         
         # If not pinching, or not in dashboard area, do nothing
         if not is_pinching or y > self.height:
             return False
             
         # Check which button was clicked
-        for name, data in self.regions.items():
-            x1, y1, x2, y2 = data["rect"]
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                # Update current state
-                b_type = data["type"]
-                val = data["value"]
-                
-                if b_type == "color":
-                    current_state["pen_color"] = val
-                elif b_type == "size":
-                    current_state["pen_size"] = val
-                elif b_type == "shape":
-                    current_state["shape_type"] = val
-                elif b_type == "eraser_size":
-                    current_state["eraser_size"] = val
-                    
-                return True # consumed
+        index = self.column_lut[x] if 0 <= x < len(self.column_lut) and y >= 0 else -1
+        if index >= 0:
+            data = self.buttons[index]
+            # Update current state
+            b_type = data["type"]
+            val = data["value"]
+            
+            if b_type == "color":
+                current_state["pen_color"] = val
+            elif b_type == "size":
+                current_state["pen_size"] = val
+            elif b_type == "shape":
+                current_state["shape_type"] = val
+            elif b_type == "eraser_size":
+                current_state["eraser_size"] = val
                 
+            return True # consumed
+            
         return True # if inside dashboard but no button, still consumed (don't draw on dashboard)
@@ -0,0 +1,324 @@
+import bisect
+import cv2
+import numpy as np
+import config
+from stroke_engine import segment_controls, spline_pad, spline_samples, stroke_polyline
+
+def op_bounds(kind, points, size):
+    """
+    Conservative bounding box (x1, y1, x2, y2), exclusive ends, of an operation drawn
+    with the given points and size. Nothing the operation paints falls outside of it.
+    """
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+
+    if kind == "circle":
+        # Shapes: points are [center, point_on_circle]
+        radius = int(np.hypot(points[1][0] - points[0][0], points[1][1] - points[0][1]))
+        pad = radius + size + 1
+        xs, ys = xs[:1], ys[:1]
+    elif kind in ("stroke", "stroke_segment"):
+        # The spline through the points bulges slightly past them
+        pad = size + 1 + spline_pad(points)
+    else:
+        # Strokes/lines/rectangles extend half their thickness, eraser dabs their radius
+        pad = size + 1
+
+    return (int(np.floor(min(xs) - pad)), int(np.floor(min(ys) - pad)),
+            int(np.ceil(max(xs) + pad)) + 1, int(np.ceil(max(ys) + pad)) + 1)
+
+def rasterize_mask(kind, points, size):
+    """
+    Draw an operation into a local single-channel mask that fully contains it.
+    Returns (mask, x1, y1) where (x1, y1) is the mask's top-left corner.
+
+    Primitives are never clipped here, so the same operation always yields the same
+    pixels no matter which tile (or the whole canvas) it is later pasted into.
+    """
+    x1, y1, x2, y2 = op_bounds(kind, points, size)
+    mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+    pts = [(int(p[0]) - x1, int(p[1]) - y1) for p in points]
+
+    if kind == "stroke":
+        if len(pts) == 1:
+            cv2.line(mask, pts[0], pts[0], 255, size)
+        else:
+            cv2.polylines(mask, [stroke_polyline(pts)], False, 255, size)
+    elif kind == "stroke_segment":
+        # One spline segment of a stroke (points are its four control points), drawn while live
+        cv2.polylines(mask, [spline_samples([pts])], False, 255, size)
+    elif kind == "erase":
+        for p in pts:
+            cv2.circle(mask, p, size, 255, -1)
+    elif kind == "line":
+        cv2.line(mask, pts[0], pts[1], 255, size)
+    elif kind == "rectangle":
+        cv2.rectangle(mask, pts[0], pts[1], 255, size)
+    elif kind == "circle":
+        radius = int(np.hypot(pts[1][0] - pts[0][0], pts[1][1] - pts[0][1]))
+        cv2.circle(mask, pts[0], radius, 255, size)
+
+    return mask, x1, y1
+
+def rects_intersect(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def op_outline(op):
+    """
+    The center line an operation draws, as an (N, 2) float polyline in board units: the
+    sampled spline of a stroke, the edges of a rectangle, the points of a line or eraser pass.
+    Cached on the operation until its points change. Circles are tested analytically instead.
+    """
+    if op.outline is None:
+        if op.kind == "stroke":
+            outline = stroke_polyline(op.points)
+        elif op.kind == "rectangle":
+            (x1, y1), (x2, y2) = op.points[0], op.points[1]
+            outline = [(x1, y1), (x2, y1), (x2, y2), (x1, y2), (x1, y1)]
+        else:
+            outline = op.points
+        op.outline = np.asarray(outline, dtype=np.float64).reshape(-1, 2)
+    return op.outline
+
+class DisplayOp:
+    """
+    One drawing operation in board coordinates.
+    kind is 'stroke' (freehand spline through the points), 'line', 'rectangle', 'circle' or 'erase'
+    (a pass of eraser dabs, size is the dab radius).
+    """
+    __slots__ = ("op_id", "kind", "points", "color", "size", "bounds", "cells", "outline")
+
+    def __init__(self, op_id, kind, points, color, size):
+        self.op_id = op_id
+        self.kind = kind
+        self.points = list(points)
+        self.color = color
+        self.size = size
+        self.bounds = None
+        self.cells = set()
+        self.outline = None # See op_outline
+
+    def scaled(self, scale):
+        """Points and size in canvas pixels for a canvas with the given pixels-per-board-unit."""
+        points = [(int(round(p[0] * scale)), int(round(p[1] * scale))) for p in self.points]
+        size = max(1, int(round(self.size * scale)))
+        return points, size
+
+class DisplayList:
+    """
+    Ordered list of drawing operations, the source of truth for the board contents.
+    Operations are bucketed into a sparse grid of cells so the ops touching any
+    region can be found without scanning the whole list.
+    """
+    def __init__(self, cell_size=config.TILE_SIZE):
+        self.cell_size = cell_size
+        self.ops = {}     # op_id -> DisplayOp
+        self.order = []   # Ids in drawing order (ascending); kept with bisect so putting back an old id never re-sorts
+        self.cells = {}   # (cx, cy) -> set of op_ids whose geometry reaches the cell
+        self.next_id = 0
+        self.changed = set() # Ids added, extended or restored since the last take_changes()
+        self.removed = set() # Ids removed since the last take_changes()
+        self.watchers = [] # (changed, removed) id sets of further consumers (see watch)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        ops = self.ops
+        return (ops[i] for i in self.order)
+
+    def add(self, kind, points, color, size):
+        return self.insert(DisplayOp(self.next_id, kind, points, color, size))
+
+    def insert(self, op):
+        """Index a new operation (e.g. one loaded from a saved session), keeping drawing order by id."""
+        self.next_id = max(self.next_id, op.op_id + 1)
+        self.ops[op.op_id] = op
+        self._place(op.op_id)
+        self._mark_changed(op.op_id)
+
+        self._index_points(op)
+        return op
+
+    def append_point(self, op, point):
+        """Extend a stroke or eraser pass with one more point."""
+        op.points.append(point)
+        op.outline = None
+        self._mark_changed(op.op_id)
+        if op.kind == "stroke":
+            # The new point also reshapes the segment before the last one
+            for i in range(max(len(op.points) - 3, 0), len(op.points) - 1):
+                self._index(op, op_bounds("stroke", segment_controls(op.points, i), op.size))
+        else:
+            self._index(op, op_bounds(op.kind, op.points[-2:], op.size))
+
+    def set_points(self, op, points):
+        """Replace an operation's points (e.g. with a simplified stroke) and re-index it."""
+        self._unindex(op)
+        op.points = list(points)
+        op.bounds = None
+        op.cells = set()
+        op.outline = None
+        self._index_points(op)
+        self._mark_changed(op.op_id)
+
+    def restore(self, op):
+        """Put back a previously removed operation under its original id and position."""
+        self.ops[op.op_id] = op
+        self._place(op.op_id)
+        for cell in op.cells:
+            self.cells.setdefault(cell, set()).add(op.op_id)
+        self._mark_changed(op.op_id)
+
+    def watch(self):
+        """
+        Register a further consumer of changes besides the default one (autosave), e.g. the
+        time-lapse recorder. Returns a watcher id for take_changes.
+        """
+        self.watchers.append((set(), set()))
+        return len(self.watchers) - 1
+
+    def take_changes(self, watcher=None):
+        """(changed ids, removed ids) since the last call, for incremental saving."""
+        if watcher is not None:
+            changes = self.watchers[watcher]
+            self.watchers[watcher] = (set(), set())
+            return changes
+        changed, removed = self.changed, self.removed
+        self.changed, self.removed = set(), set()
+        return changed, removed
+
+    def clear_changes(self):
+        """Forget pending changes for every consumer (e.g. after loading a board that is already saved)."""
+        self.changed, self.removed = set(), set()
+        self.watchers = [(set(), set()) for _ in self.watchers]
+
+    def remove(self, op_id):
+        op = self.ops.pop(op_id)
+        order = self.order
+        del order[bisect.bisect_left(order, op_id)]
+        self.changed.discard(op_id)
+        self.removed.add(op_id)
+        for changed, removed in self.watchers:
+            changed.discard(op_id)
+            removed.add(op_id)
+        self._unindex(op)
+        return op
+
+    def query(self, rect):
+        """All operations whose bounds intersect rect (board coordinates), in drawing order."""
+        ids = set()
+        for cell in self._cells_in(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                ids.update(bucket)
+        return [self.ops[i] for i in sorted(ids) if rects_intersect(self.ops[i].bounds, rect)]
+
+    def hit_test(self, point, radius, exclude=()):
+        """
+        Operations whose drawn line passes within radius of point (board units), in drawing
+        order. Eraser passes and ids in exclude are never hit. Candidates come from the cells
+        around point; their outlines are then measured in one vectorized pass.
+        """
+        x, y = point
+        candidates = []
+        circles = []
+        for op in self.query((x - radius, y - radius, x + radius + 1, y + radius + 1)):
+            if op.kind == "erase" or op.op_id in exclude:
+                continue
+            if op.kind == "circle":
+                (cx, cy), (ex, ey) = op.points[0], op.points[1]
+                ring = abs(np.hypot(x - cx, y - cy) - int(np.hypot(ex - cx, ey - cy)))
+                if ring <= radius + op.size / 2:
+                    circles.append(op)
+            else:
+                candidates.append(op)
+        if not candidates:
+            return circles
+
+        # Every candidate's outline segments (a point on its own is a zero-length segment)
+        outlines = [op_outline(op) for op in candidates]
+        starts = np.concatenate([o[:-1] if len(o) > 1 else o for o in outlines])
+        ends = np.concatenate([o[1:] if len(o) > 1 else o for o in outlines])
+        owners = np.repeat(np.arange(len(candidates)), [max(len(o) - 1, 1) for o in outlines])
+        reach = np.array([radius + op.size / 2 for op in candidates])
+
+        d = ends - starts
+        rel = np.array(point, dtype=np.float64) - starts
+        t = np.clip((rel * d).sum(axis=1) / np.maximum((d * d).sum(axis=1), 1e-12), 0.0, 1.0)
+        offset = rel - d * t[:, None]
+        near = (offset * offset).sum(axis=1) <= reach[owners] ** 2
+        hits = {candidates[i].op_id for i in np.unique(owners[near]).tolist()} | {op.op_id for op in circles}
+        return [self.ops[i] for i in sorted(hits)]
+
+    def enclosed(self, rect):
+        """Operations drawn entirely inside rect (board units), in drawing order. Eraser passes are never included."""
+        x1, y1, x2, y2 = rect
+        found = []
+        for op in self.query(rect):
+            if op.kind == "erase":
+                continue
+            if op.kind == "circle":
+                (cx, cy), (ex, ey) = op.points[0], op.points[1]
+                r = int(np.hypot(ex - cx, ey - cy))
+                xs, ys = (cx - r, cx + r), (cy - r, cy + r)
+            else:
+                xs = [p[0] for p in op.points]
+                ys = [p[1] for p in op.points]
+            if x1 <= min(xs) and max(xs) <= x2 and y1 <= min(ys) and max(ys) <= y2:
+                found.append(op)
+        return found
+
+    def _place(self, op_id):
+        """Add an id to the drawing order: appended when it is the newest, else bisected into place."""
+        order = self.order
+        if not order or order[-1] < op_id:
+            order.append(op_id)
+        else:
+            bisect.insort(order, op_id)
+
+    def _mark_changed(self, op_id):
+        self.changed.add(op_id)
+        self.removed.discard(op_id)
+        for changed, removed in self.watchers:
+            changed.add(op_id)
+            removed.discard(op_id)
+
+    def _index_points(self, op):
+        kind, size, points = op.kind, op.size, op.points
+        if kind == "stroke":
+            # Index each spline segment separately (with the neighbours that shape it)
+            # so long diagonal strokes stay in few cells
+            self._index(op, op_bounds(kind, points[:1], size))
+            for i in range(len(points) - 1):
+                self._index(op, op_bounds(kind, segment_controls(points, i), size))
+        elif kind == "erase":
+            self._index(op, op_bounds(kind, points[:1], size))
+            for i in range(1, len(points)):
+                self._index(op, op_bounds(kind, points[i - 1:i + 1], size))
+        else:
+            self._index(op, op_bounds(kind, points, size))
+
+    def _unindex(self, op):
+        for cell in op.cells:
+            bucket = self.cells[cell]
+            bucket.discard(op.op_id)
+            if not bucket:
+                del self.cells[cell]
+
+    def _index(self, op, rect):
+        if op.bounds is None:
+            op.bounds = rect
+        else:
+            b = op.bounds
+            op.bounds = (min(b[0], rect[0]), min(b[1], rect[1]), max(b[2], rect[2]), max(b[3], rect[3]))
+
+        for cell in self._cells_in(rect):
+            op.cells.add(cell)
+            self.cells.setdefault(cell, set()).add(op.op_id)
+
+    def _cells_in(self, rect):
+        cs = self.cell_size
+        for cy in range(int(rect[1] // cs), int((rect[3] - 1) // cs) + 1):
+            for cx in range(int(rect[0] // cs), int((rect[2] - 1) // cs) + 1):
+                yield (cx, cy)
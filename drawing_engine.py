@@ -2,29 +2,104 @@ import cv2
 import numpy as np
 import collections
 import config
+from display_list import DisplayList, rasterize_mask
+from stroke_engine import StrokePath, segment_controls, simplify, spline_samples
+from tile_cache import TileCache
+from sparse_canvas import SparseTileStore, Viewport
+from canvas_history import CanvasHistory
+from palette import Palette
+
+class PenState:
+    """
+    Drawing state of one hand: smoothing window, last point, shape anchor,
+    the stroke/eraser operation in progress and the preview it shows.
+    """
+    def __init__(self):
+        self.smoothing_queue = collections.deque(maxlen=config.SMOOTHING_WINDOW)
+        self.prev_point = None
+        self.start_point = None
+        self.current_op = None
+        self.stroke = None         # StrokePath of the freehand stroke in progress, in tile pixels
+        self.stroke_size = None    # Its thickness in tile pixels
+        self.stroke_tail = collections.deque(maxlen=3) # Its last screen points, for the tail preview
+        self.preview = None # (kind, points, color, size): a shape's [start, end] or a stroke tail's controls
+        self.tool_active = False   # An object eraser or selection pinch is in progress (one undo step)
+        self.select_start = None   # Board point where the selection box or move started
+        self.select_point = None   # Latest board point of that pinch
+        self.moving = False        # The pinch started inside the selection and drags it
 
 class DrawingEngine:
-    def __init__(self, frame_height, frame_width):
+    def __init__(self, frame_height, frame_width, infinite=config.INFINITE_CANVAS, palette=config.PALETTE_CANVAS):
         self.height = frame_height
         self.width = frame_width
-        self.canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        self.smoothing_queue = collections.deque(maxlen=config.SMOOTHING_WINDOW)
-        self.prev_point = None
+
+        # Palette canvas: one uint8 palette index per pixel (0 = no ink) instead of BGR.
+        # Only the dense canvas supports it; infinite-canvas tiles stay BGR.
+        self.palette = Palette() if palette and not infinite else None
+
+        # Per-hand pen state, keyed by hand id (single-hand callers use id 0)
+        self.pens = {}
+        # Moving-average the pen tip over SMOOTHING_WINDOW points; off when the landmarks are
+        # already One-Euro filtered, which would double the lag
+        self.smoothing = not config.LANDMARK_FILTER
         
         # Shape preview specifics
-        self.start_point = None
-        self.preview_canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.preview_canvas = self._new_layer()
+        self.preview_mask = np.zeros((self.height, self.width), dtype=np.uint8) # Compositing scratch
+
+        # Dirty-region bookkeeping: rects are (x1, y1, x2, y2) with exclusive ends
+        self.ink_rect = None       # Bounding box of the ink on canvas (may be loose until refitted)
+        self.ink_rect_stale = False # Ink was erased, undone or re-rendered since ink_rect was fitted
+        self.preview_rects = []    # Bounding boxes of the preview shapes currently on preview_canvas
 
-    def draw(self, current_state, index_tip, dashboard_consumed):
+        # Vector display list is the source of truth; canvas is its tile-cached raster.
+        # Board units are canvas pixels at the size the engine was created with.
+        self.display_list = DisplayList()
+        self.board_width = frame_width
+        self.scale = 1.0           # Canvas pixels per board unit
+
+        if infinite:
+            # Unbounded board: sparse world-pixel tiles (one world pixel per board unit, so
+            # scale stays 1) seen through a pannable/zoomable viewport. There is no dense canvas.
+            self.canvas = None
+            self.ink_mask = None
+            self.tile_cache = SparseTileStore()
+            self.viewport = Viewport(self.width, self.height)
+        else:
+            self._new_canvas()
+            self.viewport = None
+        self.history = CanvasHistory(self.tile_cache)
+        self.grab = None # (hand_id, grabbed world point, hand size, zoom) while a fist is panning the viewport
+        self.selection = [] # Operations picked with the "select" tool
+
+    def draw(self, current_state, index_tip, dashboard_consumed, hand_id=0):
         """
         Handle all drawing/erasing logic on the canvas and preview canvas.
         Requires state dictionary to know tool, size, color, shape, and active gestures.
         Index tip is the raw pixel coordinate returned from HandTracker.
         dashboard_consumed True means we just changed a tool or hovered Dash. DONT DRAW.
+        hand_id selects which hand's pen state to use when several hands draw at once.
         """
-        # Clear preview canvas every frame
-        self.preview_canvas.fill(0)
+        pen = self.pens.get(hand_id)
+        if pen is None:
+            pen = self.pens[hand_id] = PenState()
 
+        # This hand's preview is rebuilt below; other hands' previews are kept
+        pen.preview = None
+        self._update_pen(pen, current_state, index_tip, dashboard_consumed)
+        self._render_previews()
+
+    def release_hand(self, hand_id):
+        """
+        Forget a hand that left the frame, finishing its stroke (a pending shape is dropped;
+        call draw with pinch released first to commit it).
+        """
+        pen = self.pens.pop(hand_id, None)
+        if pen is not None:
+            self._end_action(pen)
+            self._render_previews()
+
+    def _update_pen(self, pen, current_state, index_tip, dashboard_consumed):
         pinch = current_state["pinch_active"]
         flat_hand = current_state.get("flat_hand", False)
 
@@ -32,37 +107,57 @@ class DrawingEngine:
         if flat_hand:
             # Erase by drawing black circle on the main canvas
             # Eraser ignores smoothing and shapes
-            cv2.circle(self.canvas, index_tip, current_state["eraser_size"], config.COLORS["black"], -1)
+            eraser_size = current_state["eraser_size"]
+            op = pen.current_op
+            if op is None or op.kind != "erase" or op.size != self._board_size(eraser_size):
+                # A new eraser pass is a new undoable action
+                self._end_action(pen)
+                pen.current_op = self._add_op("erase", [self._to_board(index_tip)],
+                                               config.COLORS["black"], self._board_size(eraser_size))
+            else:
+                self.display_list.append_point(op, self._to_board(index_tip))
+            rect = self._paint("erase", [index_tip], eraser_size, config.COLORS["black"])
+            self._touch_canvas(rect, adds_ink=False)
             # Reset drawing states so we don't accidentally connect lines after erasing
-            self.smoothing_queue.clear()
-            self.prev_point = None
-            self.start_point = None
+            pen.smoothing_queue.clear()
+            pen.prev_point = None
+            pen.start_point = None
+            return
+
+        # Object eraser and selection work on whole operations instead of pixels
+        if current_state["shape_type"] in ("object_erase", "select"):
+            self._update_object_tool(pen, current_state["shape_type"], pinch and not dashboard_consumed, index_tip)
             return
 
         # If we are over the dashboard or not pinching, reset states and stop
         if dashboard_consumed or not pinch:
-            self.smoothing_queue.clear()
-            self.prev_point = None
+            pen.smoothing_queue.clear()
+            pen.prev_point = None
+            self._end_action(pen)
             
             # If we were drawing a shape and just released the pinch, commit the shape!
-            if self.start_point is not None and not dashboard_consumed:
-                self._commit_shape(current_state, index_tip)
+            if pen.start_point is not None and not dashboard_consumed:
+                self._commit_shape(pen, current_state, index_tip)
             
-            self.start_point = None
+            pen.start_point = None
             return
 
         # --- Active Drawing Logic below ---
 
         # 1. Smooth the point
-        self.smoothing_queue.append(index_tip)
-        smoothed_x = int(sum([p[0] for p in self.smoothing_queue]) / len(self.smoothing_queue))
-        smoothed_y = int(sum([p[1] for p in self.smoothing_queue]) / len(self.smoothing_queue))
-        current_point = (smoothed_x, smoothed_y)
+        if self.smoothing:
+            pen.smoothing_queue.append(index_tip)
+            smoothed_x = int(sum([p[0] for p in pen.smoothing_queue]) / len(pen.smoothing_queue))
+            smoothed_y = int(sum([p[1] for p in pen.smoothing_queue]) / len(pen.smoothing_queue))
+            current_point = (smoothed_x, smoothed_y)
+        else:
+            current_point = tuple(index_tip)
 
         # Set Start Point if beginning a shape or a new line
-        if self.start_point is None:
-            self.start_point = current_point
-            self.prev_point = current_point
+        if pen.start_point is None:
+            pen.start_point = current_point
+            pen.prev_point = current_point
+            self._end_action(pen)
 
         shape_type = current_state["shape_type"]
         color = current_state["pen_color"]
@@ -70,24 +165,33 @@ class DrawingEngine:
 
         # 2. Freehand vs Shapes
         if shape_type == "freehand":
-            # Draw directly to main canvas
-            cv2.line(self.canvas, self.prev_point, current_point, color, size)
-            self.prev_point = current_point
+            # The stroke is a spline through its points. A segment is final once the point after
+            # it is known: that one goes to the main canvas, the newest one is only previewed.
+            if pen.current_op is None:
+                pen.current_op = self._add_op("stroke", [self._to_board(current_point)],
+                                               color, self._board_size(size))
+                pen.stroke = StrokePath()
+                pen.stroke.append(self._to_pixels(current_point))
+                pen.stroke_size = self._pixel_size(size)
+                pen.stroke_tail.clear()
+                pen.stroke_tail.append(current_point)
+                self._touch_canvas(self._paint_pixels("stroke", pen.stroke.points, pen.stroke_size, color))
+            elif current_point != pen.prev_point:
+                self.display_list.append_point(pen.current_op, self._to_board(current_point))
+                pen.stroke.append(self._to_pixels(current_point))
+                pen.stroke_tail.append(current_point)
+                if len(pen.stroke) >= 3:
+                    controls = pen.stroke.controls(len(pen.stroke) - 3)
+                    self._touch_canvas(self._paint_pixels("stroke_segment", controls, pen.stroke_size, color))
+            if len(pen.stroke_tail) >= 2:
+                tail = list(pen.stroke_tail)
+                pen.preview = ("stroke_tail", segment_controls(tail, len(tail) - 2), color, size)
+            pen.prev_point = current_point
         else:
-            # Draw preview onto the temporary preview canvas
-            if shape_type == "line":
-                cv2.line(self.preview_canvas, self.start_point, current_point, color, size)
-            
-            elif shape_type == "rectangle":
-                cv2.rectangle(self.preview_canvas, self.start_point, current_point, color, size)
-            
-            elif shape_type == "circle":
-                # Auto fit circle: radius is distance between start and current
-                radius = int(np.hypot(current_point[0] - self.start_point[0], 
-                                      current_point[1] - self.start_point[1]))
-                cv2.circle(self.preview_canvas, self.start_point, radius, color, size)
-                
-    def _commit_shape(self, current_state, end_point):
+            # Preview is drawn onto the temporary preview canvas by _render_previews
+            pen.preview = (shape_type, [pen.start_point, current_point], color, size)
+
+    def _commit_shape(self, pen, current_state, end_point):
         """
         When pinch is released, draw the final shape permanently onto the canvas.
         """
@@ -95,38 +199,587 @@ class DrawingEngine:
         color = current_state["pen_color"]
         size = current_state["pen_size"]
         
-        if shape_type == "line":
-            cv2.line(self.canvas, self.start_point, end_point, color, size)
-        elif shape_type == "rectangle":
-            cv2.rectangle(self.canvas, self.start_point, end_point, color, size)
-        elif shape_type == "circle":
-            radius = int(np.hypot(end_point[0] - self.start_point[0], 
-                                  end_point[1] - self.start_point[1]))
-            cv2.circle(self.canvas, self.start_point, radius, color, size)
+        if shape_type not in ("line", "rectangle", "circle"):
+            return
+
+        points = [pen.start_point, end_point]
+        self._add_op(shape_type, [self._to_board(p) for p in points], color, self._board_size(size))
+        self._touch_canvas(self._paint(shape_type, points, size, color))
+        self._end_action(pen)
+
+    def _update_object_tool(self, pen, tool, active, index_tip):
+        """
+        Tools that work on whole strokes and shapes, used by pinching. "object_erase" deletes
+        every operation under the fingertip (the whole selection if one of them is selected).
+        "select" drags a selection box, or moves the selection when the pinch starts inside it.
+        One pinch is one undoable action.
+        """
+        pen.smoothing_queue.clear()
+        pen.prev_point = None
+        pen.start_point = None
+        if not active:
+            if pen.select_start is not None:
+                self._finish_selection(pen)
+            if pen.tool_active or pen.current_op is not None:
+                self._end_action(pen)
+            return
+        if pen.current_op is not None:
+            self._end_action(pen) # Stroke from before the tool was switched
+        pen.tool_active = True
+        point = self._to_board(index_tip)
+
+        if tool == "object_erase":
+            busy = {p.current_op.op_id for p in self.pens.values() if p.current_op is not None}
+            hits = self.display_list.hit_test(point, self._board_size(config.OBJECT_ERASER_RADIUS), exclude=busy)
+            selected = {op.op_id for op in self.selection}
+            if any(op.op_id in selected for op in hits):
+                hits = self.selection + [op for op in hits if op.op_id not in selected]
+            if hits:
+                self._remove_ops(hits)
+            return
+
+        if pen.select_start is None:
+            bounds = self._selection_bounds()
+            pen.moving = bounds is not None and bounds[0] <= point[0] < bounds[2] and bounds[1] <= point[1] < bounds[3]
+            pen.select_start = point
+        pen.select_point = point
+        if not pen.moving:
+            pen.preview = ("rectangle", [self._to_screen(pen.select_start), index_tip], config.SELECTION_COLOR, 1)
+
+    def _finish_selection(self, pen):
+        """
+        End a "select" pinch at its last pinched point (the release frame may have no hand):
+        move the selection by the drag, or select what the box encloses.
+        """
+        (sx, sy), (ex, ey) = pen.select_start, pen.select_point
+        pen.select_start = pen.select_point = None
+        if pen.moving:
+            pen.moving = False
+            if (ex, ey) != (sx, sy) and self.selection:
+                self.selection = self._move_ops(self.selection, ex - sx, ey - sy)
+        else:
+            self.selection = self.display_list.enclosed((min(sx, ex), min(sy, ey), max(sx, ex), max(sy, ey)))
+
+    def _selection_bounds(self):
+        """Union of the selected operations' bounds (board units), or None."""
+        if not self.selection:
+            return None
+        bounds = [op.bounds for op in self.selection]
+        return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+                max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+    def delete_selection(self):
+        """Delete the selected operations as one undoable action. Returns False if nothing was selected."""
+        if not self.selection:
+            return False
+        self._end_all_actions()
+        self._remove_ops(self.selection)
+        self.history.commit()
+        self._render_previews()
+        return True
 
-    def render_overlay(self, frame):
+    def _remove_ops(self, ops):
+        """Delete operations as part of the current action and re-render only the area they covered."""
+        removed = set()
+        for op in ops:
+            self.display_list.remove(op.op_id)
+            self.history.record_removed(op)
+            removed.add(op.op_id)
+        self.selection = [op for op in self.selection if op.op_id not in removed]
+        self._rerender([op.bounds for op in ops])
+
+    def _move_ops(self, ops, dx, dy):
+        """
+        Replace operations with copies shifted by (dx, dy) board units, as part of the current
+        action. The copies are drawn on top of everything else. Returns the copies.
+        """
+        moved = []
+        for op in ops:
+            self.display_list.remove(op.op_id)
+            self.history.record_removed(op)
+            moved.append(self._add_op(op.kind, [(p[0] + dx, p[1] + dy) for p in op.points], op.color, op.size))
+        self._rerender([op.bounds for op in ops] + [op.bounds for op in moved])
+        return moved
+
+    def undo(self):
+        """
+        Revert the most recent stroke, committed shape, eraser pass, deletion or move.
+        Returns False if there was nothing to undo.
+        """
+        self._end_all_actions()
+        entry = self.history.pop_undo()
+        if entry is None:
+            return False
+        self.selection = []
+        for op in entry["added"]:
+            self.display_list.remove(op.op_id)
+        for op in entry["removed"]:
+            self.display_list.restore(op)
+        self._restore_tiles(entry, 0)
+        return True
+
+    def redo(self):
+        """
+        Re-apply the most recently undone action. Returns False if there was nothing to redo.
+        """
+        self._end_all_actions()
+        entry = self.history.pop_redo()
+        if entry is None:
+            return False
+        self.selection = []
+        for op in entry["removed"]:
+            self.display_list.remove(op.op_id)
+        for op in entry["added"]:
+            self.display_list.restore(op)
+        self._restore_tiles(entry, 1)
+        return True
+
+    def _restore_tiles(self, entry, which):
+        """Write back the before (which=0) or after (which=1) copies of an entry's tiles."""
+        self.ink_rect_stale = True
+        if entry["tiles"] is None:
+            # Recorded before a resize: re-render the area of the entry's operations instead
+            for op in entry["added"] + entry["removed"]:
+                self.tile_cache.invalidate(self._pixel_rect(op.bounds))
+            self._render_dirty()
+            return
+        for key, snapshots in entry["tiles"].items():
+            self._touch_canvas(self.tile_cache.write_tile(key, snapshots[which]))
+
+    def resize(self, frame_height, frame_width):
+        """
+        Switch to a new canvas resolution and re-rasterize the board from the display list.
+        Strokes in progress are finished first; a shape not yet committed is dropped.
+        On the infinite canvas only the viewport changes; the world tiles are kept.
+        """
+        self._end_all_actions()
+        self.height = frame_height
+        self.width = frame_width
+        if self.viewport is not None:
+            self.viewport.resize(frame_width, frame_height)
+            self.preview_canvas = self._new_layer()
+            self.preview_mask = np.zeros((self.height, self.width), dtype=np.uint8)
+            self.pens.clear()
+            self.preview_rects = []
+            self.grab = None
+            self.selection = []
+            return
+
+        self.scale = frame_width / self.board_width
+        self._new_canvas()
+        self.preview_canvas = self._new_layer()
+        self.preview_mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        # Tile snapshots are only valid at the resolution they were taken at
+        self.history.rebase(self.tile_cache)
+
+        self.pens.clear()
+        self.preview_rects = []
+        self.selection = []
+        self.redraw()
+
+    def _new_layer(self):
+        """Blank canvas-sized layer: palette indices, or BGR."""
+        if self.palette is not None:
+            return np.zeros((self.height, self.width), dtype=np.uint8)
+        return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+    def _new_canvas(self):
+        self.canvas = self._new_layer()
+        if self.palette is not None:
+            self.ink_mask = self.canvas # Index 0 is blank, so the indices are the ink mask
+        else:
+            self.ink_mask = np.zeros((self.height, self.width), dtype=np.uint8) # 255 where canvas has ink
+        self.tile_cache = TileCache(self.canvas, palette=self.palette)
+
+    def redraw(self, rect=None):
+        """
+        Re-render the tiles overlapping rect (canvas pixels), or the whole canvas, from the display list.
+        On the infinite canvas rect is in world pixels and the whole board means every operation's area.
+        """
+        if self.viewport is not None:
+            if rect is None:
+                self.tile_cache.clear()
+                for op in self.display_list:
+                    self.tile_cache.invalidate(op.bounds)
+            else:
+                self.tile_cache.invalidate(rect)
+        else:
+            if rect is None:
+                self.ink_rect = None
+            self.tile_cache.invalidate(rect)
+        self._render_dirty()
+
+    def _rerender(self, board_rects):
+        """Re-render the tiles under display-list bounds (board units) as part of the current undoable action."""
+        for bounds in board_rects:
+            rect = self._pixel_rect(bounds)
+            self.history.before_paint(rect)
+            self.tile_cache.invalidate(rect)
+        self._render_dirty()
+
+    def _render_dirty(self):
+        rendered = self.tile_cache.render_dirty(self.display_list, self.scale)
+        if self.viewport is None:
+            self.ink_rect_stale = True
+            for tile_rect in rendered:
+                x1, y1, x2, y2 = tile_rect
+                self._touch_canvas(tile_rect, adds_ink=bool(self.canvas[y1:y2, x1:x2].any()))
+
+    def load_board(self, ops, tiles=None, board_width=None):
+        """
+        Replace the board with saved display-list operations (in drawing order) on a freshly
+        created engine. tiles {key: pixels} are written back directly when they were saved
+        from a canvas like this one; otherwise the board is re-rendered from the operations.
+        Undo history starts empty.
+        """
+        if board_width is not None and self.viewport is None:
+            self.board_width = board_width
+            self.scale = self.width / board_width
+        self.display_list = DisplayList()
+        for op in ops:
+            self.display_list.insert(op)
+        self.pens.clear()
+        self.history.clear()
+        self.selection = []
+
+        if tiles is None:
+            self.redraw()
+        else:
+            for key, pixels in tiles.items():
+                self._touch_canvas(self.tile_cache.write_tile_image(key, pixels))
+
+        # What was just loaded is already saved
+        self.display_list.clear_changes()
+        self.tile_cache.clear_changes()
+
+    def pan_zoom(self, anchor, hand_size, hand_id=0):
+        """
+        Grab-and-drag the infinite canvas: the world point first grabbed stays under anchor
+        (screen pixels) and the zoom follows the hand's apparent size (moving the fist
+        toward the camera zooms in). Returns False when there is no viewport to move.
+        """
+        if self.viewport is None or hand_size <= 0:
+            return False
+        if self.grab is None:
+            self.grab = (hand_id, self.viewport.to_world(anchor), hand_size, self.viewport.zoom)
+        grab_id, (wx, wy), start_size, start_zoom = self.grab
+        if grab_id != hand_id:
+            return False # Another hand is already holding the board
+
+        ratio = hand_size / start_size
+        deadband = config.ZOOM_DEADBAND
+        zoom = start_zoom
+        if ratio > 1 + deadband:
+            zoom = start_zoom * ratio / (1 + deadband)
+        elif ratio < 1 - deadband:
+            zoom = start_zoom * ratio / (1 - deadband)
+
+        viewport = self.viewport
+        viewport.zoom = min(max(zoom, config.ZOOM_MIN), config.ZOOM_MAX)
+        viewport.x = wx - anchor[0] / viewport.zoom
+        viewport.y = wy - anchor[1] / viewport.zoom
+        return True
+
+    def release_grab(self, hand_id=0):
+        if self.grab is not None and self.grab[0] == hand_id:
+            self.grab = None
+
+    def zoom_view(self, factor, anchor=None):
+        """Zoom the infinite canvas by factor around anchor (default: screen center)."""
+        if self.viewport is None:
+            return
+        if anchor is None:
+            anchor = (self.width / 2, self.height / 2)
+        self.viewport.zoom_at(anchor, self.viewport.zoom * factor)
+
+    def board_image(self):
+        """
+        The board as an image: the canvas, or on the infinite canvas every inked tile at zoom 1
+        (a 1x1 black image for a blank board).
+        """
+        if self.viewport is None:
+            return self.canvas.copy() if self.palette is None else self.palette.colors(self.canvas)
+        image = self.tile_cache.to_image()
+        return image if image is not None else np.zeros((1, 1, 3), dtype=np.uint8)
+
+    def _add_op(self, kind, points, color, size):
+        op = self.display_list.add(kind, points, color, size)
+        self.history.record_added(op)
+        return op
+
+    def _end_action(self, pen):
+        """
+        Finish this hand's stroke/eraser pass. Strokes from several hands that overlap in
+        time form one undo step, committed once no hand is mid-operation.
+        """
+        self._finish_stroke(pen)
+        self._drop_tool(pen)
+        if not any(p.current_op is not None or p.tool_active for p in self.pens.values()):
+            self.history.commit()
+
+    def _end_all_actions(self):
+        for pen in self.pens.values():
+            self._finish_stroke(pen)
+            self._drop_tool(pen)
+        self.history.commit()
+
+    def _drop_tool(self, pen):
+        """Forget pen's operation in progress and any unfinished selection box or move."""
+        pen.current_op = None
+        pen.tool_active = False
+        pen.select_start = pen.select_point = None
+        pen.moving = False
+
+    def _finish_stroke(self, pen):
+        """
+        Paint the last segment of pen's freehand stroke, then keep the stroke simplified in the
+        display list and redo the tiles it inks from the undo action's snapshots.
+        """
+        stroke, op = pen.stroke, pen.current_op
+        if stroke is None:
+            return
+        pen.stroke = None
+        pen.stroke_tail.clear()
+        pen.preview = None
+        if len(stroke) >= 2:
+            controls = stroke.controls(len(stroke) - 2)
+            self._touch_canvas(self._paint_pixels("stroke_segment", controls, pen.stroke_size, op.color))
+
+        keep = simplify(op.points)
+        if len(keep) == len(op.points) or op.op_id not in self.display_list.ops:
+            return
+        keys = self._inked_tiles(op)[0]
+        self.display_list.set_points(op, [op.points[i] for i in keep])
+        new_keys, ink = self._inked_tiles(op)
+        keys |= new_keys
+
+        # The snapshots plus the ops the action added are the board, unless it also removed ops
+        pending = self.history.pending
+        removed = [self._pixel_rect(r.bounds) for r in pending["removed"]]
+        added = [(a, ink if a is op else self._inked_tiles(a)[1])
+                 for a in pending["added"] if a.op_id in self.display_list.ops]
+        for key in keys:
+            x1, y1, x2, y2 = tile = self.tile_cache.tile_rect(key)
+            self.history.before_paint(tile)
+            if any(r[0] < x2 and x1 < r[2] and r[1] < y2 and y1 < r[3] for r in removed):
+                self.tile_cache.invalidate(tile)
+                continue
+            self._touch_canvas(self.tile_cache.write_tile(key, pending["tiles"][key]))
+            for a, (mask, x0, y0) in added:
+                rect = self.tile_cache.paint(mask, x0, y0, a.color, clip=tile)
+                if rect is not None:
+                    self._touch_canvas(rect)
+        self._render_dirty()
+
+    def _inked_tiles(self, op):
+        """(keys of the tiles op puts ink on, (mask, x0, y0) of that ink) at the current scale."""
+        points, size = op.scaled(self.scale)
+        mask, x0, y0 = rasterize_mask(op.kind, points, size)
+        x, y, w, h = cv2.boundingRect(mask) # The mask's margin is conservative; keep only its ink
+        mask, x0, y0 = mask[y:y + h, x:x + w], x0 + x, y0 + y
+        keys = set()
+        for key in self.tile_cache.tile_keys((x0, y0, x0 + w, y0 + h)):
+            tx1, ty1, tx2, ty2 = self.tile_cache.tile_rect(key)
+            if mask[max(ty1 - y0, 0):ty2 - y0, max(tx1 - x0, 0):tx2 - x0].any():
+                keys.add(key)
+        return keys, (mask, x0, y0)
+
+    def _pixel_rect(self, bounds):
+        """Board-unit bounds -> the tile-pixel rect covering them, with a pixel of rounding margin."""
+        x1, y1, x2, y2 = bounds
+        s = self.scale
+        return (int(np.floor(x1 * s)) - 1, int(np.floor(y1 * s)) - 1,
+                int(np.ceil(x2 * s)) + 2, int(np.ceil(y2 * s)) + 2)
+
+    def _to_board(self, point):
+        """Canvas (screen) pixel -> board coordinates."""
+        if self.viewport is not None:
+            return self.viewport.to_world(point)
+        if self.scale == 1.0:
+            return (point[0], point[1])
+        return (point[0] / self.scale, point[1] / self.scale)
+
+    def _to_screen(self, point):
+        """Board coordinates -> screen pixel (the inverse of _to_board)."""
+        if self.viewport is not None:
+            return self.viewport.to_screen(point)
+        return (int(round(point[0] * self.scale)), int(round(point[1] * self.scale)))
+
+    def _board_size(self, size):
+        """Screen thickness -> board units. On the infinite canvas this is the painted world thickness."""
+        if self.viewport is not None:
+            return max(1, int(round(size / self.viewport.zoom)))
+        return size / self.scale
+
+    def _to_pixels(self, point):
+        """
+        Screen point -> the pixel the tiles are painted at: the canvas pixel itself, or on the
+        infinite canvas the world pixel, exactly as the operation will later be replayed.
+        """
+        if self.viewport is None:
+            return (int(point[0]), int(point[1]))
+        x, y = self.viewport.to_world(point)
+        return (int(round(x)), int(round(y)))
+
+    def _pixel_size(self, size):
+        """Screen thickness -> thickness in tile pixels."""
+        return self._board_size(size) if self.viewport is not None else size
+
+    def _paint(self, kind, points, size, color):
+        """
+        Rasterize one operation (canvas pixel coordinates) onto the canvas.
+        Goes through the same unclipped mask as tile re-rendering so both give identical pixels.
+        """
+        return self._paint_pixels(kind, [self._to_pixels(p) for p in points], self._pixel_size(size), color)
+
+    def _paint_pixels(self, kind, points, size, color):
+        """Like _paint, with points and size already in tile pixels (see _to_pixels)."""
+        mask, x0, y0 = rasterize_mask(kind, points, size)
+        self.history.before_paint((x0, y0, x0 + mask.shape[1], y0 + mask.shape[0]))
+        return self.tile_cache.paint(mask, x0, y0, color)
+
+    def _clip_rect(self, x1, y1, x2, y2):
+        """Clip a rect to the canvas. Returns None if nothing is left."""
+        x1, y1 = max(int(x1), 0), max(int(y1), 0)
+        x2, y2 = min(int(x2), self.width), min(int(y2), self.height)
+        if x1 >= x2 or y1 >= y2:
+            return None
+        return (x1, y1, x2, y2)
+
+    def _points_rect(self, points, size):
+        """Bounding box of a polyline/rectangle drawn with the given thickness."""
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        pad = size + 1
+        return self._clip_rect(min(xs) - pad, min(ys) - pad, max(xs) + pad + 1, max(ys) + pad + 1)
+
+    def _circle_rect(self, center, radius, size):
+        pad = radius + size + 1
+        return self._clip_rect(center[0] - pad, center[1] - pad, center[0] + pad + 1, center[1] + pad + 1)
+
+    def _shape_rect(self, shape_type, start_point, end_point, size):
+        if shape_type == "circle":
+            radius = int(np.hypot(end_point[0] - start_point[0], end_point[1] - start_point[1]))
+            return self._circle_rect(start_point, radius, size)
+        return self._points_rect((start_point, end_point), size)
+
+    def _touch_canvas(self, rect, adds_ink=True):
+        """
+        Refresh the persistent ink mask inside rect after the canvas was drawn on there.
+        Erasing only clears ink, so instead of growing ink_rect it marks it for refitting.
+        """
+        if rect is None or self.viewport is not None:
+            return # Sparse tiles keep their own ink masks
+        x1, y1, x2, y2 = rect
+        if self.palette is None: # Palette indices are their own ink mask
+            gray = cv2.cvtColor(self.canvas[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+            cv2.threshold(gray, 1, 255, cv2.THRESH_BINARY, dst=self.ink_mask[y1:y2, x1:x2])
+
+        if not adds_ink:
+            self.ink_rect_stale = True
+            return
+        if self.ink_rect is None:
+            self.ink_rect = rect
+        else:
+            ix1, iy1, ix2, iy2 = self.ink_rect
+            self.ink_rect = (min(ix1, x1), min(iy1, y1), max(ix2, x2), max(iy2, y2))
+
+    def _render_previews(self):
+        """
+        Redraw every hand's shape or stroke-tail preview, clearing only the areas last frame's previews covered.
+        """
+        for x1, y1, x2, y2 in self.preview_rects:
+            self.preview_canvas[y1:y2, x1:x2] = 0
+        self.preview_rects = []
+
+        for pen in self.pens.values():
+            if pen.preview is None:
+                continue
+            shape_type, points, color, size = pen.preview
+            if self.palette is not None:
+                color = self.palette.index(color)
+            if shape_type == "stroke_tail":
+                # Newest stroke segment, drawn in screen pixels until the next point makes it final
+                samples = spline_samples([points])
+                cv2.polylines(self.preview_canvas, [samples], False, color, size)
+                rect = self._points_rect(samples.tolist(), size)
+                if rect is not None:
+                    self.preview_rects.append(rect)
+                continue
+
+            start_point, end_point = points
+            if shape_type == "line":
+                cv2.line(self.preview_canvas, start_point, end_point, color, size)
+
+            elif shape_type == "rectangle":
+                cv2.rectangle(self.preview_canvas, start_point, end_point, color, size)
+
+            elif shape_type == "circle":
+                # Auto fit circle: radius is distance between start and current
+                radius = int(np.hypot(end_point[0] - start_point[0],
+                                      end_point[1] - start_point[1]))
+                cv2.circle(self.preview_canvas, start_point, radius, color, size)
+
+            rect = self._shape_rect(shape_type, start_point, end_point, size)
+            if rect is not None:
+                self.preview_rects.append(rect)
+
+        # Box around the selection, following a move in progress
+        bounds = self._selection_bounds()
+        if bounds is not None:
+            dx = dy = 0
+            for pen in self.pens.values():
+                if pen.moving and pen.select_point is not None:
+                    dx, dy = pen.select_point[0] - pen.select_start[0], pen.select_point[1] - pen.select_start[1]
+            start_point = self._to_screen((bounds[0] + dx, bounds[1] + dy))
+            end_point = self._to_screen((bounds[2] + dx, bounds[3] + dy))
+            color = config.SELECTION_COLOR if self.palette is None else self.palette.index(config.SELECTION_COLOR)
+            cv2.rectangle(self.preview_canvas, start_point, end_point, color, 1)
+            rect = self._points_rect((start_point, end_point), 1)
+            if rect is not None:
+                self.preview_rects.append(rect)
+
+    def render_overlay(self, frame, out=None):
         """
         Merge the permanent canvas and the preview canvas with the main video frame.
+        The result is composited onto frame in place, or into out if given.
         """
-        # Convert black pixels to transparent (by using a mask, or addWeighted if canvas has black background)
-        # Using simple mask addition since canvas uses 0 for blank space
-        
+        # Canvas uses 0 for blank space, so the ink mask marks which pixels replace the frame.
+        # Only the region that holds ink (and the live preview shape) is touched.
+        final_frame = frame
+        if out is not None and out is not frame:
+            np.copyto(out, frame)
+            final_frame = out
+        if self.ink_rect_stale and self.viewport is None:
+            self._fit_ink_rect()
+
         # 1. Add permanent canvas
-        mask_canvas = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2GRAY)
-        _, mask_canvas = cv2.threshold(mask_canvas, 1, 255, cv2.THRESH_BINARY)
-        mask_canvas_inv = cv2.bitwise_not(mask_canvas)
-        
-        # Black-out the area of drawing in the frame
-        frame_bg = cv2.bitwise_and(frame, frame, mask=mask_canvas_inv)
-        # Add the drawing
-        frame_canvas = cv2.add(frame_bg, self.canvas)
-        
+        if self.viewport is not None:
+            self.tile_cache.composite(final_frame, self.viewport)
+        elif self.ink_rect is not None:
+            x1, y1, x2, y2 = self.ink_rect
+            self._composite(self.canvas[y1:y2, x1:x2], self.ink_mask[y1:y2, x1:x2], final_frame[y1:y2, x1:x2])
+
         # 2. Add preview canvas on top
-        mask_preview = cv2.cvtColor(self.preview_canvas, cv2.COLOR_BGR2GRAY)
-        _, mask_preview = cv2.threshold(mask_preview, 1, 255, cv2.THRESH_BINARY)
-        mask_preview_inv = cv2.bitwise_not(mask_preview)
-        
-        frame_canvas_bg = cv2.bitwise_and(frame_canvas, frame_canvas, mask=mask_preview_inv)
-        final_frame = cv2.add(frame_canvas_bg, self.preview_canvas)
-        
+        for x1, y1, x2, y2 in self.preview_rects:
+            preview = self.preview_canvas[y1:y2, x1:x2]
+            if self.palette is not None:
+                self._composite(preview, preview, final_frame[y1:y2, x1:x2])
+                continue
+            mask_preview = cv2.cvtColor(preview, cv2.COLOR_BGR2GRAY, dst=self.preview_mask[y1:y2, x1:x2])
+            cv2.threshold(mask_preview, 1, 255, cv2.THRESH_BINARY, dst=mask_preview)
+            cv2.copyTo(preview, mask_preview, final_frame[y1:y2, x1:x2])
+
         return final_frame
+
+    def _fit_ink_rect(self):
+        """Shrink ink_rect to the ink actually left on the canvas."""
+        x, y, w, h = cv2.boundingRect(self.ink_mask)
+        self.ink_rect = (x, y, x + w, y + h) if w else None
+        self.ink_rect_stale = False
+
+    def _composite(self, layer, mask, dst):
+        """Copy a canvas layer's inked pixels (mask nonzero) onto dst, looking up palette colors."""
+        if self.palette is not None:
+            layer = self.palette.colors(layer, reuse=True)
+        cv2.copyTo(layer, mask, dst)
@@ -0,0 +1,118 @@
+"""
+Frame-budget governor for the live loop.
+
+Every frame has 1000 / TARGET_FPS ms. The governor measures how long the loop works on each
+frame (waiting for the camera does not count) and decides once per window of frames:
+- median over budget: step down one quality level
+- median under GOVERNOR_HEADROOM of the budget for GOVERNOR_RECOVER_WINDOWS windows: step back up
+
+Levels are cumulative: level n applies the first n entries of GOVERNOR_LEVELS.
+- "inference_scale": hand inference runs on frames shrunk by GOVERNOR_INFERENCE_SCALE
+- "toolbar_auto_hide": the toolbar is only drawn while a fingertip is near it
+- "alternate_inference": hand inference runs on every other frame
+- "frame_width": the working resolution drops by GOVERNOR_WIDTH_SCALE (not in the default levels:
+  every change re-rasterizes the whole board)
+
+If frames go over budget in the first window after a climb, the next climb waits for twice
+as many calm windows (up to 8x), so a machine on the edge settles instead of flapping.
+"""
+import time
+import config
+
+LEVEL_NAMES = ("inference_scale", "toolbar_auto_hide", "alternate_inference", "frame_width")
+MAX_RECOVER_FACTOR = 8
+
+class FrameGovernor:
+    """
+    Call start_frame() when a frame's work starts and end_frame() when it is done; end_frame
+    returns True when the level changed, and settings() then describes what to apply.
+    changes lists every level change as (frame number, old level, new level, window median ms).
+    """
+    def __init__(self, target_fps=config.TARGET_FPS, levels=config.GOVERNOR_LEVELS, window=config.GOVERNOR_WINDOW,
+                 headroom=config.GOVERNOR_HEADROOM, recover_windows=config.GOVERNOR_RECOVER_WINDOWS, clock=time.perf_counter):
+        unknown = [name for name in levels if name not in LEVEL_NAMES]
+        if unknown:
+            raise ValueError(f"Unknown governor levels {unknown}, expected names from {LEVEL_NAMES}")
+        self.budget_ms = 1000.0 / target_fps
+        self.levels = ("full",) + tuple(levels)
+        self.window = window
+        self.headroom = headroom
+        self.recover_windows = recover_windows
+        self.recover_needed = recover_windows
+        self.clock = clock
+
+        self.level = 0
+        self.frames = 0
+        self.samples = [] # Frame times (ms) of the current window
+        self.calm_windows = 0
+        self.windows_at_level = 0
+        self.climbed = False # The current level was reached by stepping up
+        self.changes = []
+        self.started = None
+
+    @property
+    def name(self):
+        return self.levels[self.level]
+
+    def active(self, name):
+        """True if the level called name is applied at the current level."""
+        return name in self.levels[1:self.level + 1]
+
+    def settings(self):
+        """What the current level asks of the loop."""
+        return {
+            "inference_scale": config.GOVERNOR_INFERENCE_SCALE if self.active("inference_scale") else 1.0,
+            "toolbar_auto_hide": self.active("toolbar_auto_hide"),
+            "inference_interval": 2 if self.active("alternate_inference") else 1,
+            "width_scale": config.GOVERNOR_WIDTH_SCALE if self.active("frame_width") else 1.0
+        }
+
+    def start_frame(self):
+        self.started = self.clock()
+
+    def end_frame(self):
+        """Record the frame started by start_frame(). Returns True if the level changed."""
+        if self.started is None:
+            return False
+        frame_ms = (self.clock() - self.started) * 1000.0
+        self.started = None
+        return self.record(frame_ms)
+
+    def record(self, frame_ms):
+        """Add one frame time in ms; decides at the end of every window. Returns True if the level changed."""
+        self.frames += 1
+        self.samples.append(frame_ms)
+        if len(self.samples) < self.window:
+            return False
+
+        median = sorted(self.samples)[len(self.samples) // 2]
+        self.samples.clear()
+        self.windows_at_level += 1
+
+        if median > self.budget_ms:
+            self.calm_windows = 0
+            if self.level + 1 < len(self.levels):
+                if self.climbed and self.windows_at_level == 1:
+                    # Climbing back was too optimistic: wait longer next time
+                    self.recover_needed = min(self.recover_needed * 2, self.recover_windows * MAX_RECOVER_FACTOR)
+                self._change(self.level + 1, median, climbed=False)
+                return True
+        elif median < self.budget_ms * self.headroom:
+            self.calm_windows += 1
+            if self.level > 0 and self.calm_windows >= self.recover_needed:
+                self.calm_windows = 0
+                self._change(self.level - 1, median, climbed=True)
+                return True
+        else:
+            self.calm_windows = 0
+        return False
+
+    def describe(self):
+        """One line about the current level, for the screen and the console."""
+        return f"Quality level {self.level}/{len(self.levels) - 1}: {self.name}"
+
+    def _change(self, level, median, climbed):
+        self.changes.append((self.frames, self.level, level, median))
+        self.level = level
+        self.climbed = climbed
+        self.windows_at_level = 0
@@ -0,0 +1,300 @@
+import cv2
+import queue
+import threading
+import contextlib
+import copy
+import numpy as np
+import config
+from landmarks import NUM_LANDMARKS
+
+_NO_STAGE = contextlib.nullcontext()
+
+def _stage(timer, name):
+    """Context manager timing one stage, or a shared no-op if no timer is attached."""
+    return timer.stage(name) if timer is not None else _NO_STAGE
+
+def prepare_frame(frame, width, height, pool=None):
+    """
+    Mirror (if enabled) and resize a raw capture frame to the working resolution.
+    With a BufferPool the result is written into the pool's "frame" buffer (reused next call).
+    A frame that already has the working size is not resized (nor copied, without FLIP_FRAME).
+    """
+    if frame.shape[1] == width and frame.shape[0] == height:
+        if not config.FLIP_FRAME:
+            return frame
+        return cv2.flip(frame, 1, dst=None if pool is None else pool.get("frame", frame.shape))
+
+    # Flip the frame horizontally for mirror effect
+    if config.FLIP_FRAME:
+        frame = cv2.flip(frame, 1, dst=None if pool is None else pool.get("flip", frame.shape))
+
+    # Resize for performance and sizing consistency
+    if pool is None:
+        return cv2.resize(frame, (width, height))
+    return cv2.resize(frame, (width, height), dst=pool.get("frame", (height, width) + frame.shape[2:]))
+
+def _hand_size(landmarks_data):
+    """Wrist to middle finger MCP distance in pixels (the gesture detector's hand-size measure)."""
+    (wx, wy), (mx, my) = landmarks_data["wrist"], landmarks_data["middle_mcp"]
+    return float(np.hypot(mx - wx, my - wy))
+
+def update_board(frame, landmarks_data, state, gesture_detector, dashboard, drawing_engine, timer=None, out=None):
+    """
+    Run gestures -> dashboard -> drawing for one frame and return the composited output.
+    landmarks_data is whatever HandTracker.process_frame returned for this frame (or None).
+    The cursor and the dashboard are drawn onto the frame in place.
+    timer, if given, must provide stage(name) returning a context manager (see perf_monitor).
+    The overlay is composited onto frame in place unless out is given (see DrawingEngine.render_overlay).
+    """
+    dashboard_consumed = False
+
+    if landmarks_data:
+        # Extract specific landmarks
+        index_tip = landmarks_data["index_tip"]
+
+        # Detect Gestures
+        with _stage(timer, "gestures"):
+            gestures = gesture_detector.detect_gestures(landmarks_data)
+
+        # Update state with gesture data
+        state["pinch_active"] = gestures["pinch"]
+        state["flat_hand"] = gestures["flat_hand"]
+
+        # On the infinite canvas a fist grabs the board to pan/zoom, and never draws
+        grabbing = gestures["grab"] and drawing_engine.viewport is not None
+        if grabbing:
+            state["pinch_active"] = False
+            state["flat_hand"] = False
+
+        # Handle Dashboard Interactions
+        # Dashboard interaction takes precedence over drawing
+        with _stage(timer, "dashboard_input"):
+            dashboard_consumed = dashboard.process_interaction(
+                index_tip=index_tip,
+                is_pinching=state["pinch_active"],
+                current_state=state
+            )
+
+        # Handle Drawing Logic
+        with _stage(timer, "draw"):
+            drawing_engine.draw(
+                current_state=state,
+                index_tip=index_tip,
+                dashboard_consumed=dashboard_consumed
+            )
+            if grabbing:
+                drawing_engine.pan_zoom(landmarks_data["middle_mcp"], _hand_size(landmarks_data))
+            else:
+                drawing_engine.release_grab()
+
+        # Optional: Draw cursor for user feedback (a small hollow circle at index tip)
+        if not dashboard_consumed:
+            _draw_cursor(frame, index_tip, state)
+    else:
+        # Reset gestures if no hand found
+        state["pinch_active"] = False
+        state["flat_hand"] = False
+
+        # Finalize any pending shape if hand is lost mid-draw
+        with _stage(timer, "draw"):
+            drawing_engine.draw(
+                current_state=state,
+                index_tip=(0, 0), # Dummy tip
+                dashboard_consumed=False
+            )
+            drawing_engine.release_grab()
+
+    # Render Dashboard (Visuals)
+    with _stage(timer, "dashboard_render"):
+        dashboard.render(frame, state)
+
+    # Render Composite Frame (Canvas overlay)
+    with _stage(timer, "overlay"):
+        return drawing_engine.render_overlay(frame, out)
+
+def _draw_cursor(frame, index_tip, state):
+    """Small hollow circle at the index tip (solid while pinching)."""
+    cursor_color = state["pen_color"] if not state["flat_hand"] else config.COLORS["white"]
+    cursor_thickness = -1 if state["pinch_active"] else 2
+    cursor_radius = state["pen_size"] if not state["flat_hand"] else state["eraser_size"]
+    if state["shape_type"] == "object_erase" and not state["flat_hand"]:
+        cursor_radius = config.OBJECT_ERASER_RADIUS # What the object eraser picks up from
+    cv2.circle(frame, index_tip, cursor_radius, cursor_color, cursor_thickness)
+
+def update_board_multi(frame, hands, hand_states, gesture_detector, dashboard, drawing_engine, timer=None, out=None):
+    """
+    Multi-hand version of update_board. hands is the list returned by
+    HandTracker.process_frame_multi; every hand draws with its own pen and tool state.
+    hand_states maps hand_id -> state dictionary and is updated in place (new hands start
+    from config.INITIAL_STATE, hands that left the frame are finalized and dropped).
+    Gestures for all hands are classified in one batched pass.
+    """
+    if hands:
+        with _stage(timer, "gestures"):
+            points = np.stack([np.asarray(hand["landmarks"][:NUM_LANDMARKS]) for hand in hands])
+            gestures = gesture_detector.detect_gestures_batch(points)
+            pinch = np.atleast_1d(gestures["pinch"])
+            flat_hand = np.atleast_1d(gestures["flat_hand"])
+            grab = np.atleast_1d(gestures["grab"]) & (drawing_engine.viewport is not None)
+
+    seen = set()
+    for i, hand in enumerate(hands):
+        hand_id = hand["hand_id"]
+        seen.add(hand_id)
+        state = hand_states.get(hand_id)
+        if state is None:
+            state = hand_states[hand_id] = copy.deepcopy(config.INITIAL_STATE)
+
+        index_tip = hand["index_tip"]
+        grabbing = bool(grab[i])
+        state["pinch_active"] = bool(pinch[i]) and not grabbing
+        state["flat_hand"] = bool(flat_hand[i]) and not grabbing
+
+        with _stage(timer, "dashboard_input"):
+            dashboard_consumed = dashboard.process_interaction(
+                index_tip=index_tip,
+                is_pinching=state["pinch_active"],
+                current_state=state
+            )
+
+        with _stage(timer, "draw"):
+            drawing_engine.draw(
+                current_state=state,
+                index_tip=index_tip,
+                dashboard_consumed=dashboard_consumed,
+                hand_id=hand_id
+            )
+            if grabbing:
+                drawing_engine.pan_zoom(hand["middle_mcp"], _hand_size(hand), hand_id=hand_id)
+            else:
+                drawing_engine.release_grab(hand_id)
+
+        if not dashboard_consumed:
+            _draw_cursor(frame, index_tip, state)
+
+    # Hands that left the frame: commit a pending shape like update_board does, then forget them
+    for hand_id in [h for h in hand_states if h not in seen]:
+        state = hand_states.pop(hand_id)
+        state["pinch_active"] = False
+        state["flat_hand"] = False
+        with _stage(timer, "draw"):
+            drawing_engine.draw(current_state=state, index_tip=(0, 0), dashboard_consumed=False, hand_id=hand_id)
+            drawing_engine.release_hand(hand_id)
+            drawing_engine.release_grab(hand_id)
+
+    # The toolbar shows the tools of the longest-tracked hand visible
+    with _stage(timer, "dashboard_render"):
+        primary = hand_states[min(hand_states)] if hand_states else config.INITIAL_STATE
+        dashboard.render(frame, primary)
+
+    with _stage(timer, "overlay"):
+        return drawing_engine.render_overlay(frame, out)
+
+def put_latest(q, item):
+    """
+    Put item on a bounded queue, dropping the oldest entries if it is full ("latest frame wins").
+    """
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+class PipelinedRunner:
+    """
+    Runs capture and landmark inference on worker threads connected by bounded queues.
+    The caller (the render stage) pulls (frame, landmarks_data) pairs with next_result().
+
+    capture -> [frames, latest wins] -> inference -> [results, blocking] -> render
+
+    Only stale camera frames are ever dropped. Every inference result is handed to the
+    render stage in order, so drawing sees the same sequence of points as the serial loop.
+    With multi_hand, the second item is the list from hand_tracker.process_frame_multi.
+    timer (see update_board) times the capture, prepare and tracker stages on the worker threads.
+    """
+    def __init__(self, cap, hand_tracker, width, height, multi_hand=False, timer=None):
+        self.cap = cap
+        self.hand_tracker = hand_tracker
+        self.multi_hand = multi_hand
+        self.timer = timer
+        self.width = width
+        self.height = height
+
+        self.frames = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+        self.results = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        """
+        Signal the worker threads to exit and wait for them. Their loops poll stop_event every
+        0.1 s, so this returns once a running process_frame call has finished and the tracker
+        can be released safely.
+        """
+        self.stop_event.set()
+        for t in self.threads:
+            if t.is_alive():
+                t.join()
+
+    def next_result(self):
+        """
+        Block until the next (frame, landmarks_data) pair is ready.
+        Returns None once the capture source is exhausted.
+        """
+        while not self.stop_event.is_set():
+            try:
+                return self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _capture_loop(self):
+        while not self.stop_event.is_set():
+            with _stage(self.timer, "capture"):
+                ret, frame = self.cap.read()
+            if not ret:
+                # Sentinel tells inference (and then render) that the stream ended
+                self._put_blocking(self.frames, None)
+                return
+            with _stage(self.timer, "prepare"):
+                frame = prepare_frame(frame, self.width, self.height)
+            put_latest(self.frames, frame)
+
+    def _inference_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if frame is None:
+                self._put_blocking(self.results, None)
+                return
+
+            with _stage(self.timer, "tracker"):
+                if self.multi_hand:
+                    landmarks_data = self.hand_tracker.process_frame_multi(frame)
+                else:
+                    landmarks_data = self.hand_tracker.process_frame(frame)
+            self._put_blocking(self.results, (frame, landmarks_data))
+
+    def _put_blocking(self, q, item):
+        """Put with backpressure, but give up if the pipeline is being stopped."""
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
@@ -0,0 +1,232 @@
+"""
+Frame sources for the live loop and the headless tools.
+
+Every source reads like cv2.VideoCapture (read(image=None) -> (ok, frame), isOpened(),
+release()), so the serial loop, PipelinedRunner and run_replay take any of them. On top of
+that each source reports:
+- width, height, fps and frame_count (0 when unknown) of what it delivers
+- timestamp: seconds since the source started, of the frame read last (capture time for a
+  camera, media time for files, index / fps for images and synthetic frames)
+- captured_at: perf_counter() when that frame was captured or produced, for latency
+
+open_source(spec) picks a source from a config.FRAME_SOURCE style string.
+"""
+import os
+import time
+import cv2
+import numpy as np
+import config
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+def _fourcc_name(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\0") if value > 0 else "default"
+
+class _Paced:
+    """Shared timestamps and optional real-time pacing of sources whose frames are all available at once."""
+    def _init_clock(self, fps, realtime):
+        self.fps = fps
+        self.realtime = realtime
+        self.index = 0 # Frames delivered so far
+        self.timestamp = None
+        self.captured_at = None
+        self.start = time.perf_counter()
+
+    def _stamp(self):
+        """Wait for the frame's due time (realtime only) and record its timestamps."""
+        self.timestamp = self.index / self.fps
+        if self.realtime:
+            delay = self.start + self.timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.captured_at = time.perf_counter()
+        self.index += 1
+
+class CameraSource:
+    """
+    A camera through cv2.VideoCapture with explicit settings. fourcc (e.g. "MJPG", "YUYV")
+    picks the pixel format, buffer_size how many frames the driver may queue (1 = the
+    newest frame only, lowest latency). width/height are requested; the attributes hold
+    what the camera actually delivers. Drivers ignore settings they do not support.
+    """
+    def __init__(self, device=config.CAMERA_DEVICE, width=config.CAMERA_WIDTH, height=config.CAMERA_HEIGHT,
+                 fourcc=config.CAMERA_FOURCC, fps=config.CAMERA_FPS, buffer_size=config.CAMERA_BUFFER_SIZE,
+                 backend=cv2.CAP_ANY):
+        self.device = device
+        self.cap = cv2.VideoCapture(device, backend)
+        if fourcc:
+            # Before the size: many cameras only offer their larger sizes compressed
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fourcc = _fourcc_name(self.cap.get(cv2.CAP_PROP_FOURCC))
+        self.buffer_size = buffer_size
+        self.frame_count = 0
+        self.timestamp = None
+        self.captured_at = None
+        self.start = time.perf_counter()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        # grab() returns as the frame arrives; decoding in retrieve() is not part of its age
+        if not self.cap.grab():
+            return False, None
+        self.captured_at = time.perf_counter()
+        self.timestamp = self.captured_at - self.start
+        return self.cap.retrieve(image)
+
+    def describe(self):
+        return (f"camera {self.device}: {self.width}x{self.height} {self.fourcc} "
+                f"at {self.fps:.0f} fps, buffer {self.buffer_size or 'default'}")
+
+    def release(self):
+        self.cap.release()
+
+class VideoFileSource(_Paced):
+    """
+    A video file. With realtime, frames are delivered no faster than the video's frame rate,
+    as a camera would; loop starts over at the end (timestamps keep increasing).
+    """
+    def __init__(self, path, realtime=False, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = max(int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+        self._init_clock(self.cap.get(cv2.CAP_PROP_FPS) or 30.0, realtime)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop and self.index > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        if not ret:
+            return False, None
+        self._stamp()
+        return True, frame
+
+    def describe(self):
+        return f"video {self.path}: {self.width}x{self.height} at {self.fps:.0f} fps"
+
+    def release(self):
+        self.cap.release()
+
+class ImageDirSource(_Paced):
+    """
+    The images in a directory, in file name order, as frames at fps. Images of another size
+    than the first are resized to it, so the loop always sees one frame size.
+    """
+    def __init__(self, directory, fps=30.0, realtime=False, loop=False):
+        self.directory = directory
+        self.loop = loop
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.frame_count = len(self.paths)
+        self.width = self.height = 0
+        if self.paths:
+            first = cv2.imread(self.paths[0])
+            if first is not None:
+                self.height, self.width = first.shape[:2]
+        self._init_clock(fps, realtime)
+
+    def isOpened(self):
+        return self.width > 0
+
+    def read(self, image=None):
+        if not self.paths or (self.index >= len(self.paths) and not self.loop):
+            return False, None
+        frame = cv2.imread(self.paths[self.index % len(self.paths)])
+        if frame is None:
+            return False, None
+        if frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height), dst=image)
+        self._stamp()
+        return True, frame
+
+    def describe(self):
+        return f"images {self.directory}: {self.frame_count} x {self.width}x{self.height} at {self.fps:.0f} fps"
+
+    def release(self):
+        pass
+
+class SyntheticSource(_Paced):
+    """
+    Generated frames, for running without a camera: a scrolling gradient with the frame
+    number ("pattern") or black frames ("blank"). count limits the number of frames
+    (None = endless). Frames are written into the image passed to read() when it fits.
+    """
+    def __init__(self, width=640, height=480, fps=30.0, count=None, pattern="pattern", realtime=False):
+        if pattern not in ("pattern", "blank"):
+            raise ValueError(f"Unknown synthetic pattern: {pattern}")
+        self.width = width
+        self.height = height
+        self.frame_count = count or 0
+        self.count = count
+        self.pattern = pattern
+        self._init_clock(fps, realtime)
+        # Twice as wide as a frame, so every scroll offset is a plain slice
+        ramp = np.tile(np.arange(width, dtype=np.float64) * 255 / max(width - 1, 1), 2).astype(np.uint8)
+        self.base = cv2.merge([np.tile(ramp, (height, 1)), np.full((height, 2 * width), 64, np.uint8),
+                               np.tile(ramp[::-1], (height, 1))])
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        if self.count is not None and self.index >= self.count:
+            return False, None
+        shape = (self.height, self.width, 3)
+        frame = image if image is not None and image.shape == shape and image.dtype == np.uint8 else np.empty(shape, np.uint8)
+        if self.pattern == "blank":
+            frame[:] = 0
+        else:
+            offset = (self.index * 4) % self.width
+            frame[:] = self.base[:, offset:offset + self.width]
+            cv2.putText(frame, str(self.index), (10, self.height - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, config.COLORS["white"], 2)
+        self._stamp()
+        return True, frame
+
+    def describe(self):
+        return f"synthetic {self.pattern}: {self.width}x{self.height} at {self.fps:.0f} fps"
+
+    def release(self):
+        pass
+
+def open_source(spec=None, realtime=False):
+    """
+    Source for a spec (default config.FRAME_SOURCE):
+    "camera" or "camera:N" (or just N), a directory of images, "synthetic" or
+    "synthetic:WIDTHxHEIGHT", or else a video file path. With realtime, file, image and
+    synthetic sources deliver frames at their frame rate like a camera.
+    """
+    spec = config.FRAME_SOURCE if spec is None else spec
+    if isinstance(spec, int):
+        return CameraSource(spec)
+    kind, _, arg = str(spec).partition(":")
+    if kind == "camera":
+        return CameraSource(int(arg) if arg else config.CAMERA_DEVICE)
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if kind == "synthetic":
+        width, height = (int(v) for v in arg.split("x")) if arg else (config.CAMERA_WIDTH, config.CAMERA_HEIGHT)
+        return SyntheticSource(width, height, realtime=realtime)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, realtime=realtime)
+    return VideoFileSource(spec, realtime=realtime)
@@ -1,18 +1,48 @@
 import math
+import numpy as np
 import config
+from landmarks import NUM_LANDMARKS, LANDMARK_INDEX
 import cv2 # Adding merely for any drawing functionality inside the gesture debug process if ever needed, but main logic is decoupled
 
+# MediaPipe hand landmark indices used by the vectorized path
+WRIST = LANDMARK_INDEX["wrist"]
+THUMB_MCP = LANDMARK_INDEX["thumb_mcp"]
+THUMB_TIP = LANDMARK_INDEX["thumb_tip"]
+INDEX_TIP = LANDMARK_INDEX["index_tip"]
+MIDDLE_MCP = LANDMARK_INDEX["middle_mcp"]
+FINGER_TIPS = [LANDMARK_INDEX[f + "_tip"] for f in ("index", "middle", "ring", "pinky")]
+FINGER_PIPS = [LANDMARK_INDEX[f + "_pip"] for f in ("index", "middle", "ring", "pinky")]
+
 class GestureDetector:
     def __init__(self):
         self.pinch_threshold = config.PINCH_THRESHOLD
+        self.pinch_ratio = config.PINCH_THRESHOLD_RATIO
+        self.thumb_extension_ratio = config.THUMB_EXTENSION_RATIO
+        self.grab_ratio = config.GRAB_RATIO
 
     def detect_gestures(self, landmarks_data):
         """
         Receives structured landmark pixel coordinates.
         Returns a dictionary indicating the current recognized gestures.
+
+        Also accepts a (21, 2) landmark array. Whenever all 21 landmarks are available,
+        thresholds are relative to hand size (see detect_gestures_batch).
         """
-        if not landmarks_data:
-            return {"pinch": False, "flat_hand": False}
+        if landmarks_data is None or len(landmarks_data) == 0:
+            return {"pinch": False, "flat_hand": False, "grab": False}
+
+        if isinstance(landmarks_data, np.ndarray):
+            points = landmarks_data
+        elif len(landmarks_data.get("landmarks", ())) >= NUM_LANDMARKS:
+            points = np.asarray(landmarks_data["landmarks"][:NUM_LANDMARKS])
+        else:
+            points = None
+
+        if points is not None:
+            result = self.detect_gestures_batch(points)
+            return {"pinch": bool(result["pinch"]), "flat_hand": bool(result["flat_hand"]), "grab": bool(result["grab"])}
+
+        # Partial landmark dictionaries fall back to the fixed pixel thresholds
 
         pinch_active = self._check_pinch(
             thumb_tip=landmarks_data["thumb_tip"],
@@ -25,9 +55,46 @@ class GestureDetector:
         # in the main drawing engine, but we report pure gesture state here.
         return {
             "pinch": pinch_active,
-            "flat_hand": flat_hand
+            "flat_hand": flat_hand,
+            "grab": False # Needs all 21 landmarks
         }
 
+    def detect_gestures_batch(self, landmarks, present=None):
+        """
+        Classify every frame of a (N, 21, 2) landmark array (or a single (21, 2) hand)
+        in one vectorized pass. present optionally marks which rows hold a hand.
+        Returns {"pinch", "flat_hand", "grab"} -> bool array (N,) (scalars for one hand).
+
+        Distances are compared relative to hand size (wrist to middle finger MCP), so the
+        result does not change with frame size or distance from the camera.
+        """
+        pts = np.asarray(landmarks, dtype=np.float32)
+        single = pts.ndim == 2
+        if single:
+            pts = pts[None]
+
+        hand_size = np.linalg.norm(pts[:, MIDDLE_MCP] - pts[:, WRIST], axis=1)
+        valid = hand_size > 0
+        if present is not None:
+            valid &= np.asarray(present, dtype=bool)
+
+        # Pinch: thumb tip close to index tip
+        pinch_dist = np.linalg.norm(pts[:, THUMB_TIP] - pts[:, INDEX_TIP], axis=1)
+        pinch = valid & (pinch_dist < self.pinch_ratio * hand_size)
+
+        # Flat hand: every fingertip above its PIP joint and the thumb extended
+        fingers_extended = (pts[:, FINGER_TIPS, 1] < pts[:, FINGER_PIPS, 1]).all(axis=1)
+        thumb_dist = np.linalg.norm(pts[:, THUMB_TIP] - pts[:, THUMB_MCP], axis=1)
+        flat_hand = valid & fingers_extended & (thumb_dist > self.thumb_extension_ratio * hand_size)
+
+        # Grab (closed fist): every fingertip curled in close to the palm
+        tip_dist = np.linalg.norm(pts[:, FINGER_TIPS] - pts[:, MIDDLE_MCP, None], axis=2)
+        grab = valid & (tip_dist < self.grab_ratio * hand_size[:, None]).all(axis=1)
+
+        if single:
+            return {"pinch": pinch[0], "flat_hand": flat_hand[0], "grab": grab[0]}
+        return {"pinch": pinch, "flat_hand": flat_hand, "grab": grab}
+
     def _check_pinch(self, thumb_tip, index_tip):
         """
         Calculate Euclidean distance between thumb and index.
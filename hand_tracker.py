@@ -1,44 +1,202 @@
 import cv2
 import time
 import os
+import threading
 import urllib.request
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
 import config
+import numpy as np
+from landmarks import NUM_LANDMARKS, HandIdAssigner, structure_landmarks
+from buffer_pool import BufferPool
+
+# MediaPipe is imported when the first HandTracker is built (slow import; see BackgroundHandTracker)
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hand_landmarker.task')
+
+def ensure_model(model_path=DEFAULT_MODEL_PATH, download=True):
+    """
+    Return model_path, downloading the hand landmarker model there first if it is missing.
+    Raises FileNotFoundError with instructions when it is missing and cannot be downloaded.
+    """
+    if os.path.exists(model_path):
+        return model_path
+
+    reason = "downloading is disabled (MODEL_DOWNLOAD = False)"
+    if download:
+        print("Downloading hand_landmarker.task...")
+        tmp_path = model_path + ".part"
+        try:
+            # Download to a temporary name so an interrupted download never looks like a model
+            with urllib.request.urlopen(MODEL_URL, timeout=config.MODEL_DOWNLOAD_TIMEOUT) as response, \
+                    open(tmp_path, "wb") as f:
+                while True:
+                    chunk = response.read(1 << 16)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            os.replace(tmp_path, model_path)
+            return model_path
+        except OSError as e: # URLError, timeouts and disk errors are all OSErrors
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            reason = f"the download failed ({e})"
+
+    raise FileNotFoundError(
+        f"Hand landmarker model not found at {model_path} and {reason}. "
+        f"Download it from {MODEL_URL} on a machine with internet access and copy it to that path."
+    )
+
+def landmarks_from_result(hand_landmarks, width, height, offset=(0, 0)):
+    """
+    MediaPipe's normalized landmarks for every detected hand -> (H, 21, 2) int32 pixel array,
+    shifted by offset (the crop origin). All hands convert in one array pass; astype truncates like int().
+    """
+    normalized = np.array([[(lm.x, lm.y) for lm in hand] for hand in hand_landmarks], dtype=np.float64)
+    hands = (normalized * (width, height)).astype(np.int32)
+    hands += offset
+    return hands
+
+def roi_from_landmarks(landmarks, frame_width, frame_height):
+    """
+    Padded square region of interest around a hand, clipped to the frame.
+    """
+    xs = [p[0] for p in landmarks]
+    ys = [p[1] for p in landmarks]
+    cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+    side = max(max(xs) - min(xs), max(ys) - min(ys)) * (1 + 2 * config.ROI_PADDING)
+    side = max(side, config.ROI_MIN_SIZE)
+
+    x1, y1 = max(int(cx - side / 2), 0), max(int(cy - side / 2), 0)
+    x2, y2 = min(int(cx + side / 2), frame_width), min(int(cy + side / 2), frame_height)
+    if x2 - x1 >= frame_width and y2 - y1 >= frame_height:
+        return None # Crop would be the whole frame anyway
+    return (x1, y1, x2, y2)
+
+def _near_crop_edge(landmarks, roi, frame_width, frame_height):
+    """True if any landmark is within ROI_EDGE_MARGIN of a crop edge that is not also a frame edge."""
+    x1, y1, x2, y2 = roi
+    margin = config.ROI_EDGE_MARGIN * min(x2 - x1, y2 - y1)
+    for x, y in landmarks:
+        if (x1 > 0 and x < x1 + margin) or (y1 > 0 and y < y1 + margin):
+            return True
+        if (x2 < frame_width and x > x2 - margin) or (y2 < frame_height and y > y2 - margin):
+            return True
+    return False
 
 class HandTracker:
-    def __init__(self):
+    def __init__(self, model_path=None, download=None, pool=None):
         # MediaPipe Tasks API requires a model file
-        model_path = os.path.join(os.path.dirname(__file__), 'hand_landmarker.task')
-        if not os.path.exists(model_path):
-            print("Downloading hand_landmarker.task...")
-            url = "https://storage.googleapis.com/mediapipe-models/hand_landmarker/hand_landmarker/float16/1/hand_landmarker.task"
-            urllib.request.urlretrieve(url, model_path)
-            
+        model_path = ensure_model(model_path or config.MODEL_PATH or DEFAULT_MODEL_PATH,
+                                  config.MODEL_DOWNLOAD if download is None else download)
+
+        import mediapipe as mp
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+        self.mp = mp
+
         base_options = python.BaseOptions(model_asset_path=model_path)
 
         running_mode = vision.RunningMode.IMAGE if config.STATIC_IMAGE_MODE else vision.RunningMode.VIDEO
-        
-        options = vision.HandLandmarkerOptions(
-            base_options=base_options,
-            running_mode=running_mode,
-            num_hands=config.MAX_NUM_HANDS,
-            min_hand_detection_confidence=config.MIN_DETECTION_CONFIDENCE,
-            min_tracking_confidence=config.MIN_TRACKING_CONFIDENCE
-        )
-        self.detector = vision.HandLandmarker.create_from_options(options)
-        self.running_mode = running_mode
+
+        def create(mode):
+            options = vision.HandLandmarkerOptions(
+                base_options=base_options,
+                running_mode=mode,
+                num_hands=config.MAX_NUM_HANDS,
+                min_hand_detection_confidence=config.MIN_DETECTION_CONFIDENCE,
+                min_tracking_confidence=config.MIN_TRACKING_CONFIDENCE
+            )
+            return vision.HandLandmarker.create_from_options(options)
+
+        self.detector = create(running_mode)
+        self.video_mode = running_mode == vision.RunningMode.VIDEO
+        # VIDEO mode tracks between calls and assumes one fixed-size image per frame, so ROI
+        # crops (whose geometry changes every frame) go to a separate IMAGE-mode landmarker
+        self.roi_detector = self.detector
+        if config.ROI_TRACKING and self.video_mode:
+            self.roi_detector = create(vision.RunningMode.IMAGE)
+        self.roi = None # Crop (x1, y1, x2, y2) to search next frame when ROI_TRACKING is on
+        self.hand_ids = HandIdAssigner()
+        self.pool = pool if pool is not None else BufferPool() # RGB conversion buffer
+        self.inference_scale = 1.0 # Frames are shrunk by this before inference (frame governor); landmarks stay full size
 
     def process_frame(self, frame):
         """
         Processes a BGR image and returns structured hand landmark pixel coordinates.
         Does not draw anything on the frame.
+
+        With config.ROI_TRACKING, inference runs on a padded crop around the previous
+        frame's hand. When the hand is lost there, the same frame is searched again at full
+        size with the IMAGE-mode roi_detector, so the VIDEO landmarker sees each frame once.
         """
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-        
-        if self.running_mode == vision.RunningMode.VIDEO:
+        h, w, _ = frame.shape
+        roi = self.roi if config.ROI_TRACKING else None
+        hands = self._detect(frame, roi)
+        if hands is None and roi:
+            roi = None
+            hands = self._detect(frame, None, retry=True)
+
+        if hands is None:
+            self.roi = None
+            return None
+
+        # Process the primary hand (index 0)
+        landmarks = [tuple(p) for p in hands[0].tolist()]
+
+        if config.ROI_TRACKING:
+            # Near the crop edge the hand may be cut off next frame: go back to full-frame detection
+            if roi and _near_crop_edge(landmarks, roi, w, h):
+                self.roi = None
+            else:
+                self.roi = roi_from_landmarks(landmarks, w, h)
+
+        return structure_landmarks(landmarks)
+
+    def process_frame_multi(self, frame):
+        """
+        Like process_frame, but returns a list with one structured dictionary per detected
+        hand (up to config.MAX_NUM_HANDS). Each carries a "hand_id" that stays the same
+        for the same hand across frames. Always runs on the full frame.
+        """
+        hands = self._detect(frame, None)
+        if hands is None:
+            self.hand_ids.assign(np.zeros((0, NUM_LANDMARKS, 2)))
+            return []
+
+        ids = self.hand_ids.assign(hands)
+        results = []
+        for hand_id, hand in zip(ids, hands.tolist()):
+            structured_data = structure_landmarks([tuple(p) for p in hand])
+            structured_data["hand_id"] = hand_id
+            results.append(structured_data)
+        return results
+
+    def _detect(self, frame, roi, retry=False):
+        """
+        Run the landmarker on the whole frame (roi None) or on the crop roi = (x1, y1, x2, y2).
+        Crops and retries of a frame already sent go to the IMAGE-mode roi_detector.
+        Returns every detected hand as one (H, 21, 2) int32 array of full-frame pixels, or None.
+        """
+        if roi:
+            x1, y1, x2, y2 = roi
+            frame = frame[y1:y2, x1:x2]
+        else:
+            x1, y1 = 0, 0
+
+        h, w, _ = frame.shape
+        image = frame
+        if self.inference_scale < 1.0:
+            # Landmarks are normalized to the image, so they map back to the unscaled frame as they are
+            size = (max(1, int(w * self.inference_scale)), max(1, int(h * self.inference_scale)))
+            image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA,
+                               dst=None if roi else self.pool.get("small", (size[1], size[0], 3)))
+
+        # Full frames convert into a reused buffer; ROI crops change size every frame
+        frame_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=None if roi else self.pool.get("rgb", image.shape))
+        mp_image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=frame_rgb)
+
+        if roi or retry:
+            detection_result = self.roi_detector.detect(mp_image)
+        elif self.video_mode:
             timestamp_ms = int(time.time() * 1000)
             # Ensure strictly increasing timestamp for VIDEO mode
             if hasattr(self, 'last_timestamp') and timestamp_ms <= self.last_timestamp:
@@ -51,34 +209,86 @@ class HandTracker:
         if not detection_result.hand_landmarks:
             return None
 
-        # Process the primary hand (index 0)
-        hand_landmarks = detection_result.hand_landmarks[0]
-        h, w, _ = frame.shape
+        return landmarks_from_result(detection_result.hand_landmarks, w, h, (x1, y1))
 
-        landmarks = []
-        for lm in hand_landmarks:
-            cx, cy = int(lm.x * w), int(lm.y * h)
-            landmarks.append((cx, cy))
+    def release(self):
+        """Releases MediaPipe resources."""
+        self.detector.close()
+        if self.roi_detector is not self.detector:
+            self.roi_detector.close()
 
-        try:
-            structured_data = {
-                "landmarks": landmarks,
-                "thumb_mcp": landmarks[2],
-                "thumb_ip": landmarks[3],
-                "thumb_tip": landmarks[4],
-                "index_pip": landmarks[6],
-                "index_tip": landmarks[8],
-                "middle_pip": landmarks[10],
-                "middle_tip": landmarks[12],
-                "ring_pip": landmarks[14],
-                "ring_tip": landmarks[16],
-                "pinky_pip": landmarks[18],
-                "pinky_tip": landmarks[20]
-            }
-            return structured_data
-        except IndexError:
+class BackgroundHandTracker:
+    """
+    Builds a tracker (default: HandTracker) on a background thread so the camera and UI can
+    start right away. Until it is ready, process_frame returns None and process_frame_multi
+    returns [], so the board can still be viewed. status is "loading", "ready" or "error".
+    """
+    def __init__(self, factory=HandTracker):
+        self.factory = factory
+        self.tracker = None
+        self.error = None
+        self.load_time = None # Seconds the tracker took to build
+        self.released = False
+        self.inference_scale = 1.0 # Passed on to the tracker once it is built
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._load, name="tracker-load", daemon=True)
+        self.thread.start()
+
+    @property
+    def ready(self):
+        return self.tracker is not None
+
+    @property
+    def status(self):
+        if self.tracker is not None:
+            return "ready"
+        return "error" if self.error is not None else "loading"
+
+    def status_text(self):
+        """One line for the screen while the tracker is not ready (None once it is)."""
+        if self.tracker is not None:
             return None
+        if self.error is not None:
+            return f"Hand tracking unavailable: {self.error}"
+        return "Loading hand tracker..."
+
+    def wait(self, timeout=None):
+        """Block until loading finished (or timeout). Returns True if the tracker is ready."""
+        self.thread.join(timeout)
+        return self.ready
+
+    def process_frame(self, frame):
+        tracker = self.tracker
+        return tracker.process_frame(frame) if tracker is not None else None
+
+    def process_frame_multi(self, frame):
+        tracker = self.tracker
+        return tracker.process_frame_multi(frame) if tracker is not None else []
+
+    def set_inference_scale(self, scale):
+        """Set HandTracker.inference_scale now, or as soon as the tracker is built."""
+        with self.lock:
+            self.inference_scale = scale
+            if self.tracker is not None:
+                self.tracker.inference_scale = scale
 
     def release(self):
-        """Releases MediaPipe resources."""
-        self.detector.close()
+        with self.lock:
+            self.released = True
+            if self.tracker is not None:
+                self.tracker.release()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            tracker = self.factory()
+        except Exception as e: # Reported on screen; drawing without a tracker is still possible
+            self.error = e
+            return
+        with self.lock:
+            self.load_time = time.perf_counter() - start
+            if self.released:
+                tracker.release() # Shut down while we were still loading
+            else:
+                tracker.inference_scale = self.inference_scale
+                self.tracker = tracker
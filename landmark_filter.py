@@ -0,0 +1,93 @@
+"""
+Prediction/filter layer between a hand tracker and its consumers.
+
+OneEuroFilter smooths all 21 landmarks at once (speed-adaptive low-pass, so it lags
+little during fast motion and removes jitter when the hand is still). PredictiveTracker
+wraps any tracker, runs real inference only every Nth frame and extrapolates the
+filtered landmarks with their filtered velocity on the frames in between.
+"""
+import math
+import time
+import numpy as np
+import config
+from landmarks import structure_landmarks
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class OneEuroFilter:
+    """
+    One-Euro filter over an (N, 2) array of points, vectorized across points.
+    Cutoff frequencies are in Hz, beta scales the cutoff with speed (pixels/second).
+    """
+    def __init__(self, min_cutoff=config.FILTER_MIN_CUTOFF, beta=config.FILTER_BETA, d_cutoff=config.FILTER_D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None          # Filtered positions
+        self.dx = None         # Filtered velocity, pixels/second
+        self.t = None          # Time of the last update
+
+    def update(self, points, t):
+        """Feed a new measurement taken at time t (seconds). Returns the filtered points."""
+        points = np.asarray(points, dtype=np.float64)
+        if self.x is None or t <= self.t:
+            if self.x is None:
+                self.dx = np.zeros_like(points)
+            self.x = points
+            self.t = t
+            return self.x
+
+        dt = t - self.t
+        a_d = _alpha(self.d_cutoff, dt)
+        self.dx = self.dx + a_d * ((points - self.x) / dt - self.dx)
+
+        # Per-landmark speed sets that landmark's cutoff
+        speed = np.linalg.norm(self.dx, axis=1, keepdims=True)
+        cutoff = self.min_cutoff + self.beta * speed
+        tau = 1.0 / (2 * np.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        self.x = self.x + a * (points - self.x)
+        self.t = t
+        return self.x
+
+    def predict(self, t):
+        """Constant-velocity extrapolation of the filtered points to time t."""
+        return self.x + self.dx * (t - self.t)
+
+class PredictiveTracker:
+    """
+    Drop-in wrapper for HandTracker (or ReplayTracker) that filters landmarks and only
+    runs the wrapped tracker every `interval` frames, predicting the frames in between.
+    """
+    def __init__(self, tracker, interval=config.INFERENCE_INTERVAL, clock=time.monotonic):
+        self.tracker = tracker
+        self.interval = max(1, interval)
+        self.clock = clock
+        self.filter = OneEuroFilter()
+        self.frame_index = 0
+        self.inference_count = 0
+
+    def process_frame(self, frame):
+        t = self.clock()
+        run_inference = self.frame_index % self.interval == 0 or self.filter.x is None
+        self.frame_index += 1
+
+        if run_inference:
+            self.inference_count += 1
+            landmarks_data = self.tracker.process_frame(frame)
+            if not landmarks_data:
+                self.filter.reset()
+                return None
+            points = self.filter.update(landmarks_data["landmarks"], t)
+        else:
+            points = self.filter.predict(t)
+
+        return structure_landmarks([(int(round(x)), int(round(y))) for x, y in points.tolist()])
+
+    def release(self):
+        self.tracker.release()
@@ -0,0 +1,152 @@
+"""
+Compact binary recording of HandTracker output and a MediaPipe-free replay tracker.
+
+File layout (little endian):
+    header  32 bytes: magic b"WBLM", version u16, landmarks per hand u16,
+                      frame width u32, frame height u32, frame count u64, 8 bytes padding
+    records RECORD_DTYPE[count]: timestamp f8 (seconds), present u1, landmarks i2[21][2]
+
+Records are fixed size, so a recording can be memory-mapped and indexed directly.
+If the recorder was killed before close() the header count is 0 and the count is
+recovered from the file size.
+"""
+import os
+import struct
+import time
+import numpy as np
+from landmarks import NUM_LANDMARKS, structure_landmarks
+
+MAGIC = b"WBLM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ8x")
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("present", "u1"),
+    ("landmarks", "<i2", (NUM_LANDMARKS, 2))
+])
+
+class LandmarkRecorder:
+    """
+    Appends one record per processed frame to a landmark recording file.
+    """
+    def __init__(self, path, frame_width=0, frame_height=0):
+        self.path = path
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.count = 0
+        self.file = open(path, "wb")
+        self._write_header()
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+
+    def record(self, landmarks_data, timestamp=None):
+        """Store the result of HandTracker.process_frame (a structured dict or None) for one frame."""
+        rec = self._record
+        rec["timestamp"] = time.monotonic() if timestamp is None else timestamp
+        if landmarks_data:
+            rec["present"] = 1
+            rec["landmarks"][0] = landmarks_data["landmarks"][:NUM_LANDMARKS]
+        else:
+            rec["present"] = 0
+            rec["landmarks"] = 0
+        self.file.write(rec.tobytes())
+        self.count += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self._write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_header(self):
+        self.file.write(HEADER.pack(MAGIC, VERSION, NUM_LANDMARKS, self.frame_width, self.frame_height, self.count))
+
+class RecordingTracker:
+    """
+    Wraps a tracker and records everything its process_frame returns.
+    """
+    def __init__(self, tracker, path):
+        self.tracker = tracker
+        self.path = path
+        self.recorder = None
+
+    def process_frame(self, frame):
+        if self.recorder is None:
+            h, w = frame.shape[:2]
+            self.recorder = LandmarkRecorder(self.path, w, h)
+        landmarks_data = self.tracker.process_frame(frame)
+        self.recorder.record(landmarks_data)
+        return landmarks_data
+
+    def release(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        self.tracker.release()
+
+class ReplayTracker:
+    """
+    Drop-in replacement for HandTracker that streams landmarks back from a recording.
+    The frame passed to process_frame is ignored, so no MediaPipe or model file is needed.
+    """
+    def __init__(self, path, loop=False):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        magic, version, num_landmarks, width, height, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or num_landmarks != NUM_LANDMARKS:
+            raise ValueError(f"Not a landmark recording: {path}")
+
+        if count == 0:
+            # Recording was not closed cleanly; use every complete record on disk
+            count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+
+        self.frame_width = width
+        self.frame_height = height
+        self.loop = loop
+        self.position = 0
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def finished(self):
+        return not self.loop and self.position >= len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def present(self):
+        return self.records["present"].astype(bool)
+
+    @property
+    def landmarks(self):
+        """All frames as an (N, 21, 2) int16 array (rows for absent frames are zero)."""
+        return self.records["landmarks"]
+
+    def process_frame(self, frame=None):
+        """Structured dictionary for the next recorded frame, or None (no hand / end of recording)."""
+        if self.position >= len(self.records):
+            if not self.loop or not len(self.records):
+                return None
+            self.position = 0
+
+        rec = self.records[self.position]
+        self.position += 1
+        if not rec["present"]:
+            return None
+        return structure_landmarks([tuple(p) for p in rec["landmarks"].tolist()])
+
+    def release(self):
+        # Drop the memory map so the file can be removed/replaced
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
@@ -0,0 +1,73 @@
+"""
+MediaPipe-free helpers for the 21-point hand landmark layout used across the app.
+"""
+import numpy as np
+import config
+
+NUM_LANDMARKS = 21
+
+# Named landmarks exposed in the structured dictionary, by MediaPipe hand landmark index
+LANDMARK_INDEX = {
+    "wrist": 0,
+    "thumb_mcp": 2,
+    "thumb_ip": 3,
+    "thumb_tip": 4,
+    "index_pip": 6,
+    "index_tip": 8,
+    "middle_mcp": 9,
+    "middle_pip": 10,
+    "middle_tip": 12,
+    "ring_pip": 14,
+    "ring_tip": 16,
+    "pinky_pip": 18,
+    "pinky_tip": 20
+}
+
+def structure_landmarks(landmarks):
+    """
+    Build the structured dictionary returned by HandTracker.process_frame from a list of
+    21 (x, y) pixel tuples. Returns None if the list is incomplete.
+    """
+    if len(landmarks) < NUM_LANDMARKS:
+        return None
+
+    structured_data = {"landmarks": landmarks}
+    for name, index in LANDMARK_INDEX.items():
+        structured_data[name] = landmarks[index]
+    return structured_data
+
+class HandIdAssigner:
+    """
+    Gives each hand a stable id across frames by matching palm centers to the previous
+    frame's hands (greedy nearest neighbour). Unmatched hands get new ids.
+    """
+    def __init__(self, max_distance=config.HAND_MATCH_DISTANCE):
+        self.max_distance = max_distance
+        self.ids = []                              # Ids of last frame's hands
+        self.centers = np.zeros((0, 2))            # Their palm centers
+        self.next_id = 0
+
+    def assign(self, hands):
+        """hands is an (H, 21, 2) array. Returns a list of H ids."""
+        centers = np.asarray(hands, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 2).mean(axis=1)
+        ids = [None] * len(centers)
+
+        if len(centers) and len(self.centers):
+            dist = np.linalg.norm(centers[:, None, :] - self.centers[None, :, :], axis=2)
+            # Take the closest remaining (new, old) pair until nothing is close enough
+            for _ in range(min(dist.shape)):
+                i, j = np.unravel_index(np.argmin(dist), dist.shape)
+                if dist[i, j] > self.max_distance:
+                    break
+                ids[i] = self.ids[j]
+                dist[i, :] = np.inf
+                dist[:, j] = np.inf
+
+        for i in range(len(ids)):
+            if ids[i] is None:
+                ids[i] = self.next_id
+                self.next_id += 1
+
+        self.ids = ids
+        self.centers = centers
+        return ids
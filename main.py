@@ -1,33 +1,60 @@
 import cv2
-import time
 import copy
+import time
 import config
-from hand_tracker import HandTracker
+from hand_tracker import BackgroundHandTracker
 from gesture_detector import GestureDetector
 from dashboard import Dashboard
 from drawing_engine import DrawingEngine
+from landmark_recorder import RecordingTracker
+from landmark_filter import PredictiveTracker
+from session_store import SessionStore
+from board_broadcast import BroadcastServer
+from timelapse import TimelapseRecorder
+from perf_monitor import PerfMonitor
+from frame_governor import FrameGovernor
+from frame_source import open_source
+from buffer_pool import BufferPool
+from frame_pipeline import PipelinedRunner, prepare_frame, update_board, update_board_multi
 
 def main():
-    cap = cv2.VideoCapture(0)
+    startup = time.perf_counter()
+
+    # The model (MediaPipe import, download if needed, landmarker build) loads on a
+    # background thread while the camera starts; drawing waits, viewing does not
+    tracker_loader = BackgroundHandTracker()
+
+    # Camera (format, buffer depth and size from config), video file, image directory or synthetic frames.
+    # Files and synthetic frames are paced to their frame rate like a camera.
+    cap = open_source(config.FRAME_SOURCE, realtime=True)
     
-    # Check if camera opened properly
+    # Check if the source opened properly
     if not cap.isOpened():
-        print("Error: Could not open webcam.")
+        print(f"Error: Could not open frame source {config.FRAME_SOURCE!r}.")
+        tracker_loader.release()
         return
-
-    # Set camera resolution. Typical wide format
-    # The actual output might be different based on hardware support
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    print(f"Frame source: {cap.describe()}")
 
     # Initialize Modules
-    hand_tracker = HandTracker()
+    hand_tracker = tracker_loader
+    predictive = None
+    multi_hand = config.MAX_NUM_HANDS > 1
+    if multi_hand:
+        if config.LANDMARK_RECORD_PATH or config.LANDMARK_FILTER:
+            print("Note: landmark recording and filtering only apply to single-hand mode.")
+    else:
+        if config.LANDMARK_FILTER:
+            hand_tracker = predictive = PredictiveTracker(hand_tracker)
+        if config.LANDMARK_RECORD_PATH:
+            # Outermost, so the recording holds the filtered landmarks of every frame the board used
+            hand_tracker = RecordingTracker(hand_tracker, config.LANDMARK_RECORD_PATH)
     gesture_detector = GestureDetector()
     
     # We need the actual frame width/height to initialize the Dashboard and DrawingEngine
     ret, frame = cap.read()
     if not ret:
-        print("Error: Failed to read frame from webcam.")
+        print("Error: Failed to read a frame from the frame source.")
+        tracker_loader.release()
         return
         
     # Resize frame to respect MAX_WIDTH in config
@@ -37,102 +64,195 @@ def main():
         h = int(h * ratio)
         w = config.FRAME_WIDTH_MAX
         
+    base_w, base_h = w, h # The frame governor may lower the working resolution from here
     dashboard = Dashboard(w)
     drawing_engine = DrawingEngine(h, w)
+    drawing_engine.smoothing = predictive is None # The One-Euro filter already smooths the landmarks
     
     # Centralized state dictionary
     state = copy.deepcopy(config.INITIAL_STATE)
+    hand_states = {} # Per-hand state dictionaries in multi-hand mode
+
+    # Restore the last session and keep saving changes in the background
+    session = None
+    if config.AUTOSAVE_PATH:
+        session = SessionStore(config.AUTOSAVE_PATH, drawing_engine)
+        if session.restore():
+            print(f"Restored board from {config.AUTOSAVE_PATH}")
+        session.start()
 
-    # FPS Calculation
-    prev_time = 0
+    # Record how the board evolves for time-lapse playback and export (python timelapse.py)
+    timelapse = None
+    if config.TIMELAPSE_PATH:
+        if drawing_engine.viewport is not None:
+            print("Note: time-lapse recording needs the dense canvas; it is off on the infinite canvas.")
+        else:
+            timelapse = TimelapseRecorder(config.TIMELAPSE_PATH, drawing_engine)
+            timelapse.start()
+
+    # Stream the board to remote viewers
+    broadcast = None
+    if config.BROADCAST_PORT is not None:
+        broadcast = BroadcastServer(drawing_engine)
+        broadcast.start()
+        print(f"Broadcasting on port {broadcast.port} (view with: python board_broadcast.py HOST {broadcast.port})")
+
+    # Frame buffers are reused every iteration (capture, flip, resize); compositing happens in place
+    pool = BufferPool()
+    raw = frame
+
+    # Per-stage timing and FPS (rolling window on a monotonic clock)
+    monitor = PerfMonitor()
+    tracker_error_reported = False
+
+    # Keep frames within the 1/TARGET_FPS budget by lowering quality while they are not
+    governor = None
+    inference_interval = 1 # Serial loop without a PredictiveTracker: frames in between reuse the last landmarks
+    frame_index = 0
+    if config.FRAME_GOVERNOR:
+        levels = config.GOVERNOR_LEVELS
+        if config.PIPELINE_MODE:
+            # Inference paces itself on its thread, and the frame size is fixed once the threads run
+            levels = [name for name in levels if name in ("inference_scale", "toolbar_auto_hide")]
+        governor = FrameGovernor(levels=levels)
+        monitor.set_gauge("quality", governor.describe())
     
-    print("Whiteboard initialized. Press 'q' to quit.")
+    print("Whiteboard initialized. Press 'q' to quit, 'z' to undo, 'y' to redo, 'x' to delete the selection, "
+          "'p' for the performance HUD.")
+    if config.INFINITE_CANVAS:
+        print("Infinite canvas: make a fist to pan (move it toward/away from the camera to zoom), '+'/'-' to zoom.")
+
+    runner = None
+    if config.PIPELINE_MODE:
+        # Capture and inference run on their own threads; this loop is the render stage
+        runner = PipelinedRunner(cap, hand_tracker, w, h, multi_hand=multi_hand, timer=monitor)
+        runner.start()
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Flip the frame horizontally for mirror effect
-        if config.FLIP_FRAME:
-            frame = cv2.flip(frame, 1)
+        if runner:
+            result = runner.next_result()
+            if result is None:
+                break
+            frame, landmarks_data = result
+            if governor:
+                governor.start_frame()
+        else:
+            with monitor.stage("capture"):
+                ret, raw = cap.read(raw)
+            if not ret:
+                break
+            if governor:
+                governor.start_frame() # Waiting for the camera is not part of the frame's work
 
-        # Resize for performance and sizing consistency
-        frame = cv2.resize(frame, (w, h))
-        
-        # 1. Detect Hand Landmarks
-        landmarks_data = hand_tracker.process_frame(frame)
-        
-        dashboard_consumed = False
-        
-        if landmarks_data:
-            # 2. Extract specific landmarks
-            index_tip = landmarks_data["index_tip"]
-            
-            # 3. Detect Gestures
-            gestures = gesture_detector.detect_gestures(landmarks_data)
-            
-            # Update state with gesture data
-            state["pinch_active"] = gestures["pinch"]
-            state["flat_hand"] = gestures["flat_hand"]
-            
-            # 4. Handle Dashboard Interactions
-            # Dashboard interaction takes precedence over drawing
-            dashboard_consumed = dashboard.process_interaction(
-                index_tip=index_tip, 
-                is_pinching=state["pinch_active"], 
-                current_state=state
-            )
-            
-            # 5. Handle Drawing Logic
-            drawing_engine.draw(
-                current_state=state,
-                index_tip=index_tip,
-                dashboard_consumed=dashboard_consumed
-            )
-            
-            # Optional: Draw cursor for user feedback (a small hollow circle at index tip)
-            if not dashboard_consumed:
-                # If pinching, render a solid circle instead
-                cursor_color = state["pen_color"] if not state["flat_hand"] else config.COLORS["white"]
-                cursor_thickness = -1 if state["pinch_active"] else 2
-                cursor_radius = state["pen_size"] if not state["flat_hand"] else state["eraser_size"]
-                cv2.circle(frame, index_tip, cursor_radius, cursor_color, cursor_thickness)
+            with monitor.stage("prepare"):
+                frame = prepare_frame(raw, w, h, pool)
+
+            # 1. Detect Hand Landmarks
+            if frame_index % inference_interval == 0:
+                with monitor.stage("tracker"):
+                    if multi_hand:
+                        landmarks_data = hand_tracker.process_frame_multi(frame)
+                    else:
+                        landmarks_data = hand_tracker.process_frame(frame)
+            frame_index += 1
+
+        # 2-7. Gestures, dashboard, drawing and canvas overlay
+        if multi_hand:
+            final_output = update_board_multi(frame, landmarks_data, hand_states, gesture_detector, dashboard, drawing_engine,
+                                              timer=monitor)
         else:
-            # Reset gestures if no hand found
-            state["pinch_active"] = False
-            state["flat_hand"] = False
-            
-            # Finalize any pending shape if hand is lost mid-draw
-            drawing_engine.draw(
-                current_state=state,
-                index_tip=(0,0), # Dummy tip
-                dashboard_consumed=False
-            )
-            
-        # 6. Render Dashboard (Visuals)
-        dashboard.render(frame, state)
-            
-        # 7. Render Composite Frame (Canvas overlay)
-        final_output = drawing_engine.render_overlay(frame)
-        
+            final_output = update_board(frame, landmarks_data, state, gesture_detector, dashboard, drawing_engine,
+                                        timer=monitor)
+
+        # Startup milestones and tracker loading state
+        if landmarks_data and monitor.milestone("first_detection", startup):
+            print(f"Time to first detection: {monitor.milestones['first_detection']:.2f} s")
+        if tracker_loader.ready and monitor.milestone("tracker_ready", startup):
+            print(f"Hand tracker ready after {monitor.milestones['tracker_ready']:.2f} s "
+                  f"(model load {tracker_loader.load_time:.2f} s)")
+        status = tracker_loader.status_text()
+        if status:
+            cv2.putText(final_output, status, (10, h - 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.COLORS["yellow"], 2)
+        if tracker_loader.error is not None and not tracker_error_reported:
+            print(f"Error: {tracker_loader.error}")
+            tracker_error_reported = True
+
+        if session:
+            session.poll()
+        if timelapse:
+            timelapse.poll()
+        if broadcast:
+            broadcast.poll()
+
         # FPS Calculation & Display
-        curr_time = time.time()
-        fps = 1 / (curr_time - prev_time) if (curr_time - prev_time) > 0 else 0
-        prev_time = curr_time
-        
-        cv2.putText(final_output, f"FPS: {int(fps)}", (10, h - 20),
+        monitor.frame_done()
+        if governor and governor.end_frame():
+            median_ms = governor.changes[-1][3]
+            print(f"Frame governor: {governor.describe()} (median frame {median_ms:.1f} ms, "
+                  f"budget {governor.budget_ms:.1f} ms)")
+            monitor.set_gauge("quality", governor.describe())
+
+            settings = governor.settings()
+            tracker_loader.set_inference_scale(settings["inference_scale"])
+            if predictive is not None:
+                predictive.interval = max(1, config.INFERENCE_INTERVAL) * settings["inference_interval"]
+            else:
+                inference_interval = settings["inference_interval"]
+            new_w, new_h = int(base_w * settings["width_scale"]), int(base_h * settings["width_scale"])
+            if (new_w, new_h) != (w, h):
+                w, h = new_w, new_h
+                dashboard = Dashboard(w)
+                drawing_engine.resize(h, w)
+                pool.frozen = False # The frame buffers change size once; refrozen after the next frame
+            dashboard.auto_hide = settings["toolbar_auto_hide"]
+        if governor and governor.level > 0:
+            cv2.putText(final_output, governor.describe(), (10, h - 80),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, config.COLORS["yellow"], 1)
+        cv2.putText(final_output, f"FPS: {int(monitor.fps())}", (10, h - 20),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, config.COLORS["green"], 2)
+        monitor.render_hud(final_output)
+        monitor.poll()
                     
         # Show Output
-        cv2.imshow("Gesture Controlled Virtual Whiteboard", final_output)
+        with monitor.stage("display"):
+            cv2.imshow("Gesture Controlled Virtual Whiteboard", final_output)
 
-        # Clean Exit
-        key = cv2.waitKey(1) & 0xFF
+            # Clean Exit
+            key = cv2.waitKey(1) & 0xFF
+        if not runner:
+            # Age of the camera frame once it is on screen (the pipelined loop trades this for throughput)
+            monitor.record("latency", (time.perf_counter() - cap.captured_at) * 1000.0)
+        if monitor.milestone("first_frame", startup):
+            print(f"Time to first frame: {monitor.milestones['first_frame']:.2f} s")
+        if config.STRICT_BUFFERS and not pool.frozen:
+            pool.freeze() # Every later frame must reuse the buffers the first one (at this size) created
         if key == ord('q'):
             break
+        elif key == ord('z'):
+            drawing_engine.undo()
+        elif key == ord('y'):
+            drawing_engine.redo()
+        elif key == ord('x'):
+            drawing_engine.delete_selection()
+        elif key in (ord('+'), ord('=')):
+            drawing_engine.zoom_view(1.25)
+        elif key == ord('-'):
+            drawing_engine.zoom_view(0.8)
+        elif key == ord('p'):
+            monitor.toggle_hud()
 
     # Cleanup
+    if runner:
+        runner.stop()
+    if session:
+        session.close()
+    if timelapse:
+        timelapse.close()
+    if broadcast:
+        broadcast.close()
+    if monitor.export_path and monitor.enabled:
+        monitor.export(monitor.export_path)
     cap.release()
     cv2.destroyAllWindows()
     hand_tracker.release()
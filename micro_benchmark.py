@@ -0,0 +1,298 @@
+"""
+Micro-benchmarks of the per-frame hot paths on synthetic frames and scripted landmark
+trajectories, with a saved baseline to catch performance regressions.
+
+Usage:
+    python micro_benchmark.py [--widths 640 1080] [--only draw_]          (print timings)
+    python micro_benchmark.py --save bench_baseline.json                   (record a baseline)
+    python micro_benchmark.py --compare bench_baseline.json [--threshold 0.25]
+
+--compare exits with status 1 if any benchmark's median got slower than the baseline by
+more than the threshold (a fraction). Medians below --noise-floor ms are never flagged.
+Every timing is also shown as a share of the TARGET_FPS frame budget.
+"""
+import argparse
+import copy
+import functools
+import json
+import platform
+import sys
+import time
+import types
+import numpy as np
+import config
+from dashboard import Dashboard
+from display_list import DisplayList
+from drawing_engine import DrawingEngine
+from gesture_detector import GestureDetector
+from hand_tracker import landmarks_from_result
+from landmarks import NUM_LANDMARKS, structure_landmarks
+from perf_monitor import summarize
+
+WIDTHS = (640, 1080, 1920, 3840)
+DEFAULT_THRESHOLD = 0.25 # Allowed slowdown of a median before --compare fails
+DEFAULT_NOISE_FLOOR_MS = 0.005 # Medians this small are too noisy to compare
+
+BENCHMARKS = {} # name -> setup(width, height) returning a step(i) callable to time
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def frame_size(width):
+    """Synthetic 16:9 frame size for a width."""
+    return width, width * 9 // 16
+
+def trajectory(width, height, count=120):
+    """Scripted index-tip path: a looping figure-eight scaled to the frame, below the toolbar."""
+    t = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    cx, cy = width / 2, (height + config.DASHBOARD_HEIGHT) / 2
+    rx, ry = width * 0.35, (height - config.DASHBOARD_HEIGHT) * 0.35
+    return [(int(cx + rx * np.sin(a)), int(cy + ry * np.sin(2 * a))) for a in t]
+
+def hand_landmarks(tip, pinching=True):
+    """(21, 2) landmarks of a hand with its index tip at tip (pinching or flat)."""
+    pts = np.zeros((NUM_LANDMARKS, 2), dtype=int)
+    pts[0], pts[9], pts[2] = (0, 220), (0, 120), (-50, 160)  # wrist, middle mcp, thumb mcp
+    pts[4] = (-2, 2) if pinching else (-90, 80)              # thumb tip
+    for tip_i, pip, x in ((8, 6, 0), (12, 10, 30), (16, 14, 60), (20, 18, 90)):
+        pts[pip] = (x, 60)
+        pts[tip_i] = (x, 0) if (tip_i == 8 or not pinching) else (x, 100)
+    return pts + tip
+
+def _draw_step(width, height, shape, flat=False, release_every=30):
+    engine = DrawingEngine(height, width)
+    state = copy.deepcopy(config.INITIAL_STATE)
+    state["shape_type"] = shape
+    path = trajectory(width, height)
+
+    def step(i):
+        # Release now and then so strokes end and shapes are committed, as in real use
+        active = i % release_every != release_every - 1
+        state["pinch_active"] = active and not flat
+        state["flat_hand"] = flat and active
+        engine.draw(state, path[i % len(path)], dashboard_consumed=False)
+    return step
+
+@benchmark("draw_freehand")
+def _(width, height):
+    return _draw_step(width, height, "freehand")
+
+@benchmark("draw_line")
+def _(width, height):
+    return _draw_step(width, height, "line")
+
+@benchmark("draw_rectangle")
+def _(width, height):
+    return _draw_step(width, height, "rectangle")
+
+@benchmark("draw_circle")
+def _(width, height):
+    return _draw_step(width, height, "circle")
+
+@benchmark("draw_erase")
+def _(width, height):
+    return _draw_step(width, height, "freehand", flat=True)
+
+def _overlay_step(width, height, strokes):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    out = np.empty_like(frame)
+    engine = DrawingEngine(height, width)
+    state = copy.deepcopy(config.INITIAL_STATE)
+    state["pen_size"] = max(2, width // 160)
+    for _ in range(strokes):
+        state["pinch_active"] = True
+        start = rng.uniform((0, config.DASHBOARD_HEIGHT), (width, height))
+        for p in start + np.cumsum(rng.normal(0, width / 40, (20, 2)), axis=0):
+            engine.draw(state, (int(p[0]), int(p[1])), dashboard_consumed=False)
+        state["pinch_active"] = False
+        engine.draw(state, (0, 0), dashboard_consumed=False)
+
+    def step(i):
+        engine.render_overlay(frame, out)
+    return step
+
+@benchmark("overlay_empty")
+def _(width, height):
+    return _overlay_step(width, height, 0)
+
+@benchmark("overlay_sparse")
+def _(width, height):
+    return _overlay_step(width, height, 3)
+
+@benchmark("overlay_dense")
+def _(width, height):
+    return _overlay_step(width, height, 60)
+
+@benchmark("dashboard_render")
+def _(width, height):
+    dashboard = Dashboard(width)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    state = copy.deepcopy(config.INITIAL_STATE)
+    dashboard.render(frame, state) # Toolbar cache warm, as after the first frame
+
+    def step(i):
+        dashboard.render(frame, state)
+    return step
+
+@benchmark("dashboard_interaction")
+def _(width, height):
+    dashboard = Dashboard(width)
+    state = copy.deepcopy(config.INITIAL_STATE)
+    # Hover across the toolbar without pinching, then over the board
+    tips = [(x, config.DASHBOARD_HEIGHT // 2) for x in range(0, width, max(1, width // 60))]
+    tips += trajectory(width, height, 60)
+
+    def step(i):
+        dashboard.process_interaction(index_tip=tips[i % len(tips)], is_pinching=False, current_state=state)
+    return step
+
+@benchmark("gestures")
+def _(width, height):
+    detector = GestureDetector()
+    hands = [structure_landmarks([tuple(p) for p in hand_landmarks(tip, pinching=i % 3 != 0).tolist()])
+             for i, tip in enumerate(trajectory(width, height, 60))]
+
+    def step(i):
+        detector.detect_gestures(hands[i % len(hands)])
+    return step
+
+@benchmark("landmarks_to_dict")
+def _(width, height):
+    # What HandTracker.process_frame does with a detection result: pixels, then the dictionary
+    results = []
+    for tip in trajectory(width, height, 60):
+        pts = hand_landmarks(tip) / (width, height)
+        results.append([[types.SimpleNamespace(x=x, y=y) for x, y in pts.tolist()]])
+
+    def step(i):
+        hands = landmarks_from_result(results[i % len(results)], width, height)
+        structure_landmarks([tuple(p) for p in hands[0].tolist()])
+    return step
+
+@functools.lru_cache(maxsize=1)
+def stroke_board(strokes=20000, size=(4320, 2430)):
+    """
+    Display list of short random strokes over a board four times a 1080-wide frame in each
+    direction (a zoomed-out infinite canvas). Built once, shared by every width.
+    """
+    rng = np.random.default_rng(0)
+    display_list = DisplayList()
+    starts = rng.uniform((0, 0), size, (strokes, 2))
+    for start in starts:
+        points = (start + np.cumsum(rng.normal(0, 6, (12, 2)), axis=0)).astype(int)
+        display_list.add("stroke", [tuple(p) for p in points.tolist()], config.COLORS["blue"], 3)
+    return display_list, size
+
+@benchmark("hit_test")
+def _(width, height):
+    # What the object eraser does every frame: find the strokes under the fingertip
+    display_list, (board_w, board_h) = stroke_board()
+    path = trajectory(board_w, board_h, 240)
+
+    def step(i):
+        display_list.hit_test(path[i % len(path)], config.OBJECT_ERASER_RADIUS)
+    return step
+
+def time_benchmark(step, min_time=0.2, min_calls=20, max_calls=5000, warmup=5):
+    """Per-call timings (milliseconds) of step(i): at least min_calls and min_time seconds, at most max_calls."""
+    for i in range(warmup):
+        step(i)
+    samples = []
+    start = time.perf_counter()
+    i = warmup
+    while len(samples) < max_calls and (len(samples) < min_calls or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        step(i)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+        i += 1
+    return samples
+
+def run_benchmarks(widths=WIDTHS, names=None, min_time=0.2, min_calls=20):
+    """{"name@width": summary (see perf_monitor.summarize)} for the selected benchmarks."""
+    results = {}
+    for width in widths:
+        w, h = frame_size(width)
+        for name, setup in BENCHMARKS.items():
+            if names and not any(name.startswith(n) for n in names):
+                continue
+            results[f"{name}@{width}"] = summarize(time_benchmark(setup(w, h), min_time, min_calls))
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, noise_floor_ms=DEFAULT_NOISE_FLOOR_MS):
+    """
+    Benchmarks whose median is more than threshold (fraction) slower than the baseline's,
+    as a list of (key, baseline p50 ms, current p50 ms). Keys missing on either side are skipped.
+    """
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        now_ms, base_ms = stats["p50_ms"], base["p50_ms"]
+        if max(now_ms, base_ms) < noise_floor_ms:
+            continue
+        if now_ms > base_ms * (1 + threshold):
+            regressions.append((key, base_ms, now_ms))
+    return regressions
+
+def save_baseline(path, results):
+    data = {
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def format_results(results, baseline=None):
+    budget_ms = 1000.0 / config.TARGET_FPS
+    header = f"{'benchmark':<28}{'p50':>9}{'p95':>9}{'max':>9}{'budget':>8}"
+    if baseline is not None:
+        header += f"{'base p50':>10}{'change':>9}"
+    lines = [header + "  (ms, budget = share of a 1/TARGET_FPS frame)"]
+    for key, s in results.items():
+        line = f"{key:<28}{s['p50_ms']:>9.3f}{s['p95_ms']:>9.3f}{s['max_ms']:>9.3f}{100 * s['p50_ms'] / budget_ms:>7.1f}%"
+        if baseline is not None and key in baseline:
+            base = baseline[key]["p50_ms"]
+            change = (s["p50_ms"] / base - 1) * 100 if base > 0 else 0.0
+            line += f"{base:>10.3f}{change:>+8.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the per-frame hot paths.")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(WIDTHS), help="Frame widths to run at (16:9)")
+    parser.add_argument("--only", nargs="+", default=None, help="Only benchmarks whose name starts with one of these")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to time each benchmark for")
+    parser.add_argument("--save", default=None, help="Save the results as a baseline JSON file")
+    parser.add_argument("--compare", default=None, help="Compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed median slowdown before failing, as a fraction (default 0.25)")
+    parser.add_argument("--noise-floor", type=float, default=DEFAULT_NOISE_FLOOR_MS,
+                        help="Medians below this many ms are not compared")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run_benchmarks(args.widths, args.only, args.min_time)
+    print(format_results(results, baseline))
+
+    if args.save:
+        save_baseline(args.save, results)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.noise_floor)
+        for key, base_ms, now_ms in regressions:
+            print(f"REGRESSION {key}: {base_ms:.3f} ms -> {now_ms:.3f} ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Color palette for the palette-indexed canvas (config.PALETTE_CANVAS).
+
+The board only ever holds a few colors, so the canvas can store one uint8 palette index
+per pixel instead of three BGR bytes. Index 0 is "no ink", which makes the index plane its
+own compositing mask; colors are looked up in a (256, 3) table only where ink is shown.
+"""
+import cv2
+import numpy as np
+import config
+
+class Palette:
+    """
+    Up to 255 BGR colors addressed by uint8 index. Black maps to index 0 (transparent),
+    just as black pixels count as blank on the BGR canvas, so the eraser stays "paint black".
+    Colors outside config.COLORS are added on first use.
+    """
+    def __init__(self, colors=None):
+        self.lut = np.zeros((256, 3), dtype=np.uint8)
+        self.channels = [np.zeros(256, dtype=np.uint8) for _ in range(3)] # Per-channel tables for cv2.LUT
+        self.scratch = None # Reused (planes, bgr) buffers for colors(reuse=True)
+        self.index_of = {(0, 0, 0): 0}
+        self.count = 1
+        for color in (config.COLORS.values() if colors is None else colors):
+            self.index(color)
+
+    def __len__(self):
+        return self.count
+
+    def index(self, color):
+        """Palette index of a BGR color, adding it if needed. Raises ValueError once 255 colors are in use."""
+        color = (int(color[0]), int(color[1]), int(color[2]))
+        i = self.index_of.get(color)
+        if i is None:
+            if self.count == len(self.lut):
+                raise ValueError("Palette is full: a palette canvas holds at most 255 colors")
+            i = self.count
+            self.count += 1
+            self.lut[i] = color
+            for channel, value in zip(self.channels, color):
+                channel[i] = value
+            self.index_of[color] = i
+        return i
+
+    def colors(self, indices, reuse=False):
+        """
+        BGR image of an index image. With reuse, the result is a view of scratch buffers
+        that grow to the largest size seen and are overwritten by the next reuse call.
+        """
+        # Three single-channel cv2.LUT passes beat numpy fancy indexing and the 3-channel LUT several times over
+        if not reuse:
+            return cv2.merge([cv2.LUT(indices, channel) for channel in self.channels])
+
+        h, w = indices.shape
+        if self.scratch is None or self.scratch[1].shape[0] < h or self.scratch[1].shape[1] < w:
+            if self.scratch is not None:
+                h0, w0 = self.scratch[1].shape[:2]
+                h, w = max(h, h0), max(w, w0)
+            self.scratch = ([np.empty((h, w), dtype=np.uint8) for _ in range(3)], np.empty((h, w, 3), dtype=np.uint8))
+            h, w = indices.shape
+        planes, bgr = self.scratch
+        views = [cv2.LUT(indices, channel, dst=plane[:h, :w]) for channel, plane in zip(self.channels, planes)]
+        return cv2.merge(views, dst=bgr[:h, :w])
+
+    def indices(self, image):
+        """Index image of a BGR image (e.g. a saved tile), adding any new colors."""
+        pixels = image.reshape(-1, 3).astype(np.uint32)
+        packed = pixels[:, 0] | (pixels[:, 1] << 8) | (pixels[:, 2] << 16)
+        unique, inverse = np.unique(packed, return_inverse=True)
+        table = np.array([self.index((c & 0xFF, (c >> 8) & 0xFF, c >> 16)) for c in unique.tolist()],
+                         dtype=np.uint8)
+        return table[inverse].reshape(image.shape[:2])
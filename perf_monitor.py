@@ -0,0 +1,208 @@
+"""
+Per-stage timing for the live loop and the benchmarks.
+
+StageTimer keeps every sample (for offline runs). PerfMonitor keeps a rolling window per
+stage on the monotonic perf_counter clock, draws an on-screen HUD and periodically exports
+JSON/CSV. Both expose stage(name) -> context manager, the interface update_board and
+PipelinedRunner time their stages with. A disabled PerfMonitor hands out one shared no-op
+context, so leaving the calls in place costs next to nothing.
+"""
+import collections
+import contextlib
+import csv
+import json
+import os
+import time
+import cv2
+import numpy as np
+import config
+
+_NO_STAGE = contextlib.nullcontext()
+
+# Histogram bin edges in milliseconds for exports
+HISTOGRAM_EDGES_MS = [0, 0.5, 1, 2, 4, 8, 16, 33, 66, 133, 266, float("inf")]
+
+def summarize(values):
+    """{"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"} of a sequence of milliseconds."""
+    arr = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "count": int(arr.size),
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(arr.max())
+    }
+
+class _StageTiming:
+    """Context manager timing one stage into its owner (lighter than a generator-based one)."""
+    __slots__ = ("owner", "name", "start")
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.owner._record(self.name, (time.perf_counter() - self.start) * 1000.0)
+
+class StageTimer:
+    """
+    Collects wall-clock durations (perf_counter, milliseconds) per named stage.
+    """
+    def __init__(self):
+        self.samples = {}
+
+    def stage(self, name):
+        return _StageTiming(self, name)
+
+    def summary(self):
+        """{stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}"""
+        return {name: summarize(values) for name, values in self.samples.items() if len(values)}
+
+    def _record(self, name, ms):
+        self.samples.setdefault(name, []).append(ms)
+
+class PerfMonitor(StageTimer):
+    """
+    Rolling per-stage latency window for the live loop, with a toggleable HUD and
+    periodic JSON/CSV export. frame_done() marks the end of every displayed frame.
+    """
+    def __init__(self, enabled=config.PERF_MONITOR, window=config.PERF_WINDOW,
+                 export_path=config.PERF_EXPORT_PATH, export_interval=config.PERF_EXPORT_INTERVAL):
+        super().__init__()
+        self.enabled = enabled
+        self.window = window
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.show_hud = enabled
+        self.totals = collections.Counter() # Samples ever recorded per stage
+        self.frame_times = collections.deque(maxlen=window) # Milliseconds between frame_done() calls
+        self.last_frame = None
+        self.last_export = time.perf_counter()
+        self.hud_lines = []
+        self.hud_updated = 0.0
+        self.milestones = {} # name -> seconds from a start time, recorded once (e.g. time to first frame)
+        self.gauges = {} # name -> latest value of a setting worth seeing next to the timings (e.g. governor level)
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NO_STAGE
+        return _StageTiming(self, name)
+
+    def record(self, name, ms):
+        """Add a duration measured elsewhere (e.g. capture-to-display latency) under name."""
+        if self.enabled:
+            self._record(name, ms)
+
+    def toggle_hud(self):
+        """Show/hide the HUD. Showing it also turns timing on."""
+        self.show_hud = not self.show_hud
+        if self.show_hud:
+            self.enabled = True
+
+    def frame_done(self):
+        """Mark the end of a frame; always on, so fps() works even when stage timing is off."""
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_times.append((now - self.last_frame) * 1000.0)
+        self.last_frame = now
+
+    def milestone(self, name, since):
+        """
+        Record the seconds elapsed since perf_counter time `since` under name, the first time
+        only. Returns True when it was recorded by this call.
+        """
+        if name in self.milestones:
+            return False
+        self.milestones[name] = time.perf_counter() - since
+        return True
+
+    def set_gauge(self, name, value):
+        """Show value under name in the HUD and exports (always kept, like fps())."""
+        self.gauges[name] = value
+        self.hud_updated = 0.0 # Show the change on the next frame
+
+    def fps(self):
+        """Frames per second averaged over the rolling window (0 before the second frame)."""
+        if not self.frame_times:
+            return 0.0
+        return 1000.0 * len(self.frame_times) / sum(self.frame_times)
+
+    def poll(self):
+        """Export every export_interval seconds if an export path is set."""
+        if self.export_path and self.enabled:
+            now = time.perf_counter()
+            if now - self.last_export >= self.export_interval:
+                self.last_export = now
+                self.export(self.export_path)
+
+    def snapshot(self):
+        """Everything an export contains, as a dictionary."""
+        stages = self.summary()
+        for name, stats in stages.items():
+            stats["total_count"] = self.totals[name]
+        histograms = {}
+        for name, values in self.samples.items():
+            counts, _ = np.histogram(np.asarray(values), bins=HISTOGRAM_EDGES_MS)
+            histograms[name] = counts.tolist()
+        return {
+            "timestamp": time.time(),
+            "fps": self.fps(),
+            "window": self.window,
+            "milestones_s": dict(self.milestones),
+            "gauges": dict(self.gauges),
+            "stages": stages,
+            "histogram_edges_ms": HISTOGRAM_EDGES_MS[:-1] + ["inf"],
+            "histograms": histograms
+        }
+
+    def export(self, path):
+        """Write the current statistics to path (.csv for CSV, anything else JSON), atomically."""
+        snapshot = self.snapshot()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            if path.lower().endswith(".csv"):
+                fields = ["stage", "count", "total_count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                for name, stats in snapshot["stages"].items():
+                    writer.writerow({"stage": name, **stats})
+            else:
+                json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def render_hud(self, frame):
+        """Draw the per-stage latency table onto frame (in place) if the HUD is shown."""
+        if not self.show_hud:
+            return frame
+
+        # Percentiles are recomputed twice a second, not every frame
+        now = time.perf_counter()
+        if now - self.hud_updated >= 0.5:
+            self.hud_updated = now
+            self.hud_lines = [f"{self.fps():5.1f} fps   p50 / p95 ms"]
+            for name, stats in self.summary().items():
+                self.hud_lines.append(f"{name:<17}{stats['p50_ms']:6.2f} {stats['p95_ms']:6.2f}")
+            for name, value in self.gauges.items():
+                self.hud_lines.append(f"{name:<17}{value}")
+
+        line_height = 16
+        h, w = frame.shape[:2]
+        x, y = w - 250, config.DASHBOARD_HEIGHT + 10
+        box = frame[y:y + line_height * len(self.hud_lines) + 8, x:w]
+        box //= 3 # Darken the background so the text stays readable
+        for i, line in enumerate(self.hud_lines):
+            cv2.putText(frame, line, (x + 6, y + 16 + i * line_height),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, config.COLORS["green"], 1)
+        return frame
+
+    def _record(self, name, ms):
+        values = self.samples.get(name)
+        if values is None:
+            values = self.samples[name] = collections.deque(maxlen=self.window)
+        values.append(ms)
+        self.totals[name] += 1
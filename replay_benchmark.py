@@ -0,0 +1,148 @@
+"""
+Headless replay benchmark: runs a recorded video through the real
+HandTracker -> GestureDetector -> Dashboard -> DrawingEngine chain with no window
+and reports per-stage latency percentiles, throughput and total time.
+
+Usage:
+    python replay_benchmark.py session.mp4 [--max-frames N] [--canvas-out board.png] [--video-out out.mp4] [--json-out stats.json]
+    python replay_benchmark.py [session.mp4] --landmarks session.wblm   (MediaPipe-free replay)
+    python replay_benchmark.py frames_dir/ | synthetic:1280x720 --max-frames 300   (no video file)
+"""
+import argparse
+import copy
+import json
+import time
+import cv2
+import config
+from gesture_detector import GestureDetector
+from dashboard import Dashboard
+from drawing_engine import DrawingEngine
+from frame_pipeline import prepare_frame, update_board
+from landmark_recorder import ReplayTracker
+from perf_monitor import StageTimer
+from buffer_pool import BufferPool
+from frame_source import SyntheticSource, open_source
+
+def run_replay(video_path, hand_tracker=None, max_frames=None, canvas_out=None, video_out=None, progress=None):
+    """
+    Process every frame of video_path headlessly and return a stats dictionary.
+    video_path is anything frame_source.open_source accepts (video file, image directory, "synthetic:WxH").
+    hand_tracker defaults to a real HandTracker; any object with process_frame/release works.
+    With a ReplayTracker, video_path may be None and blank frames of the recorded size are used.
+    video_out, if given, receives the annotated frames (mp4v). progress(frames_done, total_frames)
+    is called after every frame; total_frames is 0 when the source does not report it.
+    """
+    if video_path is None:
+        if not isinstance(hand_tracker, ReplayTracker):
+            raise ValueError("A video is required unless replaying a landmark recording")
+        cap = SyntheticSource(hand_tracker.frame_width, hand_tracker.frame_height,
+                              count=len(hand_tracker), pattern="blank")
+    else:
+        cap = open_source(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+    w, h = cap.width, cap.height
+    total_frames = cap.frame_count
+    if max_frames is not None:
+        total_frames = min(total_frames, max_frames) if total_frames else max_frames
+
+    # Same sizing rule as main()
+    if w > config.FRAME_WIDTH_MAX:
+        ratio = config.FRAME_WIDTH_MAX / w
+        h = int(h * ratio)
+        w = config.FRAME_WIDTH_MAX
+
+    if hand_tracker is None:
+        from hand_tracker import HandTracker
+        hand_tracker = HandTracker()
+    gesture_detector = GestureDetector()
+    dashboard = Dashboard(w)
+    drawing_engine = DrawingEngine(h, w)
+    state = copy.deepcopy(config.INITIAL_STATE)
+
+    writer = None
+    if video_out:
+        writer = cv2.VideoWriter(video_out, cv2.VideoWriter_fourcc(*"mp4v"), cap.fps or 30, (w, h))
+        if not writer.isOpened():
+            raise IOError(f"Could not open video writer: {video_out}")
+
+    timer = StageTimer()
+    pool = BufferPool()
+    frames = 0
+    start = time.perf_counter()
+
+    try:
+        while max_frames is None or frames < max_frames:
+            with timer.stage("frame"):
+                with timer.stage("capture"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+
+                with timer.stage("prepare"):
+                    frame = prepare_frame(frame, w, h, pool)
+
+                with timer.stage("tracker"):
+                    landmarks_data = hand_tracker.process_frame(frame)
+
+                update_board(frame, landmarks_data, state, gesture_detector, dashboard, drawing_engine, timer=timer)
+
+                if writer is not None:
+                    with timer.stage("encode"):
+                        writer.write(frame)
+            frames += 1
+            if progress is not None:
+                progress(frames, total_frames)
+    finally:
+        total_s = time.perf_counter() - start
+        cap.release()
+        hand_tracker.release()
+        if writer is not None:
+            writer.release()
+
+    if canvas_out:
+        cv2.imwrite(canvas_out, drawing_engine.board_image())
+
+    return {
+        "video": video_path or "(landmarks only)",
+        "frames": frames,
+        "resolution": [w, h],
+        "total_s": total_s,
+        "throughput_fps": frames / total_s if total_s > 0 else 0.0,
+        "stages": timer.summary()
+    }
+
+def format_report(stats):
+    lines = [
+        f"{stats['video']}: {stats['frames']} frames at {stats['resolution'][0]}x{stats['resolution'][1]}",
+        f"total {stats['total_s']:.2f} s, throughput {stats['throughput_fps']:.1f} fps",
+        f"{'stage':<18}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"
+    ]
+    for name, s in stats["stages"].items():
+        lines.append(f"{name:<18}{s['count']:>7}{s['mean_ms']:>9.3f}{s['p50_ms']:>9.3f}"
+                     f"{s['p95_ms']:>9.3f}{s['p99_ms']:>9.3f}{s['max_ms']:>9.3f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless whiteboard pipeline benchmark on a recorded video.")
+    parser.add_argument("video", nargs="?", default=None,
+                        help="Recorded video file, image directory or synthetic:WIDTHxHEIGHT to replay")
+    parser.add_argument("--landmarks", default=None,
+                        help="Landmark recording to replay instead of running MediaPipe")
+    parser.add_argument("--max-frames", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--canvas-out", default=None, help="Write the final canvas to this image file")
+    parser.add_argument("--video-out", default=None, help="Write the annotated frames to this video file")
+    parser.add_argument("--json-out", default=None, help="Write the stats dictionary to this JSON file")
+    args = parser.parse_args()
+
+    hand_tracker = ReplayTracker(args.landmarks) if args.landmarks else None
+    stats = run_replay(args.video, hand_tracker=hand_tracker, max_frames=args.max_frames,
+                       canvas_out=args.canvas_out, video_out=args.video_out)
+    print(format_report(stats))
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(stats, f, indent=2)
+
+if __name__ == "__main__":
+    main()
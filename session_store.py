@@ -0,0 +1,312 @@
+"""
+Crash-safe incremental autosave of the board.
+
+The session file is an append-only log. Every AUTOSAVE_INTERVAL the render loop copies
+just the tiles and display-list operations that changed and hands them to a writer
+thread, which compresses and appends them as one batch. The frame loop never touches
+the disk.
+
+File layout (little endian):
+    header  24 bytes: magic b"WBSS", version u16, tile size u16, canvas width u32,
+                      canvas height u32, board width u32, infinite u8, 3 bytes padding
+    records kind u8, payload length u32, crc32(payload) u32, payload
+        TILE    tx i32, ty i32, height u16, width u16, zlib(pixels) (0x0 = blank tile)
+        OP      zlib(op_id u32, kind u8, color 3 x u8, size f8, count u32, points f8[count][2])
+        REMOVE  op_id u32
+        COMMIT  (empty) closes a batch
+
+Only batches closed by a COMMIT are loaded, and reading stops at the first truncated or
+corrupt record, so a killed process leaves a valid file holding everything up to the
+last completed save. Restoring starts a fresh, compacted file in the background, and the
+writer compacts the log again whenever it grows past AUTOSAVE_COMPACT_RATIO times the
+live board.
+"""
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+import config
+from display_list import DisplayOp
+
+MAGIC = b"WBSS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIB3x")
+RECORD = struct.Struct("<BII")
+TILE = struct.Struct("<iiHH")
+OP = struct.Struct("<IB3BdI")
+REMOVE = struct.Struct("<I")
+
+TILE_RECORD, OP_RECORD, REMOVE_RECORD, COMMIT_RECORD = 1, 2, 3, 4
+OP_KINDS = ("stroke", "erase", "line", "rectangle", "circle")
+
+def encode_tile(key, pixels):
+    """TILE payload for a tile's pixels (None for a blank tile)."""
+    if pixels is None:
+        return TILE.pack(key[0], key[1], 0, 0)
+    h, w = pixels.shape[:2]
+    return TILE.pack(key[0], key[1], h, w) + zlib.compress(pixels.tobytes(), 1)
+
+def decode_tile(payload):
+    """(key, pixels or None) from a TILE payload."""
+    tx, ty, h, w = TILE.unpack_from(payload)
+    if not h * w:
+        return (tx, ty), None
+    return (tx, ty), np.frombuffer(zlib.decompress(payload[TILE.size:]), dtype=np.uint8).reshape(h, w, 3).copy()
+
+def encode_op(op_id, kind, color, size, points):
+    pts = np.asarray(points, dtype="<f8").reshape(-1, 2)
+    payload = OP.pack(op_id, OP_KINDS.index(kind), *color, size, len(pts)) + pts.tobytes()
+    return zlib.compress(payload, 1)
+
+def decode_op(payload):
+    data = zlib.decompress(payload)
+    op_id, kind, b, g, r, size, count = OP.unpack_from(data)
+    pts = np.frombuffer(data, dtype="<f8", count=count * 2, offset=OP.size).reshape(count, 2)
+    points = [(x, y) for x, y in pts.tolist()]
+    return DisplayOp(op_id, OP_KINDS[kind], points, (b, g, r), size)
+
+def pack_records(records):
+    """File bytes for [(kind, payload)], closed by a COMMIT record."""
+    records = records + [(COMMIT_RECORD, b"")]
+    return b"".join(RECORD.pack(kind, len(payload), zlib.crc32(payload)) + payload for kind, payload in records)
+
+def read_session(path):
+    """
+    Load a session file. Returns None if it is missing or not a session file, otherwise
+    {"tile_size", "width", "height", "board_width", "infinite",
+     "tiles": {key: pixels or None (blank)}, "ops": [DisplayOp in drawing order]}.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, tile_size, width, height, board_width, infinite = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            return None
+
+        tiles = {}   # key -> TILE payload, decompressed once at the end
+        ops = {}     # op_id -> record payload
+        batch = []
+        while True:
+            record = f.read(RECORD.size)
+            if len(record) < RECORD.size:
+                break
+            kind, length, crc = RECORD.unpack(record)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break # Torn write at the end of the log
+
+            if kind != COMMIT_RECORD:
+                batch.append((kind, payload))
+                continue
+            for kind, payload in batch:
+                if kind == TILE_RECORD:
+                    tx, ty = TILE.unpack_from(payload)[:2]
+                    tiles[(tx, ty)] = payload
+                elif kind == OP_RECORD:
+                    op_id = OP.unpack_from(zlib.decompress(payload))[0]
+                    ops[op_id] = payload
+                elif kind == REMOVE_RECORD:
+                    ops.pop(REMOVE.unpack(payload)[0], None)
+            batch = []
+
+    return {
+        "tile_size": tile_size,
+        "width": width,
+        "height": height,
+        "board_width": board_width,
+        "infinite": bool(infinite),
+        "tiles": dict(decode_tile(payload) for payload in tiles.values()),
+        "ops": [decode_op(ops[i]) for i in sorted(ops)]
+    }
+
+class SessionStore:
+    """
+    Keeps a session file in step with a DrawingEngine. Call restore() once at startup,
+    then start(), poll() every frame and close() on exit.
+    """
+    def __init__(self, path, drawing_engine, interval=config.AUTOSAVE_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.engine = drawing_engine
+        self.interval = interval
+        self.clock = clock
+        self.last_save = clock()
+        self.tile_cache = None # Cache the log was written for; a resize replaces it
+        self.watcher = None    # Our change watcher on that cache
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._writer_loop, name="autosave", daemon=True)
+        self.file = None
+        self.bytes_written = 0
+        # Writer thread only: the latest record of every live tile and operation, to compact the log from
+        self.header = None
+        self.live_tiles = {} # key -> TILE payload
+        self.live_ops = {}   # op_id -> OP payload
+        self.live_bytes = 0  # Size of those records in the file
+        self.log_bytes = 0   # Size of the session file
+        self.compactions = 0
+
+    def restore(self):
+        """Load the saved board into the engine. Returns False if there was nothing to restore."""
+        saved = read_session(self.path)
+        if saved is None:
+            return False
+
+        engine = self.engine
+        infinite = engine.viewport is not None
+        tiles_match = (
+            saved["infinite"] == infinite and
+            saved["tile_size"] == engine.tile_cache.tile_size and
+            (infinite or (saved["width"], saved["height"], saved["board_width"]) == (engine.width, engine.height, engine.board_width))
+        )
+        if tiles_match:
+            # Blank entries only matter while replaying the log; a fresh engine is blank already
+            tiles = {key: pixels for key, pixels in saved["tiles"].items() if pixels is not None}
+        else:
+            tiles = None # Saved at another size or mode: re-render from the display list
+        engine.load_board(saved["ops"], tiles, board_width=saved["board_width"] or None)
+        return True
+
+    def start(self):
+        """Start the writer thread with a compacted copy of the current board."""
+        self._queue_snapshot()
+        self.thread.start()
+
+    def poll(self):
+        """Queue the changes since the last save if AUTOSAVE_INTERVAL has passed. Cheap when idle."""
+        now = self.clock()
+        if now - self.last_save >= self.interval:
+            self.last_save = now
+            self.save()
+
+    def save(self):
+        """Queue everything that changed since the last save for the writer thread."""
+        engine = self.engine
+        if engine.tile_cache is not self.tile_cache:
+            self._queue_snapshot()
+            return
+
+        keys = engine.tile_cache.take_changed(self.watcher)
+        changed, removed = engine.display_list.take_changes()
+        if not (keys or changed or removed):
+            return
+        ops = engine.display_list.ops
+        self.jobs.put({
+            "rewrite": False,
+            "tiles": [(key, self._tile_pixels(key)) for key in keys],
+            "ops": [self._op_record(ops[i]) for i in sorted(changed) if i in ops],
+            "removed": sorted(removed)
+        })
+
+    def close(self):
+        """Save the last changes, wait for the writer thread and close the file."""
+        if self.thread.is_alive():
+            self.save()
+            self.jobs.put(None)
+            self.thread.join()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _queue_snapshot(self):
+        """Queue the whole board, to be written to a new file that replaces the log."""
+        engine = self.engine
+        cache = engine.tile_cache
+        if cache is not self.tile_cache:
+            self.tile_cache = cache
+            self.watcher = cache.watch()
+        cache.take_changed(self.watcher)
+        engine.display_list.take_changes()
+
+        infinite = engine.viewport is not None
+        self.jobs.put({
+            "rewrite": True,
+            "header": HEADER.pack(MAGIC, VERSION, cache.tile_size,
+                                  0 if infinite else engine.width, 0 if infinite else engine.height,
+                                  engine.board_width, int(infinite)),
+            "tiles": [(key, self._tile_pixels(key)) for key in cache.tile_keys()],
+            "ops": [self._op_record(op) for op in engine.display_list],
+            "removed": []
+        })
+
+    def _tile_pixels(self, key):
+        if self.engine.viewport is not None:
+            tile = self.tile_cache.tiles.get(key)
+            return None if tile is None else tile.copy()
+        return self.tile_cache.tile_image(key)
+
+    def _op_record(self, op):
+        return (op.op_id, op.kind, op.color, op.size, list(op.points))
+
+    def _writer_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            if job["rewrite"]:
+                self.header = job["header"]
+                self.live_tiles, self.live_ops, self.live_bytes = {}, {}, 0
+
+            records = []
+            for key, pixels in job["tiles"]:
+                payload = encode_tile(key, pixels)
+                records.append((TILE_RECORD, payload))
+                self._set_live(self.live_tiles, key, None if pixels is None else payload)
+            for record in job["ops"]:
+                payload = encode_op(*record)
+                records.append((OP_RECORD, payload))
+                self._set_live(self.live_ops, record[0], payload)
+            for op_id in job["removed"]:
+                records.append((REMOVE_RECORD, REMOVE.pack(op_id)))
+                self._set_live(self.live_ops, op_id, None)
+            data = pack_records(records)
+
+            if job["rewrite"]:
+                self._rewrite(self.header + data)
+                self.log_bytes = len(self.header) + len(data)
+            else:
+                self.file.write(data)
+                self.file.flush()
+                if config.AUTOSAVE_FSYNC:
+                    os.fsync(self.file.fileno())
+                self.log_bytes += len(data)
+                if self.log_bytes > max(config.AUTOSAVE_COMPACT_RATIO * self.live_bytes,
+                                        config.AUTOSAVE_COMPACT_MIN_MB * 1024 * 1024):
+                    self._compact()
+            self.bytes_written += len(data)
+
+    def _set_live(self, live, key, payload):
+        """Make payload the live record for key (None: key no longer needs a record)."""
+        old = live.pop(key, None)
+        if old is not None:
+            self.live_bytes -= RECORD.size + len(old)
+        if payload is not None:
+            live[key] = payload
+            self.live_bytes += RECORD.size + len(payload)
+
+    def _compact(self):
+        """Replace the log with one batch holding only the live records."""
+        records = [(TILE_RECORD, payload) for payload in self.live_tiles.values()]
+        records += [(OP_RECORD, self.live_ops[op_id]) for op_id in sorted(self.live_ops)]
+        data = self.header + pack_records(records)
+        self._rewrite(data)
+        self.log_bytes = len(data)
+        self.compactions += 1
+
+    def _rewrite(self, data):
+        """Atomically replace the session file with data, then keep appending to it."""
+        if self.file is not None:
+            self.file.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "ab")
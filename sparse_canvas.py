@@ -0,0 +1,208 @@
+"""
+Unbounded whiteboard storage for the infinite canvas mode.
+
+SparseTileStore keeps the board as square tiles in world pixels that exist only where
+there is ink, so memory follows the amount drawn rather than the board's extent.
+Viewport maps screen pixels to world pixels (pan offset + zoom); compositing only
+visits the tiles inside it, so per-frame cost does not grow with the board.
+"""
+import math
+import cv2
+import numpy as np
+import config
+from tile_cache import TileCache
+
+class Viewport:
+    """
+    Screen window onto the world. (x, y) is the world pixel at the screen's top-left
+    corner and zoom is screen pixels per world pixel.
+    """
+    def __init__(self, width, height, x=0.0, y=0.0, zoom=1.0):
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+
+    def to_world(self, point):
+        return (point[0] / self.zoom + self.x, point[1] / self.zoom + self.y)
+
+    def to_screen(self, point):
+        """World point -> screen pixel."""
+        return (int(round((point[0] - self.x) * self.zoom)), int(round((point[1] - self.y) * self.zoom)))
+
+    def world_rect(self):
+        """Visible world area (x1, y1, x2, y2)."""
+        return (self.x, self.y, self.x + self.width / self.zoom, self.y + self.height / self.zoom)
+
+    def zoom_at(self, anchor, zoom):
+        """Change zoom (clamped to ZOOM_MIN..ZOOM_MAX) keeping the world point under the screen point anchor fixed."""
+        wx, wy = self.to_world(anchor)
+        self.zoom = min(max(zoom, config.ZOOM_MIN), config.ZOOM_MAX)
+        self.x = wx - anchor[0] / self.zoom
+        self.y = wy - anchor[1] / self.zoom
+
+    def resize(self, width, height):
+        """New screen size showing the same world width (the zoom follows the width)."""
+        self.zoom *= width / self.width
+        self.width = width
+        self.height = height
+
+class SparseTileStore(TileCache):
+    """
+    TileCache over an unbounded plane. Missing tiles read as blank; a tile is allocated
+    on the first ink painted into it and freed again once it is blank. Each tile keeps
+    its own ink mask, refreshed only where it was painted.
+    """
+    def __init__(self, tile_size=config.TILE_SIZE):
+        self.tile_size = tile_size
+        self.tiles = {}  # (tx, ty) -> (tile_size, tile_size, 3) uint8
+        self.masks = {}  # (tx, ty) -> (tile_size, tile_size) uint8, 255 where the tile has ink
+        self.dirty = set()
+        self.watchers = []
+        self.palette = None # Sparse tiles are always BGR
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in self.tiles.values()) + sum(m.nbytes for m in self.masks.values())
+
+    def tile_rect(self, key):
+        tx, ty = key
+        ts = self.tile_size
+        return (tx * ts, ty * ts, (tx + 1) * ts, (ty + 1) * ts)
+
+    def tile_keys(self, rect=None):
+        """Keys of all tiles overlapping rect (world pixels), or of every allocated tile."""
+        if rect is None:
+            return list(self.tiles)
+        ts = self.tile_size
+        x1, y1, x2, y2 = rect
+        if x1 >= x2 or y1 >= y2:
+            return []
+        return [(tx, ty)
+                for ty in range(y1 // ts, (y2 - 1) // ts + 1)
+                for tx in range(x1 // ts, (x2 - 1) // ts + 1)]
+
+    def read_tile(self, key):
+        tile = self.tiles.get(key)
+        if tile is None:
+            return np.zeros((self.tile_size, self.tile_size, 3), dtype=np.uint8)
+        return tile.copy()
+
+    def write_tile(self, key, pixels):
+        if pixels.any():
+            self.tiles[key] = pixels.copy()
+            self.masks[key] = self._ink_mask(self.tiles[key])
+            self._mark_changed((key,))
+        else:
+            self.clear_tile(key)
+        return self.tile_rect(key)
+
+    def clear_tile(self, key):
+        if self.tiles.pop(key, None) is not None:
+            self._mark_changed((key,))
+        self.masks.pop(key, None)
+
+    def clear(self):
+        self._mark_changed(self.tiles)
+        self.tiles.clear()
+        self.masks.clear()
+        self.dirty.clear()
+
+    def paint(self, mask, x0, y0, color, clip=None):
+        """
+        Paint color wherever mask is set, with the mask's top-left at world (x0, y0).
+        Painting black (erasing) never allocates tiles. Returns the world rect touched.
+        """
+        mh, mw = mask.shape
+        x1, y1, x2, y2 = x0, y0, x0 + mw, y0 + mh
+        if clip is not None:
+            x1, y1 = max(x1, clip[0]), max(y1, clip[1])
+            x2, y2 = min(x2, clip[2]), min(y2, clip[3])
+        if x1 >= x2 or y1 >= y2:
+            return None
+
+        erasing = not any(color)
+        for key in self.tile_keys((x1, y1, x2, y2)):
+            tile = self.tiles.get(key)
+            if tile is None and erasing:
+                continue
+            tx1, ty1, tx2, ty2 = self.tile_rect(key)
+            ax1, ay1 = max(x1, tx1), max(y1, ty1)
+            ax2, ay2 = min(x2, tx2), min(y2, ty2)
+            part = mask[ay1 - y0:ay2 - y0, ax1 - x0:ax2 - x0] > 0
+            if not part.any():
+                continue
+            if tile is None:
+                tile = self.tiles[key] = np.zeros((self.tile_size, self.tile_size, 3), dtype=np.uint8)
+                self.masks[key] = np.zeros((self.tile_size, self.tile_size), dtype=np.uint8)
+
+            region = (slice(ay1 - ty1, ay2 - ty1), slice(ax1 - tx1, ax2 - tx1))
+            tile[region][part] = color
+            tile_mask = self.masks[key]
+            tile_mask[region] = self._ink_mask(tile[region])
+            self._mark_changed((key,))
+            if erasing and not tile_mask.any():
+                self.clear_tile(key)
+        return (x1, y1, x2, y2)
+
+    def bounds(self):
+        """World rect covering every allocated tile, or None for a blank board."""
+        if not self.tiles:
+            return None
+        txs = [k[0] for k in self.tiles]
+        tys = [k[1] for k in self.tiles]
+        ts = self.tile_size
+        return (min(txs) * ts, min(tys) * ts, (max(txs) + 1) * ts, (max(tys) + 1) * ts)
+
+    def to_image(self):
+        """The whole inked area at zoom 1 on a black background (None for a blank board)."""
+        rect = self.bounds()
+        if rect is None:
+            return None
+        x1, y1, x2, y2 = rect
+        image = np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        for key, tile in self.tiles.items():
+            tx1, ty1, tx2, ty2 = self.tile_rect(key)
+            image[ty1 - y1:ty2 - y1, tx1 - x1:tx2 - x1] = tile
+        return image
+
+    def composite(self, frame, viewport):
+        """Copy the inked pixels of every tile visible in viewport onto frame (in place)."""
+        ts = self.tile_size
+        zoom = viewport.zoom
+        wx1, wy1, wx2, wy2 = viewport.world_rect()
+        fh, fw = frame.shape[:2]
+
+        for ty in range(math.floor(wy1 / ts), math.ceil(wy2 / ts)):
+            # Tile edges are rounded independently, so neighbouring tiles meet without gaps
+            sy1 = round((ty * ts - viewport.y) * zoom)
+            sy2 = round(((ty + 1) * ts - viewport.y) * zoom)
+            for tx in range(math.floor(wx1 / ts), math.ceil(wx2 / ts)):
+                tile = self.tiles.get((tx, ty))
+                if tile is None:
+                    continue
+                sx1 = round((tx * ts - viewport.x) * zoom)
+                sx2 = round(((tx + 1) * ts - viewport.x) * zoom)
+                if sx2 <= sx1 or sy2 <= sy1:
+                    continue
+
+                mask = self.masks[(tx, ty)]
+                if (sx2 - sx1, sy2 - sy1) != (ts, ts):
+                    size = (sx2 - sx1, sy2 - sy1)
+                    tile = cv2.resize(tile, size, interpolation=cv2.INTER_NEAREST)
+                    mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+
+                cx1, cy1 = max(sx1, 0), max(sy1, 0)
+                cx2, cy2 = min(sx2, fw), min(sy2, fh)
+                if cx1 >= cx2 or cy1 >= cy2:
+                    continue
+                src = (slice(cy1 - sy1, cy2 - sy1), slice(cx1 - sx1, cx2 - sx1))
+                cv2.copyTo(tile[src], mask[src], frame[cy1:cy2, cx1:cx2])
+
+    def _ink_mask(self, pixels):
+        gray = cv2.cvtColor(pixels, cv2.COLOR_BGR2GRAY)
+        return cv2.threshold(gray, 1, 255, cv2.THRESH_BINARY)[1]
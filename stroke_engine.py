@@ -0,0 +1,126 @@
+"""
+Freehand stroke geometry: Catmull-Rom spline sampling, Ramer-Douglas-Peucker simplification
+and the growable point array a stroke in progress is kept in.
+
+A stroke is a uniform Catmull-Rom spline through its points. The segment from point i to
+point i + 1 is shaped by points i - 1 .. i + 2 (clamped at the ends), so it is final as soon
+as the point after it is known. Spline samples are computed relative to each segment's start
+point and rounded with floor(x + 0.5), which makes them depend only on point differences:
+a segment gives the same pixels whether it is drawn live, alone, or as part of the whole
+stroke during a tile re-render.
+"""
+import numpy as np
+import config
+
+def control_indices(i, count):
+    """Indices of the four control points of segment i (point i -> i + 1) of a count-point stroke."""
+    return (max(i - 1, 0), i, i + 1, min(i + 2, count - 1))
+
+def segment_controls(points, i):
+    """The four control points of segment i as a list."""
+    return [points[j] for j in control_indices(i, len(points))]
+
+def spline_samples(controls, step=config.STROKE_SPLINE_STEP):
+    """
+    Sample uniform Catmull-Rom segments. controls is an (S, 4, 2) array of integer control
+    points p0..p3 per segment, each segment running from p1 to p2 with about one sample per
+    step pixels. Returns the samples of all segments in order as an (M, 2) int32 array;
+    consecutive segments share their joint and the last segment's end point is included.
+    """
+    c = np.asarray(controls, dtype=np.float64).reshape(-1, 4, 2)
+    p1 = c[:, 1]
+    d0, d2, d3 = c[:, 0] - p1, c[:, 2] - p1, c[:, 3] - p1
+
+    # Polynomial coefficients with p1 at the origin (exact: differences of integers)
+    linear = d2 - d0
+    quadratic = 2 * d0 + 4 * d2 - d3
+    cubic = d3 - d0 - 3 * d2
+
+    counts = np.maximum(1, np.ceil(np.hypot(d2[:, 0], d2[:, 1]) / step)).astype(np.intp)
+    seg = np.repeat(np.arange(len(c)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    t = ((np.arange(len(seg)) - starts) / counts[seg])[:, None] # [0, 1) within each segment
+
+    offsets = 0.5 * (((cubic[seg] * t + quadratic[seg]) * t + linear[seg]) * t)
+    samples = np.floor(offsets + 0.5) + p1[seg]
+    end = c[-1:, 2]
+    return np.concatenate((samples, end)).astype(np.int32)
+
+def stroke_polyline(points, step=config.STROKE_SPLINE_STEP):
+    """The spline through a stroke's integer points, as an (M, 2) int32 polyline."""
+    pts = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+    if len(pts) < 2:
+        return pts
+    n = len(pts)
+    i = np.arange(n - 1)
+    idx = np.stack((np.maximum(i - 1, 0), i, i + 1, np.minimum(i + 2, n - 1)), axis=1)
+    return spline_samples(pts[idx], step)
+
+def spline_pad(points):
+    """
+    Extra bounding-box margin the spline through points can reach beyond their box.
+    Catmull-Rom weights are never below -1/8 in total, so a segment stays within 1/8 of
+    its control points' extent outside of their bounding box.
+    """
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return int(np.ceil(max(max(xs) - min(xs), max(ys) - min(ys)) / 8)) + 1
+
+def simplify(points, epsilon=config.STROKE_SIMPLIFY_EPSILON):
+    """
+    Ramer-Douglas-Peucker: indices of the points to keep so that no dropped point is further
+    than epsilon from the polyline through the kept ones. The end points are always kept.
+    """
+    n = len(points)
+    if n < 3 or epsilon <= 0:
+        return list(range(n))
+
+    pts = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        chord = pts[b] - pts[a]
+        rel = pts[a + 1:b] - pts[a]
+        length = np.hypot(chord[0], chord[1])
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(chord[0] * rel[:, 1] - chord[1] * rel[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > epsilon:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return np.flatnonzero(keep).tolist()
+
+class StrokePath:
+    """
+    Points of a stroke in progress as a growable (N, 2) int32 array (amortized O(1) append).
+    """
+    def __init__(self, capacity=64):
+        self.buffer = np.empty((capacity, 2), dtype=np.int32)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def points(self):
+        return self.buffer[:self.count]
+
+    def append(self, point):
+        if self.count == len(self.buffer):
+            grown = np.empty((2 * len(self.buffer), 2), dtype=np.int32)
+            grown[:self.count] = self.buffer[:self.count]
+            self.buffer = grown
+        self.buffer[self.count] = point
+        self.count += 1
+
+    def controls(self, i):
+        """(4, 2) control points of segment i."""
+        return self.points[list(control_indices(i, self.count))]
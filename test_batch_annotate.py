@@ -0,0 +1,62 @@
+"""
+Offline verification that batch annotation in worker processes produces the same boards
+as a single-process replay, using landmark recordings instead of MediaPipe.
+"""
+import os
+import tempfile
+import cv2
+import numpy as np
+from batch_annotate import annotate_videos, worker_summary
+from landmark_recorder import LandmarkRecorder, ReplayTracker
+from replay_benchmark import run_replay
+from test_frame_pipeline import pinching_hand
+
+def make_recording(tmp, name, count, radius):
+    """A short video plus the landmark recording of a pinching hand tracing a circle over it."""
+    video = os.path.join(tmp, name + ".mp4")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 240))
+    with LandmarkRecorder(os.path.join(tmp, "landmarks", name + ".wblm"), 320, 240) as recorder:
+        for i in range(count):
+            writer.write(np.full((240, 320, 3), 40 + i, dtype=np.uint8))
+            a = 2 * np.pi * i / count
+            recorder.record(pinching_hand((int(160 + radius * np.cos(a)), int(140 + radius * np.sin(a)))))
+    writer.release()
+    return video
+
+def test_batch_matches_single_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "landmarks"))
+        videos = [make_recording(tmp, "a", 40, 50), make_recording(tmp, "b", 25, 30)]
+        missing = os.path.join(tmp, "missing.mp4")
+        out_dir = os.path.join(tmp, "out")
+        progress = []
+
+        results = annotate_videos(videos + [missing], out_dir, workers=2,
+                                  landmarks_dir=os.path.join(tmp, "landmarks"),
+                                  on_progress=lambda *message: progress.append(message))
+
+        assert "error" in results[2], "A broken video must be reported, not stop the batch"
+        for video, stats, count in zip(videos, results, (40, 25)):
+            assert stats["frames"] == count
+            assert (video, count, count) in progress, "Expected a final progress message per video"
+
+            annotated = cv2.VideoCapture(stats["video_out"])
+            assert int(annotated.get(cv2.CAP_PROP_FRAME_COUNT)) == count
+            annotated.release()
+
+            # Same board as replaying the video in this process
+            stem = os.path.splitext(os.path.basename(video))[0]
+            reference = os.path.join(tmp, stem + "_reference.png")
+            run_replay(video, hand_tracker=ReplayTracker(os.path.join(tmp, "landmarks", stem + ".wblm")),
+                       canvas_out=reference)
+            board = cv2.imread(stats["board_out"])
+            assert board.any() and np.array_equal(board, cv2.imread(reference)), "Worker board differs"
+
+        summary = worker_summary(results)
+        assert sum(s["frames"] for s in summary.values()) == 65
+        assert all(s["fps"] > 0 for s in summary.values())
+    print("test_batch_matches_single_process passed")
+
+if __name__ == "__main__":
+    test_batch_matches_single_process()
+    print("All tests passed.")
@@ -0,0 +1,86 @@
+"""
+Localhost verification of the live board broadcast: late joiners, deltas and slow viewers.
+"""
+import copy
+import socket
+import time
+import numpy as np
+from config import INITIAL_STATE
+from drawing_engine import DrawingEngine
+from board_broadcast import BroadcastServer, BroadcastViewer
+
+def draw_stroke(engine, points):
+    state = copy.deepcopy(INITIAL_STATE)
+    state["pinch_active"] = True
+    for p in points:
+        engine.draw(state, p, dashboard_consumed=False)
+    state["pinch_active"] = False
+    engine.draw(state, points[-1], dashboard_consumed=False)
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def presenter_board(engine):
+    return engine.render_overlay(np.zeros((engine.height, engine.width, 3), dtype=np.uint8))
+
+def test_viewer_follows_board():
+    for infinite in (False, True):
+        engine = DrawingEngine(240, 320, infinite=infinite)
+        server = BroadcastServer(engine, host="127.0.0.1", port=0)
+        server.start()
+        try:
+            # Joining after drawing started: the keyframe brings the viewer up to date
+            draw_stroke(engine, [(40 + 10 * i, 60 + 5 * i) for i in range(10)])
+            server.publish()
+            viewer = BroadcastViewer("127.0.0.1", server.port)
+            assert wait_for(lambda: np.array_equal(viewer.render(), presenter_board(engine))), "Keyframe out of sync"
+
+            # Later changes arrive as deltas
+            draw_stroke(engine, [(200, 200), (300, 100)])
+            if infinite:
+                engine.zoom_view(0.5)
+            server.publish()
+            assert wait_for(lambda: np.array_equal(viewer.render(), presenter_board(engine))), "Delta out of sync"
+            viewer.close()
+        finally:
+            server.close()
+    print("test_viewer_follows_board passed")
+
+def test_slow_viewer_does_not_block_drawing():
+    engine = DrawingEngine(240, 320)
+    server = BroadcastServer(engine, host="127.0.0.1", port=0, queue_size=2)
+    server.start()
+    stalled = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(("127.0.0.1", server.port)) # Never reads
+    viewer = BroadcastViewer("127.0.0.1", server.port)
+    try:
+        assert wait_for(lambda: len(server.viewers) == 2)
+        rng = np.random.default_rng(0)
+        slowest = 0.0
+        for _ in range(40):
+            # Incompressible updates fill the stalled viewer's socket buffers quickly
+            for key in engine.tile_cache.tile_keys():
+                engine.tile_cache.write_tile(key, rng.integers(0, 256, engine.tile_cache.read_tile(key).shape, dtype=np.uint8))
+            start = time.perf_counter()
+            server.publish()
+            slowest = max(slowest, time.perf_counter() - start)
+
+        assert wait_for(lambda: any(v.resyncs for v in server.viewers)), "Stalled viewer should be resynced"
+        assert slowest < 0.1, f"publish() blocked for {slowest:.3f} s"
+        assert wait_for(lambda: np.array_equal(viewer.render(), engine.canvas)), "Healthy viewer fell out of sync"
+    finally:
+        viewer.close()
+        stalled.close()
+        server.close()
+    print("test_slow_viewer_does_not_block_drawing passed")
+
+if __name__ == "__main__":
+    test_viewer_follows_board()
+    test_slow_viewer_does_not_block_drawing()
+    print("All tests passed.")
@@ -0,0 +1,77 @@
+"""
+Offline verification that the cached toolbar and column lookup match direct drawing and scanning.
+"""
+import copy
+import numpy as np
+import config
+from dashboard import Dashboard
+
+def linear_scan(dashboard, x, y):
+    for name, data in dashboard.regions.items():
+        x1, y1, x2, y2 = data["rect"]
+        if x1 <= x <= x2 and y1 <= y <= y2:
+            return name
+    return None
+
+def test_cached_render_matches_direct_drawing():
+    rng = np.random.default_rng(0)
+    dashboard = Dashboard(1080)
+    state = copy.deepcopy(config.INITIAL_STATE)
+
+    for color in ("red", "blue", "yellow"):
+        state["pen_color"] = config.COLORS[color]
+        strips = []
+        for _ in range(2): # Second pass is served from the cache
+            frame = rng.integers(0, 256, (607, 1080, 3), dtype=np.uint8)
+            expected = frame.copy()
+            dashboard._draw_toolbar(expected, state)
+            dashboard.render(frame, state)
+            assert np.array_equal(frame, expected), f"Cached toolbar differs for {color}"
+            strips.append(dashboard.strip)
+        assert strips[0] is strips[1], "Unchanged state should reuse the cached strip"
+
+    # Only the current strip is kept
+    assert dashboard.strip_key[0] == config.COLORS["yellow"]
+    print("test_cached_render_matches_direct_drawing passed")
+
+def test_column_lookup_matches_linear_scan():
+    dashboard = Dashboard(1080)
+    for x in range(-5, 1090):
+        for y in (-1, 0, 40, config.DASHBOARD_HEIGHT):
+            state = copy.deepcopy(config.INITIAL_STATE)
+            expected_state = copy.deepcopy(config.INITIAL_STATE)
+            name = linear_scan(dashboard, x, y)
+            if name:
+                data = dashboard.regions[name]
+                key = {"color": "pen_color", "size": "pen_size",
+                       "shape": "shape_type", "eraser_size": "eraser_size"}[data["type"]]
+                expected_state[key] = data["value"]
+
+            assert dashboard.process_interaction((x, y), True, state) is True
+            assert state == expected_state, f"Hit test differs at {(x, y)}"
+    print("test_column_lookup_matches_linear_scan passed")
+
+def test_auto_hide_draws_toolbar_only_near_hand():
+    dashboard = Dashboard(640)
+    dashboard.auto_hide = True
+    state = copy.deepcopy(config.INITIAL_STATE)
+
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    dashboard.process_interaction((300, 300), False, state)
+    dashboard.render(frame, state)
+    assert not frame.any(), "Toolbar drawn with the hand far from it"
+
+    dashboard.process_interaction((300, config.DASHBOARD_HEIGHT + 20), False, state)
+    dashboard.render(frame, state)
+    assert frame.any(), "Toolbar hidden with the hand next to it"
+
+    frame[:] = 0
+    dashboard.render(frame, state)
+    assert not frame.any(), "Nearness must be reported again every frame"
+    print("test_auto_hide_draws_toolbar_only_near_hand passed")
+
+if __name__ == "__main__":
+    test_cached_render_matches_direct_drawing()
+    test_column_lookup_matches_linear_scan()
+    test_auto_hide_draws_toolbar_only_near_hand()
+    print("All tests passed.")
@@ -0,0 +1,553 @@
+"""
+Offline verification for the drawing engine's canvas and compositing logic.
+"""
+import copy
+import time
+import cv2
+import numpy as np
+import config
+from drawing_engine import DrawingEngine
+from display_list import DisplayList, DisplayOp
+from stroke_engine import stroke_polyline
+from config import INITIAL_STATE
+
+def full_frame_overlay(engine, frame):
+    """Reference compositing: full-frame mask passes over canvas and preview canvas."""
+    out = frame
+    for layer in (engine.canvas, engine.preview_canvas):
+        mask = cv2.cvtColor(layer, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(mask, 1, 255, cv2.THRESH_BINARY)
+        bg = cv2.bitwise_and(out, out, mask=cv2.bitwise_not(mask))
+        out = cv2.add(bg, layer)
+    return out
+
+def scripted_session(engine, frame, check):
+    """Drive the engine through freehand, shapes and erasing, calling check after every step."""
+    state = copy.deepcopy(INITIAL_STATE)
+    steps = []
+    for shape in ("freehand", "line", "rectangle", "circle"):
+        steps += [(shape, True, False, (60 + 20 * i, 80 + 7 * i)) for i in range(8)]
+        steps.append((shape, False, False, (220, 150)))
+    steps += [("freehand", False, True, (100, 100)), ("freehand", False, True, (130, 110))]
+    steps.append(("freehand", False, False, (0, 0)))
+
+    for shape, pinch, flat, tip in steps:
+        state["shape_type"] = shape
+        state["pinch_active"] = pinch
+        state["flat_hand"] = flat
+        engine.draw(state, tip, dashboard_consumed=False)
+        check(engine, frame)
+
+def test_dirty_region_overlay_matches_full_frame():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+
+    def check(engine, frame):
+        expected = full_frame_overlay(engine, frame)
+        result = engine.render_overlay(frame.copy())
+        assert np.array_equal(result, expected), "Dirty-region overlay differs from full-frame overlay"
+
+    scripted_session(engine, frame, check)
+    assert engine.canvas.any(), "Expected the scripted session to leave ink on the canvas"
+    print("test_dirty_region_overlay_matches_full_frame passed")
+
+def test_redraw_from_display_list_matches_live_canvas():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    scripted_session(engine, frame, lambda engine, frame: None)
+
+    live_canvas = engine.canvas.copy()
+    live_mask = engine.ink_mask.copy()
+    engine.redraw()
+    assert np.array_equal(engine.canvas, live_canvas), "Tile re-render differs from the live canvas"
+    assert np.array_equal(engine.ink_mask, live_mask), "Ink mask differs after re-render"
+
+    # Round trip through another resolution re-renders the same board
+    engine.resize(480, 640)
+    assert engine.canvas.any(), "Expected ink after re-rendering at 2x"
+    engine.resize(240, 320)
+    assert np.array_equal(engine.canvas, live_canvas), "Resize round trip changed the board"
+    print("test_redraw_from_display_list_matches_live_canvas passed")
+
+def test_undo_redo_restores_tiles_and_display_list():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    snapshots = []
+
+    def record(engine, frame):
+        # Capture the board after every completed action
+        if engine.history.pending is None and (not snapshots or len(engine.history.undo_stack) > snapshots[-1][0]):
+            snapshots.append((len(engine.history.undo_stack), engine.canvas.copy(), len(engine.display_list)))
+
+    scripted_session(engine, frame, record)
+    assert len(engine.history.undo_stack) >= 5, "Expected strokes, shapes and an eraser pass in history"
+
+    final_canvas = engine.canvas.copy()
+    for depth, canvas, op_count in reversed(snapshots[:-1]):
+        while len(engine.history.undo_stack) > depth:
+            assert engine.undo()
+        assert np.array_equal(engine.canvas, canvas), f"Undo to depth {depth} did not restore the canvas"
+        assert len(engine.display_list) == op_count
+
+    while engine.redo():
+        pass
+    assert np.array_equal(engine.canvas, final_canvas), "Redo did not restore the final canvas"
+
+    # The display list must agree with the restored pixels
+    engine.redraw()
+    assert np.array_equal(engine.canvas, final_canvas), "Display list out of step after undo/redo"
+    print("test_undo_redo_restores_tiles_and_display_list passed")
+
+def test_resize_keeps_undo_history():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    scripted_session(engine, frame, lambda engine, frame: None)
+    state = copy.deepcopy(INITIAL_STATE)
+    state["pinch_active"] = True
+    for i in range(6):
+        engine.draw(state, (40 + 15 * i, 200 - 10 * i), dashboard_consumed=False)
+    depth = len(engine.history.undo_stack)
+
+    # A stroke in progress is finished as its own undo step, not dropped
+    engine.resize(180, 240)
+    assert not engine.pens and len(engine.history.undo_stack) == depth + 1, "Stroke in progress was lost"
+    final_canvas = engine.canvas.copy()
+
+    def reference():
+        ref = DrawingEngine(180, 240)
+        ref.load_board(list(engine.display_list), board_width=320)
+        return ref.canvas
+
+    undone = 0
+    while engine.undo():
+        undone += 1
+        assert np.array_equal(engine.canvas, reference()), f"Undo {undone} after resize differs from the display list"
+    assert undone == depth + 1 and not engine.canvas.any()
+    while engine.redo():
+        pass
+    assert np.array_equal(engine.canvas, final_canvas), "Redo after resize did not restore the board"
+    print("test_resize_keeps_undo_history passed")
+
+def test_ink_rect_shrinks_after_erase_and_undo():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    state = copy.deepcopy(INITIAL_STATE)
+    state["pinch_active"] = True
+    for i in range(12):
+        engine.draw(state, (20 + 28 * min(i, 10), 20 + 20 * min(i, 10)), dashboard_consumed=False)
+    state["pinch_active"] = False
+    engine.draw(state, (300, 220), dashboard_consumed=False)
+    engine.render_overlay(frame.copy())
+    x1, y1, x2, y2 = engine.ink_rect
+    assert x2 - x1 > 250 and y2 - y1 > 180
+
+    # Erase the lower right half: the overlay region shrinks to what is left
+    state["flat_hand"] = True
+    for x in range(140, 320, 10):
+        for y in range(100, 240, 20):
+            engine.draw(state, (x, y), dashboard_consumed=False)
+    state["flat_hand"] = False
+    engine.draw(state, (0, 0), dashboard_consumed=False)
+    result = engine.render_overlay(frame.copy())
+    assert np.array_equal(result, full_frame_overlay(engine, frame))
+    x1, y1, x2, y2 = engine.ink_rect
+    assert x2 <= 160 and y2 <= 120, f"ink_rect did not shrink after erasing: {engine.ink_rect}"
+
+    # Undoing everything leaves no region to blend at all
+    while engine.undo():
+        pass
+    engine.render_overlay(frame.copy())
+    assert engine.ink_rect is None, "ink_rect should be empty once the board is blank"
+
+    # Default compositing is in place, without a copy of the frame
+    out = frame.copy()
+    assert engine.render_overlay(out) is out
+    print("test_ink_rect_shrinks_after_erase_and_undo passed")
+
+def test_undo_history_memory_cap():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    engine.history.max_bytes = 64 * 64 * 3 * 2 * 24 # Room for 24 before/after tile pairs
+    scripted_session(engine, frame, lambda engine, frame: None)
+
+    assert engine.history.bytes_used <= engine.history.max_bytes
+    assert 0 < len(engine.history.undo_stack) < 5, "Expected the oldest entries to be evicted"
+    print("test_undo_history_memory_cap passed")
+
+def test_two_hands_draw_concurrently():
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320)
+    left = copy.deepcopy(INITIAL_STATE)
+    right = copy.deepcopy(INITIAL_STATE)
+    right["shape_type"] = "rectangle"
+    right["pen_color"] = (0, 0, 255)
+
+    # Interleaved per frame: hand 0 draws freehand while hand 1 drags a rectangle
+    for i in range(8):
+        left["pinch_active"] = right["pinch_active"] = True
+        engine.draw(left, (40 + 10 * i, 60), dashboard_consumed=False, hand_id=0)
+        engine.draw(right, (200 + 5 * i, 120 + 5 * i), dashboard_consumed=False, hand_id=1)
+        result = engine.render_overlay(frame.copy())
+        assert np.array_equal(result, full_frame_overlay(engine, frame)), "Overlay differs with two hands"
+
+    assert len(engine.display_list) == 1, "Hand 1's rectangle must stay a preview until released"
+    assert len(engine.preview_rects) == 2, "Expected the rectangle and hand 0's stroke tail as previews"
+
+    # Releasing hand 1 commits its rectangle without breaking hand 0's stroke
+    right["pinch_active"] = False
+    engine.draw(right, (240, 160), dashboard_consumed=False, hand_id=1)
+    assert [op.kind for op in engine.display_list.ops.values()] == ["stroke", "rectangle"]
+    assert engine.history.pending is not None, "Overlapping strokes should form one undo step"
+
+    engine.release_hand(0)
+    assert len(engine.history.undo_stack) == 1
+    assert engine.undo() and not engine.canvas.any(), "Undo should remove both hands' strokes"
+    print("test_two_hands_draw_concurrently passed")
+
+def test_infinite_canvas_matches_dense_canvas():
+    rng = np.random.default_rng(2)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    dense = DrawingEngine(240, 320, infinite=False)
+    sparse = DrawingEngine(240, 320, infinite=True)
+
+    # With the viewport at the world origin and zoom 1, both modes must composite identically
+    def check(engine, frame):
+        assert np.array_equal(sparse.render_overlay(frame.copy()), dense.render_overlay(frame.copy()))
+
+    scripted_session(dense, frame, lambda engine, frame: None)
+    scripted_session(sparse, frame, lambda engine, frame: None)
+    check(None, frame)
+    # The export also holds what was drawn past the screen edges (the dense canvas clips it)
+    x1, y1, x2, y2 = sparse.tile_cache.bounds()
+    assert x1 < 0 or y1 < 0 or x2 > 320 or y2 > 240
+    on_screen = np.zeros_like(dense.canvas)
+    board = sparse.board_image()[max(-y1, 0):240 - y1, max(-x1, 0):320 - x1]
+    on_screen[max(y1, 0):max(y1, 0) + board.shape[0], max(x1, 0):max(x1, 0) + board.shape[1]] = board
+    assert np.array_equal(on_screen, dense.canvas), "Exported board differs"
+
+    # Tiles re-rendered from the display list match the live ones
+    live = dict((k, v.copy()) for k, v in sparse.tile_cache.tiles.items())
+    sparse.redraw()
+    assert live.keys() == sparse.tile_cache.tiles.keys()
+    assert all(np.array_equal(live[k], sparse.tile_cache.tiles[k]) for k in live)
+
+    assert sparse.undo() and dense.undo()
+    check(None, frame)
+    print("test_infinite_canvas_matches_dense_canvas passed")
+
+def test_infinite_canvas_pan_and_zoom():
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    engine = DrawingEngine(240, 320, infinite=True)
+    state = copy.deepcopy(INITIAL_STATE)
+    state["pinch_active"] = True
+    engine.draw(state, (100, 100), dashboard_consumed=False)
+    engine.draw(state, (120, 100), dashboard_consumed=False)
+    state["pinch_active"] = False
+    engine.draw(state, (120, 100), dashboard_consumed=False)
+    before = engine.render_overlay(frame.copy())
+
+    # Grab at (50, 50) and drag by (+30, +20): the ink moves with the hand
+    engine.pan_zoom((50, 50), 100)
+    engine.pan_zoom((80, 70), 100)
+    engine.release_grab()
+    after = engine.render_overlay(frame.copy())
+    assert np.array_equal(after[20:, 30:], before[:-20, :-30]), "Pan should shift the board"
+
+    # Drag the board far away and draw there: memory follows the ink, not the board extent
+    engine.pan_zoom((0, 0), 100)
+    engine.pan_zoom((-20000, -20000), 100)
+    engine.release_grab()
+    state["pinch_active"] = True
+    for x in (100, 120):
+        engine.draw(state, (x, 100), dashboard_consumed=False)
+    assert len(engine.tile_cache) <= 4, "Only tiles with ink should be allocated"
+    assert engine.render_overlay(frame.copy()).any()
+
+    engine.pan_zoom((160, 120), 100)
+    engine.pan_zoom((160, 120), 50) # Fist moved away from the camera: zoom out
+    assert abs(engine.viewport.zoom - 0.5 / (1 - config.ZOOM_DEADBAND)) < 1e-9
+    print("test_infinite_canvas_pan_and_zoom passed")
+
+def test_freehand_strokes_are_smoothed_and_simplified():
+    # A straight run into a curve, drawn on the dense canvas and on a zoomed infinite canvas
+    tips = [(40 + 8 * i, 60) for i in range(10)]
+    tips += [(int(120 + 50 * np.sin(a)), int(110 - 50 * np.cos(a))) for a in np.linspace(0, 3, 20)]
+
+    for infinite in (False, True):
+        engine = DrawingEngine(240, 320, infinite=infinite)
+        engine.zoom_view(1.5)
+        state = copy.deepcopy(INITIAL_STATE)
+        state["pinch_active"] = True
+        for tip in tips:
+            engine.draw(state, tip, dashboard_consumed=False)
+        assert engine.preview_rects, "The newest stroke segment should be previewed"
+        state["pinch_active"] = False
+        engine.draw(state, tips[-1], dashboard_consumed=False)
+        assert not engine.preview_rects
+
+        (op,) = engine.display_list
+        assert len(op.points) < len(tips) - 5, "The straight run should be simplified away"
+
+        # The canvas is exactly what the simplified stroke re-renders to
+        live = engine.board_image()
+        engine.redraw()
+        assert np.array_equal(engine.board_image(), live), "Live stroke differs from its re-render"
+
+        assert engine.undo() and not engine.board_image().any()
+        assert engine.redo() and np.array_equal(engine.board_image(), live)
+    print("test_freehand_strokes_are_smoothed_and_simplified passed")
+
+def test_palette_canvas_matches_bgr_canvas():
+    rng = np.random.default_rng(3)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    bgr = DrawingEngine(240, 320, palette=False)
+    indexed = DrawingEngine(240, 320, palette=True)
+    assert indexed.canvas.nbytes * 3 == bgr.canvas.nbytes
+
+    # Every composited frame must be identical
+    frames = []
+    scripted_session(bgr, frame, lambda engine, frame: frames.append(engine.render_overlay(frame.copy())))
+    scripted_session(indexed, frame, lambda engine, frame: frames.append(engine.render_overlay(frame.copy())))
+    half = len(frames) // 2
+    assert all(np.array_equal(a, b) for a, b in zip(frames[:half], frames[half:])), "Palette overlay differs"
+    assert np.array_equal(indexed.board_image(), bgr.canvas)
+
+    # Tiles cross the palette boundary as BGR (autosave, broadcast)
+    key = (1, 1)
+    assert np.array_equal(indexed.tile_cache.tile_image(key), bgr.tile_cache.read_tile(key))
+    fresh = DrawingEngine(240, 320, palette=True)
+    fresh.load_board(list(indexed.display_list), {key: bgr.tile_cache.read_tile(key)})
+    assert np.array_equal(fresh.tile_cache.read_tile(key), indexed.tile_cache.read_tile(key))
+
+    assert indexed.undo() and bgr.undo()
+    assert np.array_equal(indexed.board_image(), bgr.canvas), "Undo differs on the palette canvas"
+    print("test_palette_canvas_matches_bgr_canvas passed")
+
+def draw_ops(engine, shapes):
+    """Draw (shape, tips) strokes and shapes, releasing the pinch after each."""
+    state = copy.deepcopy(INITIAL_STATE)
+    for shape, tips in shapes:
+        state["shape_type"] = shape
+        state["pinch_active"] = True
+        for tip in tips:
+            engine.draw(state, tip, dashboard_consumed=False)
+        state["pinch_active"] = False
+        engine.draw(state, tips[-1], dashboard_consumed=False)
+    return state
+
+def pinch_path(engine, state, tool, tips):
+    """Pinch along tips with an object tool, then release."""
+    state["shape_type"] = tool
+    state["pinch_active"] = True
+    for tip in tips:
+        engine.draw(state, tip, dashboard_consumed=False)
+    state["pinch_active"] = False
+    engine.draw(state, (0, 0), dashboard_consumed=False) # Hand lost on release: the last pinched point counts
+
+def test_hit_test_matches_brute_force():
+    rng = np.random.default_rng(4)
+    display_list = DisplayList(cell_size=32)
+    for i in range(300):
+        start = rng.uniform(0, 600, 2)
+        if i % 4 == 0:
+            kind = ("line", "rectangle", "circle")[i % 3]
+            points = [tuple(start.astype(int).tolist()), tuple((start + rng.normal(0, 40, 2)).astype(int).tolist())]
+        else:
+            kind = "stroke"
+            points = [tuple(p) for p in (start + np.cumsum(rng.normal(0, 10, (rng.integers(1, 25), 2)), axis=0)).astype(int).tolist()]
+        display_list.add(kind, points, (255, 0, 0), int(rng.integers(1, 8)))
+    display_list.add("erase", [(300, 300), (320, 310)], (0, 0, 0), 30)
+
+    # Reference center lines: the whole spline of each stroke, the edges of each rectangle
+    lines = {}
+    for op in display_list:
+        if op.kind == "rectangle":
+            (x1, y1), (x2, y2) = op.points
+            lines[op.op_id] = np.array([(x1, y1), (x2, y1), (x2, y2), (x1, y2), (x1, y1)], dtype=np.float64)
+        elif op.kind != "circle":
+            lines[op.op_id] = stroke_polyline(op.points).astype(np.float64)
+
+    def distance(op, point):
+        p = np.array(point, dtype=np.float64)
+        if op.kind == "circle":
+            (cx, cy), (ex, ey) = op.points
+            return abs(np.hypot(*(p - (cx, cy))) - int(np.hypot(ex - cx, ey - cy)))
+        line = lines[op.op_id]
+        if len(line) == 1:
+            return np.hypot(*(line[0] - p))
+        a, d = line[:-1], line[1:] - line[:-1]
+        t = np.clip(((p - a) * d).sum(axis=1) / np.maximum((d * d).sum(axis=1), 1e-12), 0, 1)
+        return np.hypot(*(a + t[:, None] * d - p).T).min()
+
+    for point in rng.uniform(0, 600, (80, 2)).tolist():
+        radius = 12
+        expected = [op.op_id for op in display_list
+                    if op.kind != "erase" and distance(op, point) <= radius + op.size / 2]
+        assert [op.op_id for op in display_list.hit_test(point, radius)] == expected, f"Hit test differs at {point}"
+
+    found = display_list.enclosed((100, 100, 400, 400))
+    assert found and all(op.kind != "erase" for op in found)
+    assert all(100 <= x <= 400 and 100 <= y <= 400 for op in found if op.kind != "circle" for x, y in op.points)
+    print("test_hit_test_matches_brute_force passed")
+
+def test_object_eraser_removes_whole_operations():
+    engine = DrawingEngine(240, 320)
+    state = draw_ops(engine, [
+        ("freehand", [(40 + 10 * i, 100 + 3 * i) for i in range(12)]),
+        ("line", [(40, 200), (280, 200)]),
+        ("circle", [(240, 140), (270, 140)]),
+    ])
+    # The eraser pass must survive deleting the stroke under it
+    state["flat_hand"] = True
+    engine.draw(state, (100, 118), dashboard_consumed=False)
+    state["flat_hand"] = False
+    engine.draw(state, (0, 0), dashboard_consumed=False)
+    before = engine.canvas.copy()
+    stroke, line, circle, eraser = list(engine.display_list)
+    watcher = engine.tile_cache.watch()
+
+    pinch_path(engine, state, "object_erase", [(110, 60), (110, 121)]) # Ends on the stroke
+    assert [op.op_id for op in engine.display_list] == [line.op_id, circle.op_id, eraser.op_id]
+    touched = engine.tile_cache.take_changed(watcher)
+    assert touched and touched <= set(engine.tile_cache.tile_keys(engine._pixel_rect(stroke.bounds))), \
+        "Only the tiles under the removed stroke should be re-rendered"
+    assert not engine.canvas[95:135, 30:160].any(), "The stroke should be gone"
+    live = engine.canvas.copy()
+    engine.redraw()
+    assert np.array_equal(engine.canvas, live), "Board after object erase differs from its re-render"
+
+    # One pinch across two shapes is one undo step
+    pinch_path(engine, state, "object_erase", [(60, 200), (240, 190), (270, 140)])
+    assert [op.op_id for op in engine.display_list] == [eraser.op_id]
+    assert engine.undo() and np.array_equal(engine.canvas, live)
+    assert engine.undo() and np.array_equal(engine.canvas, before)
+    assert len(engine.display_list) == 4
+    assert engine.redo() and engine.redo() and len(engine.display_list) == 1
+    engine.redraw()
+    assert not engine.canvas.any()
+    print("test_object_eraser_removes_whole_operations passed")
+
+def test_selection_moves_and_deletes_groups():
+    for infinite in (False, True):
+        engine = DrawingEngine(240, 320, infinite=infinite)
+        state = draw_ops(engine, [
+            ("rectangle", [(40, 100), (80, 140)]),
+            ("freehand", [(60 + 6 * i, 160 + 2 * i) for i in range(8)]),
+            ("circle", [(250, 180), (270, 180)]),
+        ])
+        before = engine.board_image()
+        rect, stroke, circle = list(engine.display_list)
+
+        pinch_path(engine, state, "select", [(20, 90), (80, 150), (140, 190)])
+        assert [op.op_id for op in engine.selection] == [rect.op_id, stroke.op_id], "Box should enclose two ops"
+        assert engine.preview_rects, "The selection should be outlined"
+
+        # Drag from inside the selection: the group moves, drawn on top
+        pinch_path(engine, state, "select", [(60, 120), (90, 110), (120, 100)])
+        moved = list(engine.display_list)
+        assert [op.kind for op in moved] == ["circle", "rectangle", "stroke"]
+        assert moved[1].points == [(100, 80), (140, 120)], "Rectangle should move by the drag"
+        assert engine.selection == moved[1:]
+        live = engine.board_image()
+        engine.redraw()
+        assert np.array_equal(engine.board_image(), live), "Moved board differs from its re-render"
+
+        assert engine.delete_selection() and len(engine.display_list) == 1
+        assert not engine.delete_selection(), "Nothing is selected after deleting"
+        assert engine.undo() and np.array_equal(engine.board_image(), live)
+        assert engine.undo() and np.array_equal(engine.board_image(), before), "Undo should move the group back"
+        assert [op.op_id for op in engine.display_list] == [rect.op_id, stroke.op_id, circle.op_id]
+    print("test_selection_moves_and_deletes_groups passed")
+
+def test_undoing_a_group_delete_on_a_large_board():
+    # 20,000 short lines; restoring hundreds of old ids must not re-sort the whole board per op
+    rng = np.random.default_rng(5)
+    engine = DrawingEngine(607, 1080)
+    corners = rng.uniform((0, 80), (1070, 600), (20000, 2)).astype(int).tolist()
+    engine.load_board([DisplayOp(i, "line", [(x, y), (x + 6, y + 4)], config.COLORS["blue"], 2)
+                       for i, (x, y) in enumerate(corners)])
+    before = engine.canvas.copy()
+
+    engine.selection = engine.display_list.enclosed((100, 100, 260, 260))
+    count = len(engine.selection)
+    assert count >= 400, "Expected a large group"
+    assert engine.delete_selection()
+
+    start = time.perf_counter()
+    assert engine.undo()
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, f"Undoing a {count}-op delete took {elapsed:.2f} s"
+    assert [op.op_id for op in engine.display_list] == list(range(20000)), "Drawing order not restored"
+    assert np.array_equal(engine.canvas, before)
+    print("test_undoing_a_group_delete_on_a_large_board passed")
+
+def test_pen_up_on_a_populated_board():
+    # Simplifying a long diagonal stroke on pen-up must not re-render its whole bounding box
+    rng = np.random.default_rng(6)
+    engine = DrawingEngine(540, 960)
+    ops = []
+    for i, start in enumerate(rng.uniform((0, 80), (960, 540), (1500, 2))):
+        points = (start + np.cumsum(rng.normal(0, 10, (15, 2)), axis=0)).astype(int)
+        ops.append(DisplayOp(i, "stroke", [tuple(p) for p in points.tolist()], config.COLORS["red"], 3))
+    engine.load_board(ops)
+    tips = [(int(30 + 900 * t), int(90 + 430 * t + 8 * np.sin(40 * t))) for t in np.linspace(0, 1, 100)]
+
+    state = copy.deepcopy(INITIAL_STATE)
+    state["pinch_active"] = True
+    for tip in tips:
+        engine.draw(state, tip, dashboard_consumed=False)
+    state["pinch_active"] = False
+    start = time.perf_counter()
+    engine.draw(state, tips[-1], dashboard_consumed=False)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.05, f"Pen-up took {elapsed * 1000:.0f} ms"
+    assert len(engine.display_list.ops[1500].points) < len(tips), "Expected the stroke to be simplified"
+    live = engine.canvas.copy()
+    engine.redraw()
+    assert np.array_equal(engine.canvas, live), "Canvas after pen-up differs from its re-render"
+
+    # Strokes from two hands in one undo step are both replayed over the action's snapshots
+    left, right = copy.deepcopy(INITIAL_STATE), copy.deepcopy(INITIAL_STATE)
+    left["pinch_active"] = right["pinch_active"] = True
+    for i, tip in enumerate(tips):
+        engine.draw(left, tip, dashboard_consumed=False, hand_id=0)
+        engine.draw(right, (tip[0], tip[1] - 40), dashboard_consumed=False, hand_id=1)
+    left["pinch_active"] = right["pinch_active"] = False
+    engine.draw(left, tips[-1], dashboard_consumed=False, hand_id=0)
+    engine.draw(right, tips[-1], dashboard_consumed=False, hand_id=1)
+    live = engine.canvas.copy()
+    engine.redraw()
+    assert np.array_equal(engine.canvas, live), "Canvas after two-hand pen-up differs from its re-render"
+
+    # Ops removed during the stroke are still in the snapshots: those tiles are re-rendered
+    state["pinch_active"] = True
+    for tip in tips:
+        engine.draw(state, (tip[0], tip[1] - 20), dashboard_consumed=False)
+    engine._remove_ops([engine.display_list.ops[i] for i in range(0, 1500, 50)])
+    state["pinch_active"] = False
+    engine.draw(state, tips[-1], dashboard_consumed=False)
+    live = engine.canvas.copy()
+    engine.redraw()
+    assert np.array_equal(engine.canvas, live), "Canvas after pen-up with removed ops differs from its re-render"
+    print("test_pen_up_on_a_populated_board passed")
+
+if __name__ == "__main__":
+    test_dirty_region_overlay_matches_full_frame()
+    test_redraw_from_display_list_matches_live_canvas()
+    test_undo_redo_restores_tiles_and_display_list()
+    test_resize_keeps_undo_history()
+    test_ink_rect_shrinks_after_erase_and_undo()
+    test_undo_history_memory_cap()
+    test_two_hands_draw_concurrently()
+    test_infinite_canvas_matches_dense_canvas()
+    test_infinite_canvas_pan_and_zoom()
+    test_freehand_strokes_are_smoothed_and_simplified()
+    test_palette_canvas_matches_bgr_canvas()
+    test_hit_test_matches_brute_force()
+    test_object_eraser_removes_whole_operations()
+    test_selection_moves_and_deletes_groups()
+    test_undoing_a_group_delete_on_a_large_board()
+    test_pen_up_on_a_populated_board()
+    print("All tests passed.")
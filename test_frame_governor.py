@@ -0,0 +1,75 @@
+"""
+Offline verification of the frame-budget governor's level changes on scripted frame times.
+"""
+from frame_governor import FrameGovernor, LEVEL_NAMES
+
+def run(governor, frame_ms, windows):
+    """Feed `windows` full windows of frame_ms; returns how many level changes that caused."""
+    changes = 0
+    for _ in range(windows * governor.window):
+        changes += governor.record(frame_ms)
+    return changes
+
+def test_steps_down_and_climbs_back():
+    governor = FrameGovernor(target_fps=50, levels=LEVEL_NAMES, window=10, headroom=0.6, recover_windows=3) # 20 ms budget
+    assert governor.name == "full" and governor.settings()["inference_scale"] == 1.0
+
+    # Over budget: one level per window, cumulative, stopping at the last level
+    assert run(governor, 25.0, 2) == 2
+    settings = governor.settings()
+    assert governor.level == 2 and settings["inference_scale"] < 1.0 and settings["toolbar_auto_hide"]
+    assert settings["inference_interval"] == 1 and settings["width_scale"] == 1.0
+    assert run(governor, 25.0, 5) == 2 and governor.level == 4
+    assert governor.settings()["inference_interval"] == 2 and governor.settings()["width_scale"] < 1.0
+
+    # Within budget but without headroom: hold
+    assert run(governor, 15.0, 10) == 0 and governor.level == 4
+
+    # Headroom: one level up per GOVERNOR_RECOVER_WINDOWS calm windows
+    assert run(governor, 5.0, 2) == 0
+    assert run(governor, 5.0, 1) == 1 and governor.level == 3
+    assert [(old, new) for _, old, new, _ in governor.changes] == [(0, 1), (1, 2), (2, 3), (3, 4), (4, 3)]
+    print("test_steps_down_and_climbs_back passed")
+
+def test_flapping_backs_off():
+    governor = FrameGovernor(target_fps=50, window=10, recover_windows=2)
+    run(governor, 25.0, 1)
+    assert governor.level == 1
+
+    # Climbing back overloads the machine right away: the next climb waits twice as long
+    run(governor, 5.0, 2)
+    assert governor.level == 0
+    run(governor, 25.0, 1)
+    assert governor.level == 1 and governor.recover_needed == 4
+    assert run(governor, 5.0, 3) == 0 and run(governor, 5.0, 1) == 1 and governor.level == 0
+
+    # Outliers inside a window do not count: the decision uses the median
+    governor = FrameGovernor(target_fps=50, window=10)
+    for i in range(10):
+        governor.record(100.0 if i % 3 == 0 else 10.0)
+    assert governor.level == 0
+    print("test_flapping_backs_off passed")
+
+def test_levels_are_configurable():
+    governor = FrameGovernor(levels=("toolbar_auto_hide",), window=1)
+    governor.record(1000.0)
+    governor.record(1000.0)
+    assert governor.level == 1 and governor.settings() == {
+        "inference_scale": 1.0, "toolbar_auto_hide": True, "inference_interval": 1, "width_scale": 1.0}
+    try:
+        FrameGovernor(levels=("no_such_level",))
+        assert False, "Expected ValueError"
+    except ValueError as e:
+        assert "no_such_level" in str(e)
+
+    # By default the governor never changes the working resolution (that re-rasterizes the board)
+    governor = FrameGovernor(window=1)
+    for _ in range(10):
+        governor.record(1000.0)
+    assert governor.level == len(governor.levels) - 1 and governor.settings()["width_scale"] == 1.0
+    print("test_levels_are_configurable passed")
+
+if __name__ == "__main__":
+    test_steps_down_and_climbs_back()
+    test_flapping_backs_off()
+    test_levels_are_configurable()
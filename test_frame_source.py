@@ -0,0 +1,107 @@
+"""
+Offline verification of the camera-free frame sources and of running the whole board
+pipeline from them.
+"""
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from frame_pipeline import prepare_frame
+from frame_source import ImageDirSource, SyntheticSource, VideoFileSource, open_source
+from landmark_recorder import LandmarkRecorder, ReplayTracker
+from replay_benchmark import run_replay
+from test_frame_pipeline import pinching_hand
+
+def read_all(source, limit=100):
+    frames, stamps = [], []
+    while len(frames) < limit:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+        stamps.append(source.timestamp)
+    return frames, stamps
+
+def test_synthetic_source():
+    source = SyntheticSource(320, 180, fps=50, count=5)
+    frames, stamps = read_all(source)
+    assert len(frames) == 5 and frames[0].shape == (180, 320, 3)
+    assert stamps == [i / 50 for i in range(5)], "Timestamps should follow the frame rate"
+    assert not np.array_equal(frames[0], frames[1]), "The pattern should move"
+
+    # Frames are written into the caller's buffer
+    buffer = np.empty((180, 320, 3), dtype=np.uint8)
+    source = SyntheticSource(320, 180, count=1, pattern="blank")
+    ret, frame = source.read(buffer)
+    assert ret and frame is buffer and not frame.any()
+
+    # Real-time pacing delivers no faster than fps
+    source = SyntheticSource(64, 36, fps=100, count=5, realtime=True)
+    start = time.perf_counter()
+    read_all(source)
+    assert time.perf_counter() - start >= 0.035
+    assert source.captured_at >= start
+    print("test_synthetic_source passed")
+
+def test_image_dir_and_video_file_sources():
+    with tempfile.TemporaryDirectory() as tmp:
+        images = os.path.join(tmp, "frames")
+        os.makedirs(images)
+        for i in (2, 0, 1):
+            size = (240, 320, 3) if i != 2 else (120, 160, 3) # One odd size, resized to the first image's
+            cv2.imwrite(os.path.join(images, f"frame_{i:03d}.png"), np.full(size, 50 * (i + 1), dtype=np.uint8))
+        open(os.path.join(images, "notes.txt"), "w").close()
+
+        source = open_source(images)
+        assert isinstance(source, ImageDirSource) and source.isOpened() and source.frame_count == 3
+        frames, stamps = read_all(source)
+        assert [int(f[0, 0, 0]) for f in frames] == [50, 100, 150], "Images must come in file name order"
+        assert all(f.shape == (240, 320, 3) for f in frames)
+        assert stamps == [0.0, 1 / 30, 2 / 30]
+
+        video = os.path.join(tmp, "clip.avi")
+        writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 25, (320, 240))
+        for i in range(4):
+            writer.write(np.full((240, 320, 3), 60 * i, dtype=np.uint8))
+        writer.release()
+        source = open_source(video)
+        assert isinstance(source, VideoFileSource) and (source.width, source.height) == (320, 240)
+        frames, stamps = read_all(source)
+        assert len(frames) == 4 and stamps[-1] == 3 / 25
+        looping = VideoFileSource(video, loop=True)
+        frames, stamps = read_all(looping, limit=10)
+        assert len(frames) == 10 and stamps == sorted(stamps), "A looping file should keep going"
+
+        assert not open_source(os.path.join(tmp, "missing.mp4")).isOpened()
+    print("test_image_dir_and_video_file_sources passed")
+
+def test_prepare_frame_skips_resize_at_working_size():
+    frame = np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    assert np.array_equal(prepare_frame(frame, 320, 240), cv2.flip(cv2.resize(frame, (320, 240)), 1))
+    print("test_prepare_frame_skips_resize_at_working_size passed")
+
+def test_replay_from_image_directory():
+    """The whole chain runs from an image directory, with landmarks from a recording instead of a camera."""
+    with tempfile.TemporaryDirectory() as tmp:
+        images = os.path.join(tmp, "frames")
+        os.makedirs(images)
+        with LandmarkRecorder(os.path.join(tmp, "hand.wblm"), 320, 240) as recorder:
+            for i in range(20):
+                cv2.imwrite(os.path.join(images, f"{i:03d}.png"), np.full((240, 320, 3), 30, dtype=np.uint8))
+                recorder.record(pinching_hand((100 + 5 * i, 150)))
+        board = os.path.join(tmp, "board.png")
+        stats = run_replay(images, hand_tracker=ReplayTracker(os.path.join(tmp, "hand.wblm")), canvas_out=board)
+        assert stats["frames"] == 20 and stats["resolution"] == [320, 240]
+        assert cv2.imread(board).any(), "The recorded stroke should be on the board"
+
+        stats = run_replay("synthetic:160x90", hand_tracker=ReplayTracker(os.path.join(tmp, "hand.wblm")),
+                           max_frames=5)
+        assert stats["frames"] == 5 and stats["resolution"] == [160, 90]
+    print("test_replay_from_image_directory passed")
+
+if __name__ == "__main__":
+    test_synthetic_source()
+    test_image_dir_and_video_file_sources()
+    test_prepare_frame_skips_resize_at_working_size()
+    test_replay_from_image_directory()
@@ -2,6 +2,7 @@
 Unit tests or offline verification for gesture detection logic.
 """
 import copy
+import numpy as np
 from gesture_detector import GestureDetector
 from config import INITIAL_STATE
 
@@ -40,7 +41,57 @@ def test_pinch():
     assert result["pinch"] == True, f"Expected pinch=True, got {result['pinch']}"
     print("test_pinch passed")
 
+def full_hand(pinching, flat, scale=1.0):
+    """(21, 2) landmarks for a hand whose wrist -> middle MCP distance is 100 * scale px."""
+    pts = np.zeros((21, 2))
+    pts[0] = (200, 400)                               # wrist
+    pts[9] = (200, 300)                               # middle mcp
+    pts[2] = (150, 340)                               # thumb mcp
+    pts[4] = (100, 300) if not pinching else (168, 182)  # thumb tip
+    for tip, pip, x in ((8, 6, 170), (12, 10, 200), (16, 14, 230), (20, 18, 260)):
+        pts[pip] = (x, 240)
+        pts[tip] = (x, 180) if (flat or tip == 8) else (x, 280)
+    return (pts - pts[0]) * scale + pts[0]
+
+def test_batch_matches_single_frame():
+    gd = GestureDetector()
+    hands = [full_hand(False, True), full_hand(True, False), full_hand(False, False)]
+    batch = gd.detect_gestures_batch(np.stack(hands))
+    assert list(batch["pinch"]) == [False, True, False], batch
+    assert list(batch["flat_hand"]) == [True, False, False], batch
+
+    for hand, pinch, flat in zip(hands, batch["pinch"], batch["flat_hand"]):
+        single = gd.detect_gestures({"landmarks": [tuple(p) for p in hand]})
+        assert single == {"pinch": pinch, "flat_hand": flat, "grab": False}, single
+    print("test_batch_matches_single_frame passed")
+
+def test_thresholds_scale_with_hand_size():
+    gd = GestureDetector()
+    for scale in (0.5, 1.0, 3.0):
+        result = gd.detect_gestures(full_hand(True, False, scale))
+        assert result == {"pinch": True, "flat_hand": False, "grab": False}, f"scale {scale}: {result}"
+        result = gd.detect_gestures(full_hand(False, True, scale))
+        assert result == {"pinch": False, "flat_hand": True, "grab": False}, f"scale {scale}: {result}"
+
+    # Absent rows (all zero) never report a gesture
+    batch = gd.detect_gestures_batch(np.zeros((4, 21, 2)))
+    assert not batch["pinch"].any() and not batch["flat_hand"].any() and not batch["grab"].any()
+    print("test_thresholds_scale_with_hand_size passed")
+
+def test_grab():
+    gd = GestureDetector()
+    fist = full_hand(False, False)
+    for tip, x in ((8, 180), (12, 200), (16, 220), (20, 240)):
+        fist[tip] = (x, 320) # Curled in over the palm
+    batch = gd.detect_gestures_batch(np.stack([fist, full_hand(True, False), full_hand(False, True)]))
+    assert list(batch["grab"]) == [True, False, False], batch
+    assert gd.detect_gestures(fist)["grab"] == True
+    print("test_grab passed")
+
 if __name__ == "__main__":
     test_flat_hand()
     test_pinch()
+    test_batch_matches_single_frame()
+    test_thresholds_scale_with_hand_size()
+    test_grab()
     print("All tests passed.")
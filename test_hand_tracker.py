@@ -0,0 +1,190 @@
+"""
+Offline verification of ROI-cropped tracking with a stand-in landmarker (no model file needed).
+"""
+import os
+import tempfile
+import threading
+import types
+import mediapipe
+import numpy as np
+import config
+from hand_tracker import HandTracker, BackgroundHandTracker, ensure_model
+from buffer_pool import BufferPool
+from landmarks import HandIdAssigner
+
+class BlobLandmarker:
+    """Reports a 'hand' of 21 landmarks spread around the white blob in whatever image it is given."""
+    def __init__(self):
+        self.image_sizes = []
+
+    def detect(self, mp_image):
+        image = mp_image.numpy_view()
+        h, w = image.shape[:2]
+        self.image_sizes.append((w, h))
+        ys, xs = np.nonzero(image[:, :, 0] == 255)
+        if xs.size == 0:
+            return types.SimpleNamespace(hand_landmarks=[])
+        cx, cy = xs.mean(), ys.mean()
+        hand = [types.SimpleNamespace(x=(cx + 2 * i - 20) / w, y=(cy - i) / h) for i in range(21)]
+        return types.SimpleNamespace(hand_landmarks=[hand])
+
+def make_tracker():
+    tracker = HandTracker.__new__(HandTracker)
+    tracker.detector = BlobLandmarker()
+    tracker.roi_detector = tracker.detector
+    tracker.video_mode = False
+    tracker.mp = mediapipe
+    tracker.roi = None
+    tracker.pool = BufferPool()
+    tracker.inference_scale = 1.0
+    return tracker
+
+def frame_with_blob(x, y):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[y - 5:y + 5, x - 5:x + 5] = 255
+    return frame
+
+def test_roi_tracking_matches_full_frame():
+    old = config.ROI_TRACKING
+    config.ROI_TRACKING = True
+    try:
+        roi_tracker = make_tracker()
+        full_tracker = make_tracker()
+        positions = [(300, 200), (305, 203), (310, 206)]
+        for x, y in positions:
+            frame = frame_with_blob(x, y)
+            roi_result = roi_tracker.process_frame(frame)
+            full_result = full_tracker._detect(frame, None)[0]
+            for (rx, ry), (fx, fy) in zip(roi_result["landmarks"], full_result):
+                assert abs(rx - fx) <= 1 and abs(ry - fy) <= 1, "ROI landmarks not mapped back to full frame"
+
+        # After the first frame, inference only saw a crop
+        sizes = roi_tracker.detector.image_sizes
+        assert sizes[0] == (640, 480) and all(s[0] < 640 for s in sizes[1:]), sizes
+
+        # Hand jumps outside the crop: the same frame is searched again at full size
+        result = roi_tracker.process_frame(frame_with_blob(600, 420))
+        assert result is not None and abs(result["landmarks"][10][0] - 600) <= 1, "Hand lost instead of retried"
+        assert roi_tracker.detector.image_sizes[-1] == (640, 480)
+    finally:
+        config.ROI_TRACKING = old
+    print("test_roi_tracking_matches_full_frame passed")
+
+class VideoBlobLandmarker(BlobLandmarker):
+    """BlobLandmarker in VIDEO mode: records the timestamp of every detect_for_video call."""
+    def __init__(self, calls):
+        super().__init__()
+        self.calls = calls
+
+    def detect(self, mp_image):
+        raise AssertionError("VIDEO-mode landmarker got an IMAGE-mode call")
+
+    def detect_for_video(self, mp_image, timestamp_ms):
+        self.calls.append(("video", timestamp_ms))
+        return BlobLandmarker.detect(self, mp_image)
+
+class ImageBlobLandmarker(BlobLandmarker):
+    def __init__(self, calls):
+        super().__init__()
+        self.calls = calls
+
+    def detect(self, mp_image):
+        self.calls.append(("image", None))
+        return BlobLandmarker.detect(self, mp_image)
+
+def test_roi_fallback_sends_each_frame_to_video_mode_once():
+    old = config.ROI_TRACKING
+    config.ROI_TRACKING = True
+    try:
+        calls = []
+        tracker = make_tracker()
+        tracker.video_mode = True
+        tracker.detector = VideoBlobLandmarker(calls)
+        tracker.roi_detector = ImageBlobLandmarker(calls)
+        # Tracked, jumps out of the crop, tracked, lost entirely, found again
+        frames = [frame_with_blob(300, 200), frame_with_blob(305, 203), frame_with_blob(600, 420),
+                  frame_with_blob(600, 420), frame_with_blob(595, 415), np.zeros((480, 640, 3), np.uint8),
+                  frame_with_blob(300, 200), frame_with_blob(302, 201)]
+        per_frame = []
+        for frame in frames:
+            before = len(calls)
+            found = tracker.process_frame(frame) is not None
+            per_frame.append([kind for kind, _ in calls[before:]])
+            assert found == frame.any(), "A visible hand must be found in the same frame"
+
+        # Crop misses are retried at full size by the IMAGE-mode landmarker, never by VIDEO mode
+        assert per_frame == [["video"], ["image"], ["image", "image"], ["image"], ["image"],
+                             ["image", "image"], ["video"], ["image"]], per_frame
+        assert all(size == (640, 480) for size in tracker.detector.image_sizes), tracker.detector.image_sizes
+        stamps = [t for kind, t in calls if kind == "video"]
+        assert stamps == sorted(set(stamps)), f"Timestamps not strictly increasing: {stamps}"
+    finally:
+        config.ROI_TRACKING = old
+    print("test_roi_fallback_sends_each_frame_to_video_mode_once passed")
+
+def test_inference_scale_keeps_full_frame_landmarks():
+    full_tracker = make_tracker()
+    small_tracker = make_tracker()
+    small_tracker.inference_scale = 0.5
+    frame = frame_with_blob(300, 200)
+    full = full_tracker.process_frame(frame)["landmarks"]
+    small = small_tracker.process_frame(frame)["landmarks"]
+    assert small_tracker.detector.image_sizes == [(320, 240)], "Inference should see the shrunk frame"
+    # The stand-in spreads landmarks in image pixels, so compare the ones on the blob center
+    assert abs(small[10][0] - full[10][0]) <= 2 and abs(small[0][1] - full[0][1]) <= 2, \
+        "Landmarks not mapped back to full-frame pixels"
+    print("test_inference_scale_keeps_full_frame_landmarks passed")
+
+def test_hand_ids_follow_hands():
+    assigner = HandIdAssigner(max_distance=50)
+    a = np.full((21, 2), 100)
+    b = np.full((21, 2), 400)
+    assert assigner.assign(np.stack([a, b])) == [0, 1]
+
+    # Detection order swaps and both hands move a little: ids stay with the hands
+    assert assigner.assign(np.stack([b + 20, a - 10])) == [1, 0]
+
+    # One hand leaves and a new one appears far away
+    assert assigner.assign(np.stack([a - 10, a + 600])) == [0, 2]
+    print("test_hand_ids_follow_hands passed")
+
+def test_background_loading_and_offline_error():
+    gate = threading.Event()
+    def slow_factory():
+        gate.wait(5)
+        return make_tracker()
+
+    loader = BackgroundHandTracker(slow_factory)
+    assert loader.status == "loading" and loader.status_text()
+    assert loader.process_frame(frame_with_blob(320, 240)) is None, "No landmarks while loading"
+    assert loader.process_frame_multi(frame_with_blob(320, 240)) == []
+    loader.set_inference_scale(0.5)
+    gate.set()
+    assert loader.wait(5) and loader.status == "ready" and loader.status_text() is None
+    assert loader.tracker.inference_scale == 0.5, "Scale set while loading must reach the tracker"
+    assert loader.process_frame(frame_with_blob(320, 240)) is not None
+    assert loader.load_time is not None
+
+    # Missing model with downloads disabled: a clear error instead of a crash
+    with tempfile.TemporaryDirectory() as tmp:
+        missing = os.path.join(tmp, "hand_landmarker.task")
+        try:
+            ensure_model(missing, download=False)
+            assert False, "Expected FileNotFoundError"
+        except FileNotFoundError as e:
+            assert missing in str(e)
+
+        loader = BackgroundHandTracker(lambda: HandTracker(model_path=missing, download=False))
+        assert not loader.wait(5)
+        assert loader.status == "error" and isinstance(loader.error, FileNotFoundError)
+        assert loader.process_frame(frame_with_blob(320, 240)) is None
+        loader.release()
+    print("test_background_loading_and_offline_error passed")
+
+if __name__ == "__main__":
+    test_roi_tracking_matches_full_frame()
+    test_roi_fallback_sends_each_frame_to_video_mode_once()
+    test_inference_scale_keeps_full_frame_landmarks()
+    test_hand_ids_follow_hands()
+    test_background_loading_and_offline_error()
+    print("All tests passed.")
@@ -0,0 +1,130 @@
+"""
+Offline verification that the predictive filter is no worse than the drawing engine's
+moving average on the index tip, while skipping inference frames.
+"""
+import collections
+import copy
+import os
+import tempfile
+import numpy as np
+import config
+from drawing_engine import DrawingEngine
+from landmark_filter import PredictiveTracker
+from landmark_recorder import RecordingTracker, ReplayTracker
+from landmarks import structure_landmarks
+
+class NoisyHand:
+    """Fake tracker: a hand moving at `speed` px/s, with Gaussian landmark noise."""
+    def __init__(self, clock, speed, sigma=1.5):
+        self.clock = clock
+        self.speed = speed
+        self.sigma = sigma
+        self.rng = np.random.default_rng(0)
+        self.calls = 0
+
+    def truth(self):
+        return np.array([100 + self.speed * self.clock.t, 200.0])
+
+    def process_frame(self, frame):
+        self.calls += 1
+        x, y = self.truth() + self.rng.normal(0, self.sigma, 2)
+        return structure_landmarks([(int(round(x)), int(round(y)))] * 21)
+
+    def release(self):
+        pass
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+def index_tip_errors(speed, interval, frames=300, fps=30):
+    """(filter errors, moving-average errors) of the index tip against the true position."""
+    clock = FakeClock()
+    hand = NoisyHand(clock, speed)
+    tracker = PredictiveTracker(hand, interval=interval, clock=clock)
+    window = collections.deque(maxlen=config.SMOOTHING_WINDOW)
+    filtered, averaged = [], []
+
+    for i in range(frames):
+        clock.t = i / fps
+        data = tracker.process_frame(None)
+        truth = hand.truth()
+        filtered.append(np.array(data["index_tip"]) - truth)
+
+        # The drawing engine's deque averaging sees a fresh inference every frame
+        x, y = hand.process_frame(None)["index_tip"]
+        window.append((x, y))
+        averaged.append(np.mean(window, axis=0) - truth)
+
+    # Skip the warm-up second
+    return np.array(filtered[fps:]), np.array(averaged[fps:]), hand
+
+def rms(errors):
+    return float(np.sqrt((errors ** 2).sum(axis=1).mean()))
+
+def test_filter_not_worse_than_moving_average():
+    for interval in (1, 2, 3):
+        # Still hand: pure jitter
+        filtered, averaged, _ = index_tip_errors(speed=0, interval=interval)
+        assert rms(filtered) <= rms(averaged), f"More jitter than moving average at interval {interval}"
+
+        # Moving hand: lag + jitter
+        filtered, averaged, _ = index_tip_errors(speed=400, interval=interval)
+        assert rms(filtered) <= rms(averaged), f"More tracking error than moving average at interval {interval}"
+    print("test_filter_not_worse_than_moving_average passed")
+
+def test_inference_runs_every_nth_frame():
+    clock = FakeClock()
+    hand = NoisyHand(clock, speed=100)
+    tracker = PredictiveTracker(hand, interval=3, clock=clock)
+    for i in range(30):
+        clock.t = i / 30
+        assert tracker.process_frame(None) is not None
+    assert tracker.inference_count == 10, f"Expected 10 inferences, got {tracker.inference_count}"
+    print("test_inference_runs_every_nth_frame passed")
+
+def test_recording_after_the_filter_replays_every_frame():
+    clock = FakeClock()
+    hand = NoisyHand(clock, speed=100)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.wblm")
+        tracker = RecordingTracker(PredictiveTracker(hand, interval=3, clock=clock), path)
+        used = []
+        for i in range(30):
+            clock.t = i / 30
+            used.append(tracker.process_frame(frame))
+        tracker.release()
+
+        # Predicted frames are recorded too, exactly as the board received them
+        replay = ReplayTracker(path)
+        assert len(replay) == 30 and hand.calls == 10
+        assert [replay.process_frame(None) for _ in range(30)] == used, "Replay differs from the filtered landmarks"
+        replay.release()
+    print("test_recording_after_the_filter_replays_every_frame passed")
+
+def test_filtered_tips_skip_the_moving_average():
+    state = copy.deepcopy(config.INITIAL_STATE)
+    state["pinch_active"] = True
+    tips = [(40, 60), (80, 60), (120, 100)]
+    for smoothing in (True, False):
+        engine = DrawingEngine(240, 320)
+        engine.smoothing = smoothing
+        for tip in tips:
+            engine.draw(state, tip, dashboard_consumed=False)
+        pen_point = engine.pens[0].prev_point
+        if smoothing:
+            assert pen_point == (100, 80), "Moving average expected without the filter"
+        else:
+            assert pen_point == tips[-1], "Filtered tips must not be averaged again"
+    print("test_filtered_tips_skip_the_moving_average passed")
+
+if __name__ == "__main__":
+    test_filter_not_worse_than_moving_average()
+    test_inference_runs_every_nth_frame()
+    test_recording_after_the_filter_replays_every_frame()
+    test_filtered_tips_skip_the_moving_average()
+    print("All tests passed.")
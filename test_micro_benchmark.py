@@ -0,0 +1,37 @@
+"""
+Checks that every micro-benchmark runs on a small frame and that baseline comparison
+flags slowdowns but not noise.
+"""
+import os
+import tempfile
+from micro_benchmark import BENCHMARKS, compare, format_results, load_baseline, run_benchmarks, save_baseline
+
+def stats(p50):
+    return {"count": 20, "mean_ms": p50, "p50_ms": p50, "p95_ms": p50, "max_ms": p50}
+
+def test_every_benchmark_runs():
+    results = run_benchmarks(widths=(320,), min_time=0.0, min_calls=3)
+    assert sorted(results) == sorted(f"{name}@320" for name in BENCHMARKS)
+    assert all(s["count"] >= 3 and s["max_ms"] >= s["p50_ms"] >= 0 for s in results.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "baseline.json")
+        save_baseline(path, results)
+        assert load_baseline(path) == results
+    assert "budget" in format_results(results, results)
+    print("test_every_benchmark_runs passed")
+
+def test_compare_flags_regressions():
+    baseline = {"a@640": stats(1.0), "b@640": stats(1.0), "tiny@640": stats(0.001), "old@640": stats(1.0)}
+    results = {"a@640": stats(2.0), "b@640": stats(1.2), "tiny@640": stats(0.004), "new@640": stats(9.0)}
+
+    regressions = compare(results, baseline, threshold=0.25, noise_floor_ms=0.005)
+    assert regressions == [("a@640", 1.0, 2.0)], f"Only the doubled median should be flagged, got {regressions}"
+    assert compare(results, baseline, threshold=0.1, noise_floor_ms=0.005)[1][0] == "b@640"
+    assert compare(results, baseline, threshold=0.25, noise_floor_ms=0.0)[-1][0] == "tiny@640", \
+        "Without a noise floor the 4x slower tiny benchmark is a regression"
+    print("test_compare_flags_regressions passed")
+
+if __name__ == "__main__":
+    test_every_benchmark_runs()
+    test_compare_flags_regressions()
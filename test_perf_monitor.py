@@ -0,0 +1,75 @@
+"""
+Offline verification of the performance monitor: rolling windows, export and HUD.
+"""
+import csv
+import json
+import os
+import tempfile
+import numpy as np
+from perf_monitor import PerfMonitor, StageTimer
+
+def test_disabled_monitor_records_nothing():
+    monitor = PerfMonitor(enabled=False)
+    first = monitor.stage("draw")
+    assert first is monitor.stage("overlay"), "Disabled stages should share one no-op context"
+    with first:
+        pass
+    assert monitor.samples == {}
+
+    # FPS still works without stage timing
+    for _ in range(3):
+        monitor.frame_done()
+    assert monitor.fps() > 0
+    print("test_disabled_monitor_records_nothing passed")
+
+def test_rolling_window_and_export():
+    monitor = PerfMonitor(enabled=True, window=5)
+    for i in range(12):
+        monitor._record("tracker", float(i))
+        with monitor.stage("draw"):
+            pass
+    stats = monitor.summary()["tracker"]
+    assert stats["count"] == 5 and stats["max_ms"] == 11.0, "Window should hold only the latest samples"
+
+    monitor.set_gauge("governor", "1 inference_scale")
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "perf.json")
+        monitor.export(json_path)
+        with open(json_path) as f:
+            data = json.load(f)
+        assert data["stages"]["tracker"]["total_count"] == 12
+        assert sum(data["histograms"]["tracker"]) == 5
+        assert data["gauges"] == {"governor": "1 inference_scale"}
+
+        csv_path = os.path.join(tmp, "perf.csv")
+        monitor.export(csv_path)
+        with open(csv_path) as f:
+            rows = {row["stage"]: row for row in csv.DictReader(f)}
+        assert set(rows) == {"tracker", "draw"}
+        assert float(rows["tracker"]["p50_ms"]) == 9.0
+    print("test_rolling_window_and_export passed")
+
+def test_hud_and_stage_timer():
+    monitor = PerfMonitor(enabled=True)
+    with monitor.stage("overlay"):
+        pass
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    monitor.render_hud(frame)
+    assert frame.any(), "HUD should draw onto the frame"
+    monitor.toggle_hud()
+    blank = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert not monitor.render_hud(blank).any(), "Hidden HUD should leave the frame untouched"
+
+    # The benchmark timer keeps every sample
+    timer = StageTimer()
+    for _ in range(1000):
+        with timer.stage("frame"):
+            pass
+    assert timer.summary()["frame"]["count"] == 1000
+    print("test_hud_and_stage_timer passed")
+
+if __name__ == "__main__":
+    test_disabled_monitor_records_nothing()
+    test_rolling_window_and_export()
+    test_hud_and_stage_timer()
+    print("All tests passed.")
@@ -0,0 +1,54 @@
+"""
+Offline verification of the stroke spline and simplification geometry.
+"""
+import numpy as np
+from stroke_engine import StrokePath, simplify, spline_samples, stroke_polyline
+
+def test_spline_segments_match_whole_stroke():
+    rng = np.random.default_rng(0)
+    points = rng.integers(0, 300, (12, 2))
+    line = stroke_polyline(points)
+
+    # The curve passes through every point, in order
+    rows = [tuple(p) for p in line.tolist()]
+    positions = [rows.index(tuple(p)) for p in points.tolist()]
+    assert positions == sorted(positions), "Spline does not pass through the stroke's points"
+
+    # Drawing it segment by segment (as live drawing does) gives the same samples
+    path = StrokePath(capacity=2)
+    for p in points:
+        path.append(p)
+    pieces = [spline_samples([path.controls(i)]) for i in range(len(points) - 1)]
+    joined = np.concatenate([pieces[0]] + [piece[1:] for piece in pieces[1:]])
+    assert np.array_equal(joined, line), "Live segments differ from the whole-stroke spline"
+
+    # Samples only depend on point differences, so any integer shift shifts them exactly
+    assert np.array_equal(stroke_polyline(points + (-137, 4001)), line + (-137, 4001))
+    print("test_spline_segments_match_whole_stroke passed")
+
+def test_simplify_keeps_shape():
+    straight = [(x, 2 * x) for x in range(20)]
+    assert simplify(straight, 0.5) == [0, 19], "Collinear points should collapse to the ends"
+
+    corner = [(x, 0) for x in range(10)] + [(9, y) for y in range(1, 10)]
+    assert simplify(corner, 0.5) == [0, 9, 18], "The corner must be kept"
+
+    rng = np.random.default_rng(1)
+    wobbly = np.cumsum(rng.normal(0, 3, (200, 2)), axis=0)
+    keep = simplify(wobbly, 1.0)
+    kept = wobbly[keep]
+    # Every dropped point lies within epsilon of the simplified polyline
+    for i, p in enumerate(wobbly):
+        j = np.searchsorted(keep, i, side="right") - 1
+        if keep[j] == i:
+            continue
+        a, b = kept[j], kept[j + 1]
+        d = b - a
+        dist = abs(d[0] * (p - a)[1] - d[1] * (p - a)[0]) / np.hypot(*d)
+        assert dist <= 1.0 + 1e-9
+    print("test_simplify_keeps_shape passed")
+
+if __name__ == "__main__":
+    test_spline_segments_match_whole_stroke()
+    test_simplify_keeps_shape()
+    print("All tests passed.")
@@ -0,0 +1,111 @@
+"""
+Offline verification that time-lapse playback rebuilds the board exactly as it was at
+every recorded moment, and that export streams the expected frames.
+"""
+import copy
+import os
+import tempfile
+import cv2
+import numpy as np
+import config
+from drawing_engine import DrawingEngine
+from timelapse import TimelapsePlayer, TimelapseRecorder, export_timelapse, timelapse_times
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def record_session(path):
+    """
+    Scripted session with strokes, a shape, an eraser pass and undo/redo.
+    Returns {time: (board, whether a stroke or eraser pass was in progress)}.
+    """
+    clock = FakeClock()
+    engine = DrawingEngine(180, 320)
+    recorder = TimelapseRecorder(path, engine, interval=0.5, keyframe_interval=5.0, clock=clock)
+    recorder.start()
+    state = copy.deepcopy(config.INITIAL_STATE)
+    boards = {}
+
+    def step(tip, pinch=False, flat=False):
+        state["pinch_active"], state["flat_hand"] = pinch, flat
+        engine.draw(state, tip, dashboard_consumed=False)
+        clock.now += 0.125 # Exact in binary, so polls land exactly on the interval
+        recorder.poll()
+        if recorder.last_poll == clock.now: # A batch was just logged
+            boards[clock.now] = (engine.board_image(), any(p.current_op for p in engine.pens.values()))
+
+    for s in range(6):
+        state["pen_color"] = list(config.COLORS.values())[s % 3]
+        state["shape_type"] = "rectangle" if s == 2 else "freehand"
+        for i in range(25): # Long strokes span several batches
+            step((30 + 10 * i, 90 + 25 * s % 80 + int(20 * np.sin(i / 3))), pinch=True)
+        step((0, 0))
+        if s == 3:
+            for i in range(8):
+                step((100 + 8 * i, 100), flat=True)
+            step((0, 0))
+        if s == 4:
+            engine.undo()
+            step((0, 0))
+            engine.redo()
+            engine.undo()
+            step((0, 0))
+    recorder.close()
+    return boards
+
+def test_playback_matches_live_board():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.wbtl")
+        boards = record_session(path)
+        player = TimelapsePlayer(path)
+        assert player.duration >= max(boards) - 0.5 and len(player.reader.keyframe_times) >= 4
+
+        def check(t, what):
+            board, busy = boards[t]
+            if not busy:
+                assert np.array_equal(player.image, board), f"{what} differs at {t} s"
+            else:
+                # Mid-stroke the live canvas still lacks the last segment; playback draws every logged point
+                missing = board.any(axis=2) & ~player.image.any(axis=2)
+                assert not missing.any(), f"{what} lacks live ink at {t} s"
+
+        # Forward playback, then random seeks: every moment matches the live board
+        for t in sorted(boards):
+            player.advance(t)
+            check(t, "Playback")
+        rng = np.random.default_rng(0)
+        for t in rng.choice(sorted(boards), 15):
+            player.seek(t)
+            check(t, "Seek")
+            assert player.applied <= 5.0 / 0.5 * 4, "A seek should only replay one keyframe interval"
+    print("test_playback_matches_live_board passed")
+
+def test_export_streams_frames():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.wbtl")
+        record_session(path)
+        player = TimelapsePlayer(path)
+        times = timelapse_times(player.duration, speed=4.0, fps=10.0)
+        assert times[0] == 0.0 and times[-1] <= player.duration
+
+        frames_dir = os.path.join(tmp, "frames")
+        count = export_timelapse(path, frames_dir, speed=4.0, fps=10.0)
+        assert count == len(times) == len(os.listdir(frames_dir))
+        player.seek(times[-1])
+        last = cv2.imread(os.path.join(frames_dir, f"{count - 1:06d}.png"))
+        assert last.any() and np.array_equal(last, player.image), "Last frame should be the board at its time"
+
+        video = os.path.join(tmp, "timelapse.mp4")
+        assert export_timelapse(path, video, speed=8.0, fps=10.0, start=2.0, end=6.0) == 6
+        cap = cv2.VideoCapture(video)
+        assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 6
+        cap.release()
+    print("test_export_streams_frames passed")
+
+if __name__ == "__main__":
+    test_playback_matches_live_board()
+    test_export_streams_frames()
@@ -0,0 +1,135 @@
+import math
+import config
+from display_list import rasterize_mask
+
+class TileCache:
+    """
+    Rasterizes display-list operations into a dense canvas that is split into square tiles.
+    Invalidated tiles are re-rendered by replaying only the operations that touch them.
+    With a palette (see palette.py) the canvas is a single-channel plane of palette indices.
+    """
+    def __init__(self, canvas, tile_size=config.TILE_SIZE, palette=None):
+        self.canvas = canvas
+        self.palette = palette
+        self.tile_size = tile_size
+        self.height, self.width = canvas.shape[:2]
+        self.rows = math.ceil(self.height / tile_size)
+        self.cols = math.ceil(self.width / tile_size)
+        self.dirty = set()
+        self.watchers = [] # One set of changed tile keys per consumer (see watch)
+
+    def tile_rect(self, key):
+        tx, ty = key
+        ts = self.tile_size
+        return (tx * ts, ty * ts, min((tx + 1) * ts, self.width), min((ty + 1) * ts, self.height))
+
+    def tile_keys(self, rect=None):
+        """Keys (tx, ty) of all tiles overlapping rect (canvas pixels), or of every tile."""
+        if rect is None:
+            rect = (0, 0, self.width, self.height)
+        ts = self.tile_size
+        x1, y1 = max(rect[0], 0), max(rect[1], 0)
+        x2, y2 = min(rect[2], self.width), min(rect[3], self.height)
+        if x1 >= x2 or y1 >= y2:
+            return []
+        return [(tx, ty)
+                for ty in range(y1 // ts, (y2 - 1) // ts + 1)
+                for tx in range(x1 // ts, (x2 - 1) // ts + 1)]
+
+    def watch(self):
+        """
+        Register a consumer of tile changes (autosave, broadcast). Returns a watcher id for
+        take_changed. Without watchers, change tracking costs nothing.
+        """
+        self.watchers.append(set())
+        return len(self.watchers) - 1
+
+    def take_changed(self, watcher):
+        """Keys of the tiles written since this watcher's last call."""
+        changed = self.watchers[watcher]
+        self.watchers[watcher] = set()
+        return changed
+
+    def clear_changes(self):
+        """Forget pending changes for every watcher (e.g. after loading a board that is already saved)."""
+        self.watchers = [set() for _ in self.watchers]
+
+    def _mark_changed(self, keys):
+        for changed in self.watchers:
+            changed.update(keys)
+
+    def read_tile(self, key):
+        """Copy of a tile's pixels."""
+        x1, y1, x2, y2 = self.tile_rect(key)
+        return self.canvas[y1:y2, x1:x2].copy()
+
+    def write_tile(self, key, pixels):
+        """Overwrite a tile with previously read pixels. Returns the tile's canvas rect."""
+        x1, y1, x2, y2 = rect = self.tile_rect(key)
+        self.canvas[y1:y2, x1:x2] = pixels
+        self._mark_changed((key,))
+        return rect
+
+    def tile_image(self, key):
+        """Copy of a tile as BGR pixels, whatever the canvas stores (for saving and broadcasting)."""
+        pixels = self.read_tile(key)
+        return pixels if self.palette is None else self.palette.colors(pixels)
+
+    def write_tile_image(self, key, image):
+        """Overwrite a tile with BGR pixels, e.g. from a saved session. Returns the tile's canvas rect."""
+        return self.write_tile(key, image if self.palette is None else self.palette.indices(image))
+
+    def clear_tile(self, key):
+        x1, y1, x2, y2 = self.tile_rect(key)
+        self.canvas[y1:y2, x1:x2] = 0
+        self._mark_changed((key,))
+
+    def paint(self, mask, x0, y0, color, clip=None):
+        """
+        Paint color wherever mask is set, with the mask's top-left at canvas (x0, y0).
+        Returns the canvas rect that was touched, or None if it was fully outside clip.
+        """
+        if clip is None:
+            clip = (0, 0, self.width, self.height)
+        mh, mw = mask.shape
+        x1, y1 = max(x0, clip[0]), max(y0, clip[1])
+        x2, y2 = min(x0 + mw, clip[2]), min(y0 + mh, clip[3])
+        if x1 >= x2 or y1 >= y2:
+            return None
+
+        part = mask[y1 - y0:y2 - y0, x1 - x0:x2 - x0]
+        self.canvas[y1:y2, x1:x2][part > 0] = color if self.palette is None else self.palette.index(color)
+        if self.watchers:
+            self._mark_changed(self.tile_keys((x1, y1, x2, y2)))
+        return (x1, y1, x2, y2)
+
+    def invalidate(self, rect=None):
+        """Mark the tiles overlapping rect (canvas pixels), or every tile, for re-rendering."""
+        self.dirty.update(self.tile_keys(rect))
+
+    def render_dirty(self, display_list, scale):
+        """
+        Re-render every invalidated tile from the display list.
+        scale is canvas pixels per board unit.
+        Returns the canvas rects of the re-rendered tiles.
+        """
+        rendered = []
+        masks = {} # Each op is rasterized once per call, however many tiles it spans
+        margin = 2.0 / scale + 1
+
+        for key in sorted(self.dirty):
+            x1, y1, x2, y2 = rect = self.tile_rect(key)
+            self.clear_tile(key)
+
+            board_rect = (x1 / scale - margin, y1 / scale - margin, x2 / scale + margin, y2 / scale + margin)
+            for op in display_list.query(board_rect):
+                if op.op_id not in masks:
+                    points, size = op.scaled(scale)
+                    masks[op.op_id] = rasterize_mask(op.kind, points, size)
+                mask, mx, my = masks[op.op_id]
+                self.paint(mask, mx, my, op.color, clip=rect)
+
+            rendered.append(rect)
+
+        self.dirty.clear()
+        return rendered
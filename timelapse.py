@@ -0,0 +1,428 @@
+"""
+Time-lapse recording, playback and export of a whiteboard session.
+
+TimelapseRecorder logs every display-list change of a DrawingEngine with its time, plus a
+keyframe (all operations and the board image) every TIMELAPSE_KEYFRAME_INTERVAL seconds.
+Like autosave, the render loop only collects the changes; a writer thread encodes and
+appends them. TimelapsePlayer rebuilds the board at any moment: it bisects the keyframe
+index, loads the keyframe before that moment and applies at most one keyframe interval of
+changes, so seeking costs the same anywhere in an hour-long session. Export streams the
+file from disk frame by frame.
+
+Usage:
+    python timelapse.py play session.wbtl [--speed 10]
+    python timelapse.py export session.wbtl out.mp4 [--speed 10] [--fps 30] [--start S] [--end S]
+    python timelapse.py export session.wbtl frames_dir/      (PNG image sequence)
+
+File layout (little endian):
+    header  16 bytes: magic b"WBTL", version u16, 2 bytes padding, board width u32, board height u32
+    records kind u8, time f8 (seconds since recording started), payload length u32, crc32(payload) u32, payload
+        OP        an operation in full, as in session_store (new, restored or reshaped)
+        EXTEND    op_id u32, count u32, points f8[count][2] appended to a stroke or eraser pass
+        REMOVE    op_id u32
+        KEYFRAME  op count u32, ops length u32, height u32, width u32, ops (u32 length + OP payload
+                  each), zlib(BGR pixels of the board)
+
+Reading stops at the first truncated or corrupt record, so a killed recording stays playable.
+The infinite canvas has no fixed board size and is not recorded.
+"""
+import argparse
+import bisect
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import cv2
+import numpy as np
+import config
+from drawing_engine import DrawingEngine
+from display_list import op_bounds
+from session_store import REMOVE, decode_op, encode_op
+
+MAGIC = b"WBTL"
+VERSION = 1
+HEADER = struct.Struct("<4sH2xII")
+RECORD = struct.Struct("<BdII")
+EXTEND = struct.Struct("<II")
+KEYFRAME = struct.Struct("<IIII")
+U32 = struct.Struct("<I")
+
+OP_RECORD, EXTEND_RECORD, REMOVE_RECORD, KEYFRAME_RECORD = 1, 2, 3, 4
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+def _op_record(op):
+    return (op.op_id, op.kind, op.color, op.size, list(op.points))
+
+class TimelapseRecorder:
+    """
+    Records a DrawingEngine's board changes to path. Call start() once, poll() every frame
+    and close() on exit. Each recording starts a new file.
+    """
+    def __init__(self, path, drawing_engine, interval=config.TIMELAPSE_INTERVAL,
+                 keyframe_interval=config.TIMELAPSE_KEYFRAME_INTERVAL, clock=time.monotonic):
+        if drawing_engine.viewport is not None:
+            raise ValueError("Time-lapse recording needs the dense canvas (INFINITE_CANVAS = False)")
+        self.path = path
+        self.engine = drawing_engine
+        self.interval = interval
+        self.keyframe_interval = keyframe_interval
+        self.clock = clock
+        self.start_time = None
+        self.last_poll = None
+        self.last_keyframe = None
+        self.display_list = None # Display list being watched; load_board replaces it
+        self.watcher = None
+        self.logged = {} # op_id -> (points list, count) as last written, to log appended points only
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._writer_loop, name="timelapse", daemon=True)
+        self.file = None
+        self.bytes_written = 0
+
+        engine = drawing_engine
+        self.board_size = (int(engine.board_width), int(round(engine.height / engine.scale)))
+
+    def start(self):
+        """Open the file and write the first keyframe."""
+        self.file = open(self.path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, *self.board_size))
+        self.start_time = self.last_poll = self.clock()
+        self._queue_keyframe(0.0)
+        self.thread.start()
+
+    def poll(self):
+        """Queue the changes since the last poll if TIMELAPSE_INTERVAL has passed. Cheap when idle."""
+        now = self.clock()
+        if now - self.last_poll >= self.interval:
+            self.last_poll = now
+            self.record(now - self.start_time)
+
+    def record(self, t):
+        """Queue everything that changed since the last call, stamped t seconds into the recording."""
+        dl = self.engine.display_list
+        if dl is not self.display_list or t - self.last_keyframe >= self.keyframe_interval:
+            self._queue_keyframe(t)
+            return
+
+        changed, removed = dl.take_changes(self.watcher)
+        if not (changed or removed):
+            return
+        records = []
+        for op_id in sorted(removed):
+            if self.logged.pop(op_id, None) is not None:
+                records.append((REMOVE_RECORD, REMOVE.pack(op_id)))
+        for op_id in sorted(changed):
+            op = dl.ops.get(op_id)
+            if op is None:
+                continue
+            logged = self.logged.get(op_id)
+            # append_point extends the points list in place; set_points (simplify) replaces it
+            if logged is not None and logged[0] is op.points and logged[1] <= len(op.points):
+                if logged[1] < len(op.points):
+                    records.append((EXTEND_RECORD, (op_id, op.points[logged[1]:])))
+            else:
+                records.append((OP_RECORD, _op_record(op)))
+            self.logged[op_id] = (op.points, len(op.points))
+        if records:
+            self.jobs.put((t, records))
+
+    def close(self):
+        """Write the last changes, wait for the writer thread and close the file."""
+        if self.thread.is_alive():
+            self.record(self.clock() - self.start_time)
+            self.jobs.put(None)
+            self.thread.join()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _queue_keyframe(self, t):
+        engine = self.engine
+        dl = engine.display_list
+        if dl is not self.display_list:
+            self.display_list = dl
+            self.watcher = dl.watch()
+        dl.take_changes(self.watcher)
+        self.logged = {op.op_id: (op.points, len(op.points)) for op in dl}
+        self.last_keyframe = t
+        # Copies only; encoding happens on the writer thread
+        ops = [_op_record(op) for op in dl]
+        self.jobs.put((t, [(KEYFRAME_RECORD, (ops, engine.board_image()))]))
+
+    def _writer_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            t, records = job
+            data = b"".join(self._encode(t, kind, record) for kind, record in records)
+            self.file.write(data)
+            self.file.flush()
+            self.bytes_written += len(data)
+
+    def _encode(self, t, kind, record):
+        if kind == OP_RECORD:
+            payload = encode_op(*record)
+        elif kind == EXTEND_RECORD:
+            op_id, points = record
+            payload = EXTEND.pack(op_id, len(points)) + np.asarray(points, dtype="<f8").reshape(-1, 2).tobytes()
+        elif kind == KEYFRAME_RECORD:
+            ops, image = record
+            if (image.shape[1], image.shape[0]) != self.board_size:
+                # Canvas was resized (e.g. by the frame governor): store the board at board units
+                image = cv2.resize(image, self.board_size, interpolation=cv2.INTER_AREA)
+            encoded = b"".join(U32.pack(len(p)) + p for p in (encode_op(*op) for op in ops))
+            h, w = image.shape[:2]
+            payload = KEYFRAME.pack(len(ops), len(encoded), h, w) + encoded + zlib.compress(image.tobytes(), 1)
+        else:
+            payload = record
+        return RECORD.pack(kind, t, len(payload), zlib.crc32(payload)) + payload
+
+class TimelapseReader:
+    """
+    Index of a time-lapse file: board size, duration and the time and offset of every
+    keyframe. Opening reads only the record headers; payloads are read on demand.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"Not a time-lapse file: {path}")
+            magic, version, self.width, self.height = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a time-lapse file: {path}")
+
+            self.keyframe_times = []
+            self.keyframe_offsets = []
+            self.duration = 0.0
+            self.end = HEADER.size # Offset just past the last complete record
+            size = os.fstat(f.fileno()).st_size
+            while self.end + RECORD.size <= size:
+                kind, t, length, _ = RECORD.unpack(f.read(RECORD.size))
+                if self.end + RECORD.size + length > size:
+                    break # Torn write at the end
+                if kind == KEYFRAME_RECORD:
+                    self.keyframe_times.append(t)
+                    self.keyframe_offsets.append(self.end)
+                self.duration = max(self.duration, t)
+                self.end += RECORD.size + length
+                f.seek(self.end)
+        if not self.keyframe_times:
+            raise ValueError(f"Time-lapse file has no keyframe: {path}")
+
+    def records(self, offset):
+        """Yield (kind, time, payload) from offset on, stopping at the first corrupt record."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while offset < self.end:
+                kind, t, length, crc = RECORD.unpack(f.read(RECORD.size))
+                payload = f.read(length)
+                if zlib.crc32(payload) != crc:
+                    return
+                offset += RECORD.size + length
+                yield kind, t, payload
+
+    def keyframe_before(self, t):
+        """Offset of the last keyframe at or before time t (the first keyframe for earlier times)."""
+        return self.keyframe_offsets[max(bisect.bisect_right(self.keyframe_times, t) - 1, 0)]
+
+class TimelapsePlayer:
+    """
+    The board of a recording at any moment. seek(t) jumps anywhere; advance(t) moves forward
+    incrementally (and seeks when t is earlier). image is the board at the current time.
+    """
+    def __init__(self, path):
+        self.reader = TimelapseReader(path)
+        self.engine = None
+        self.records = None # Iterator over the records after the current time
+        self.pending = None # Next record, read but not applied yet
+        self.time = None
+        self.applied = 0    # Records applied since the last keyframe load (for tests and stats)
+
+    @property
+    def duration(self):
+        return self.reader.duration
+
+    @property
+    def image(self):
+        return self.engine.canvas
+
+    def seek(self, t):
+        """Rebuild the board at time t from the nearest keyframe before it."""
+        self.records = self.reader.records(self.reader.keyframe_before(t))
+        kind, _, payload = next(self.records)
+        self._load_keyframe(payload)
+        self.pending = None
+        self.applied = 0
+        self.time = t
+        self._apply_until(t)
+
+    def advance(self, t):
+        """Move to time t, applying only the changes since the current time when t is later."""
+        if self.time is None or t < self.time:
+            self.seek(t)
+            return
+        self.time = t
+        self._apply_until(t)
+
+    def _apply_until(self, t):
+        while True:
+            record = self.pending if self.pending is not None else next(self.records, None)
+            self.pending = None
+            if record is None:
+                return
+            kind, record_time, payload = record
+            if record_time > t:
+                self.pending = record
+                return
+            if kind == KEYFRAME_RECORD:
+                self._load_keyframe(payload)
+                self.applied = 0
+            else:
+                self._apply(kind, payload)
+                self.applied += 1
+
+    def _load_keyframe(self, payload):
+        count, ops_length, h, w = KEYFRAME.unpack_from(payload)
+        ops, pos = [], KEYFRAME.size
+        for _ in range(count):
+            length = U32.unpack_from(payload, pos)[0]
+            ops.append(decode_op(payload[pos + U32.size:pos + U32.size + length]))
+            pos += U32.size + length
+        image = np.frombuffer(zlib.decompress(payload[pos:]), dtype=np.uint8).reshape(h, w, 3)
+
+        if self.engine is None:
+            self.engine = DrawingEngine(self.reader.height, self.reader.width, infinite=False, palette=False)
+        # The keyframe image is the board; later changes re-render just their tiles over it
+        self.engine.load_board(ops, {})
+        self.engine.canvas[:] = image
+
+    def _apply(self, kind, payload):
+        dl = self.engine.display_list
+        if kind == OP_RECORD:
+            op = decode_op(payload)
+            old = dl.ops.get(op.op_id)
+            rect = None
+            if old is not None:
+                rect = old.bounds
+                dl.set_points(old, op.points)
+                op = old
+            else:
+                dl.insert(op)
+            self._redraw(op.bounds, rect)
+        elif kind == EXTEND_RECORD:
+            op_id, count = EXTEND.unpack_from(payload)
+            op = dl.ops.get(op_id)
+            if op is None:
+                return
+            start = len(op.points)
+            points = np.frombuffer(payload, dtype="<f8", count=count * 2, offset=EXTEND.size).reshape(count, 2)
+            for x, y in points.tolist():
+                dl.append_point(op, (x, y))
+            # A new stroke point also reshapes the segment before it
+            self._redraw(op_bounds(op.kind, op.points[max(start - 3, 0):], op.size))
+        elif kind == REMOVE_RECORD:
+            op_id = REMOVE.unpack(payload)[0]
+            if op_id in dl.ops:
+                self._redraw(dl.remove(op_id).bounds)
+
+    def _redraw(self, rect, other=None):
+        if other is not None:
+            rect = (min(rect[0], other[0]), min(rect[1], other[1]), max(rect[2], other[2]), max(rect[3], other[3]))
+        self.engine.redraw(rect)
+
+def timelapse_times(duration, speed=10.0, fps=30.0, start=0.0, end=None):
+    """Session times of the output frames of a time-lapse at speed x real time."""
+    end = duration if end is None else min(end, duration)
+    count = int((end - start) * fps / speed) + 1 if end >= start else 0
+    return [start + i * speed / fps for i in range(count)]
+
+def export_timelapse(path, out, speed=10.0, fps=30.0, start=0.0, end=None, on_frame=None):
+    """
+    Write the time-lapse of a recording to out: a video file (by extension) or a directory of
+    numbered PNG frames. Frames are rendered and written one at a time, so memory stays flat
+    however long the session is. Returns the number of frames written.
+    """
+    player = TimelapsePlayer(path)
+    times = timelapse_times(player.duration, speed, fps, start, end)
+    writer = None
+    if out.lower().endswith(VIDEO_EXTENSIONS):
+        writer = cv2.VideoWriter(out, cv2.VideoWriter_fourcc(*"mp4v"), fps,
+                                 (player.reader.width, player.reader.height))
+        if not writer.isOpened():
+            raise IOError(f"Could not open video writer: {out}")
+    else:
+        os.makedirs(out, exist_ok=True)
+    try:
+        for i, t in enumerate(times):
+            player.advance(t)
+            if writer is not None:
+                writer.write(player.image)
+            else:
+                cv2.imwrite(os.path.join(out, f"{i:06d}.png"), player.image)
+            if on_frame is not None:
+                on_frame(i + 1, len(times))
+    finally:
+        if writer is not None:
+            writer.release()
+    return len(times)
+
+def play(path, speed=10.0, fps=30.0):
+    """
+    Play a recording in a window. Keys: space pause, +/- speed x2 / /2, ',' '.' back/forward
+    10 s, 0-9 jump to that tenth of the session, q quit.
+    """
+    player = TimelapsePlayer(path)
+    t, paused = 0.0, False
+    while True:
+        frame_start = time.perf_counter()
+        player.advance(t)
+        view = player.image.copy()
+        status = f"{t:7.1f} / {player.duration:.1f} s   x{speed:g}" + ("   paused" if paused else "")
+        cv2.putText(view, status, (10, view.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.COLORS["green"], 2)
+        cv2.imshow("Whiteboard time-lapse", view)
+
+        wait = max(1, int(1000 / fps - (time.perf_counter() - frame_start) * 1000))
+        key = cv2.waitKey(wait) & 0xFF
+        if key == ord('q'):
+            break
+        elif key == ord(' '):
+            paused = not paused
+        elif key in (ord('+'), ord('=')):
+            speed *= 2
+        elif key == ord('-'):
+            speed /= 2
+        elif key in (ord(','), ord('.')):
+            t = min(max(t + (10 if key == ord('.') else -10), 0.0), player.duration)
+        elif ord('0') <= key <= ord('9'):
+            t = player.duration * (key - ord('0')) / 10
+        elif not paused:
+            t = min(t + speed / fps, player.duration)
+    cv2.destroyAllWindows()
+
+def main():
+    parser = argparse.ArgumentParser(description="Play or export a whiteboard time-lapse recording.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    play_parser = sub.add_parser("play", help="Play a recording in a window")
+    play_parser.add_argument("recording")
+    play_parser.add_argument("--speed", type=float, default=10.0, help="Session seconds per real second")
+    export_parser = sub.add_parser("export", help="Export a recording as a video or PNG sequence")
+    export_parser.add_argument("recording")
+    export_parser.add_argument("out", help="Video file (.mp4/.avi/...) or directory for PNG frames")
+    export_parser.add_argument("--speed", type=float, default=10.0, help="Session seconds per output second")
+    export_parser.add_argument("--fps", type=float, default=30.0, help="Output frame rate")
+    export_parser.add_argument("--start", type=float, default=0.0, help="Session time to start at (s)")
+    export_parser.add_argument("--end", type=float, default=None, help="Session time to stop at (s)")
+    args = parser.parse_args()
+
+    if args.command == "play":
+        play(args.recording, args.speed)
+    else:
+        start = time.perf_counter()
+        count = export_timelapse(args.recording, args.out, args.speed, args.fps, args.start, args.end)
+        print(f"Wrote {count} frames to {args.out} in {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()